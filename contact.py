@@ -1,6 +1,21 @@
 __all__ = ['Contact']
 
 class Contact(object):
+    __slots__ = (
+        'id',
+        'local_host',
+        'local_port',
+        'remote_host',
+        'remote_port',
+        'bootstrap',
+        'version',
+        'last_seen',
+        'rt_version',
+        'protocol_minor_version',
+        'rtt',
+        'jitter',
+    )
+
     def __init__(self, id=None, local_host=None, local_port=None, remote_host=None, remote_port=None, bootstrap=False, version=None):
         self.id = id
         self.local_host = local_host
@@ -8,8 +23,12 @@ class Contact(object):
         self.remote_host = remote_host
         self.remote_port = remote_port
         self.bootstrap = bootstrap
-        self.version = version
+        self.version = version # routing table version when contact was last added
         self.last_seen = None
+        self.rt_version = None # contact's own routing table version, last one received
+        self.protocol_minor_version = None # newest protocol minor version spoken by contact
+        self.rtt = None # smoothed round trip time of pings, in seconds
+        self.jitter = None # mean deviation of round trip time
 
     def __repr__(self):
         return '<{}:{} local={}:{} remote={}:{} bootstrap={}>'.format(
@@ -22,6 +41,15 @@ class Contact(object):
             self.bootstrap,
         )
 
+    def update_rtt(self, rtt):
+        # smoothed like TCP retransmission timer (RFC 6298)
+        if self.rtt is None:
+            self.rtt = rtt
+            self.jitter = rtt / 2.0
+        else:
+            self.jitter = 0.75 * self.jitter + 0.25 * abs(self.rtt - rtt)
+            self.rtt = 0.875 * self.rtt + 0.125 * rtt
+
     def __getstate__(self):
         return {
             'id': self.id,
@@ -31,3 +59,6 @@ class Contact(object):
             'remote_port': self.remote_port,
             'bootstrap': self.bootstrap,
         }
+
+    def __setstate__(self, state):
+        self.__init__(**state)
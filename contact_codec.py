@@ -0,0 +1,222 @@
+__all__ = ['ContactCodec']
+
+import socket
+import struct
+import marshal
+
+class ContactCodec(object):
+    # compact contacts encoding, version 1:
+    #   header:  format_version u8, n_contacts u32
+    #   contact: flags u8, id, local_host, local_port u16, remote_host, remote_port u16
+    #
+    # flags:
+    #   bit 0     bootstrap
+    #   bits 1-2  id kind
+    #   bits 3-4  local_host kind
+    #   bits 5-6  remote_host kind
+    #
+    # ids are 16 bytes if they are canonical UUID strings, otherwise
+    # u8 length prefixed utf-8, or u16 length prefixed marshal data if
+    # id is longer than 255 bytes or bytes; hosts are packed IPv4/IPv6 addresses,
+    # otherwise u8 length prefixed utf-8 names; port None is sent as 0;
+    # contact which can not be encoded, e.g. with host name longer than
+    # 255 bytes, is left out
+    FORMAT_VERSION = 1
+
+    HEADER = struct.Struct('!BI')
+    PORT = struct.Struct('!H')
+    LENGTH16 = struct.Struct('!H')
+
+    # common record, UUID id and IPv4 hosts, after flags byte
+    UUID_IPV4 = struct.Struct('!16s4sH4sH')
+
+    FLAG_BOOTSTRAP = 0x01
+    ID_SHIFT = 1
+    LOCAL_HOST_SHIFT = 3
+    REMOTE_HOST_SHIFT = 5
+
+    ID_NONE = 0
+    ID_UUID = 1
+    ID_STR = 2
+    ID_MARSHAL = 3
+
+    HOST_NONE = 0
+    HOST_IPV4 = 1
+    HOST_IPV6 = 2
+    HOST_NAME = 3
+
+    UUID_IPV4_FLAGS = (ID_UUID << ID_SHIFT) | (HOST_IPV4 << LOCAL_HOST_SHIFT) | (HOST_IPV4 << REMOTE_HOST_SHIFT)
+
+    @classmethod
+    def encode(cls, contacts):
+        data = bytearray(cls.HEADER.size)
+        n_contacts = 0
+
+        for c in contacts:
+            try:
+                id_kind, id_data = cls.encode_id(c.id)
+                local_host_kind, local_host_data = cls.encode_host(c.local_host)
+                remote_host_kind, remote_host_data = cls.encode_host(c.remote_host)
+            except (ValueError, TypeError):
+                # one odd contact does not fail whole response
+                continue
+
+            flags = cls.FLAG_BOOTSTRAP if c.bootstrap else 0
+            flags |= id_kind << cls.ID_SHIFT
+            flags |= local_host_kind << cls.LOCAL_HOST_SHIFT
+            flags |= remote_host_kind << cls.REMOTE_HOST_SHIFT
+
+            data.append(flags)
+            data += id_data
+            data += local_host_data
+            data += cls.PORT.pack(c.local_port or 0)
+            data += remote_host_data
+            data += cls.PORT.pack(c.remote_port or 0)
+            n_contacts += 1
+
+        cls.HEADER.pack_into(data, 0, cls.FORMAT_VERSION, n_contacts)
+        return bytes(data)
+
+    @classmethod
+    def decode(cls, data):
+        # returns list of contact states, same as `Contact.__getstate__`
+        format_version, n_contacts = cls.HEADER.unpack_from(data)
+
+        if format_version != cls.FORMAT_VERSION:
+            raise ValueError('Unsupported contacts format version {}'.format(format_version))
+
+        data = memoryview(data)
+        offset = cls.HEADER.size
+        contacts = []
+        append = contacts.append
+        uuid_ipv4_unpack_from = cls.UUID_IPV4.unpack_from
+        uuid_ipv4_size = cls.UUID_IPV4.size
+        uuid_ipv4_flags = cls.UUID_IPV4_FLAGS
+        format_uuid = cls.format_uuid
+        inet_ntop = socket.inet_ntop
+        AF_INET = socket.AF_INET
+
+        for i in range(n_contacts):
+            flags = data[offset]
+            offset += 1
+
+            if flags & ~cls.FLAG_BOOTSTRAP == uuid_ipv4_flags:
+                # fixed size record, single unpack
+                id_data, local_host_data, local_port, remote_host_data, remote_port = uuid_ipv4_unpack_from(data, offset)
+                offset += uuid_ipv4_size
+                id = format_uuid(id_data.hex())
+                local_host = inet_ntop(AF_INET, local_host_data)
+                remote_host = inet_ntop(AF_INET, remote_host_data)
+            else:
+                id, offset = cls.decode_id((flags >> cls.ID_SHIFT) & 0x03, data, offset)
+                local_host, offset = cls.decode_host((flags >> cls.LOCAL_HOST_SHIFT) & 0x03, data, offset)
+                local_port, = cls.PORT.unpack_from(data, offset)
+                offset += 2
+                remote_host, offset = cls.decode_host((flags >> cls.REMOTE_HOST_SHIFT) & 0x03, data, offset)
+                remote_port, = cls.PORT.unpack_from(data, offset)
+                offset += 2
+
+            append({
+                'id': id,
+                'local_host': local_host,
+                'local_port': local_port or None,
+                'remote_host': remote_host,
+                'remote_port': remote_port or None,
+                'bootstrap': bool(flags & cls.FLAG_BOOTSTRAP),
+            })
+
+        return contacts
+
+    @classmethod
+    def encode_id(cls, id):
+        # raises `ValueError` if id is too long, `TypeError` if it is
+        # neither str nor bytes
+        if id is None:
+            return cls.ID_NONE, b''
+
+        if isinstance(id, str):
+            if len(id) == 36:
+                try:
+                    id_data = bytes.fromhex(id.replace('-', ''))
+                except ValueError:
+                    id_data = None
+
+                # only canonical form round-trips back into the same string
+                if id_data is not None and cls.format_uuid(id_data.hex()) == id:
+                    return cls.ID_UUID, id_data
+
+            id_data = id.encode('utf-8')
+
+            if len(id_data) <= 0xff:
+                return cls.ID_STR, bytes((len(id_data),)) + id_data
+
+        # long string or bytes id
+        if not isinstance(id, (str, bytes)):
+            raise TypeError('Id must be str or bytes, got {!r}'.format(id))
+
+        id_data = marshal.dumps(id)
+
+        if len(id_data) > 0xffff:
+            raise ValueError('Id is too long to encode, {} bytes'.format(len(id_data)))
+
+        return cls.ID_MARSHAL, cls.LENGTH16.pack(len(id_data)) + id_data
+
+    @classmethod
+    def decode_id(cls, kind, data, offset):
+        if kind == cls.ID_NONE:
+            return None, offset
+        elif kind == cls.ID_UUID:
+            return cls.format_uuid(data[offset:offset + 16].hex()), offset + 16
+        elif kind == cls.ID_MARSHAL:
+            n, = cls.LENGTH16.unpack_from(data, offset)
+            offset += cls.LENGTH16.size
+            id = marshal.loads(data[offset:offset + n])
+
+            if not isinstance(id, (str, bytes)):
+                raise ValueError('Id must be str or bytes, got {!r}'.format(type(id)))
+
+            return id, offset + n
+
+        n = data[offset]
+        offset += 1
+        return str(data[offset:offset + n], 'utf-8'), offset + n
+
+    @staticmethod
+    def format_uuid(h):
+        # same as `str(uuid.UUID(hex=h))`, without UUID object overhead
+        return '{}-{}-{}-{}-{}'.format(h[:8], h[8:12], h[12:16], h[16:20], h[20:])
+
+    @classmethod
+    def encode_host(cls, host):
+        if host is None:
+            return cls.HOST_NONE, b''
+
+        try:
+            return cls.HOST_IPV4, socket.inet_pton(socket.AF_INET, host)
+        except OSError:
+            pass
+
+        try:
+            return cls.HOST_IPV6, socket.inet_pton(socket.AF_INET6, host)
+        except OSError:
+            pass
+
+        host_data = host.encode('utf-8')
+
+        if len(host_data) > 0xff:
+            raise ValueError('Host name is too long to encode, {} bytes'.format(len(host_data)))
+
+        return cls.HOST_NAME, bytes((len(host_data),)) + host_data
+
+    @classmethod
+    def decode_host(cls, kind, data, offset):
+        if kind == cls.HOST_NONE:
+            return None, offset
+        elif kind == cls.HOST_IPV4:
+            return socket.inet_ntop(socket.AF_INET, data[offset:offset + 4]), offset + 4
+        elif kind == cls.HOST_IPV6:
+            return socket.inet_ntop(socket.AF_INET6, data[offset:offset + 16]), offset + 16
+
+        n = data[offset]
+        offset += 1
+        return str(data[offset:offset + n], 'utf-8'), offset + n
@@ -1,5 +1,6 @@
 __all__ = ['ContactList']
 
+import time
 import random
 
 from contact import Contact
@@ -8,8 +9,10 @@ from print_colors import PrintColors
 class ContactList(object):
     def __init__(self):
         self.items = []
+        self.items_index = {} # {contact: (index in items, id, remote_address)}
         self.items_id_map = {}
         self.items_raddr_map = {}
+        self.listeners = []
 
     def __len__(self):
         return len(self.items)
@@ -17,6 +20,17 @@ class ContactList(object):
     def __iter__(self):
         return iter(self.items)
 
+    def __contains__(self, c):
+        return c in self.items_index
+
+    def add_listener(self, listener):
+        # listener is notified by `contact_added(contact_list, c)`
+        # and `contact_removed(contact_list, c)`
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self.listeners.remove(listener)
+
     def add(self, c):
         if c.id is None and not c.bootstrap:
             raise ValueError('Contact it cannot be None, it its is not bootstrap node')
@@ -24,9 +38,15 @@ class ContactList(object):
         if c.id is None and c.id in self.items_id_map:
             raise ValueError('Bootstrap contact with id=None is already known')
 
+        remote_address = (c.remote_host, c.remote_port)
+        self.items_index[c] = (len(self.items), c.id, remote_address)
         self.items.append(c)
         self.items_id_map[c.id] = c
-        self.items_raddr_map[c.remote_host, c.remote_port] = c
+        self.items_raddr_map[remote_address] = c
+
+        for listener in self.listeners:
+            listener.contact_added(self, c)
+
         return c
 
     def get(self, id_or_remote_address_or_idx):
@@ -56,44 +76,127 @@ class ContactList(object):
 
         return c
 
-    def remove(self, c_or_id):
-        c = None
+    def get_key(self, c):
+        # hashable handle of contact, for indexes kept aside of list
+        return c
+
+    def get_by_key(self, k):
+        return k
+
+    def get_at_address(self, remote_address, id):
+        # contact at address, unless it is known under another id;
+        # nodes hosted by same `NodeHost` share address
+        c = self.get(remote_address)
 
+        if c is not None and c.id is not None and c.id != id:
+            return None
+
+        return c
+
+    def remove(self, c_or_id):
         if isinstance(c_or_id, Contact):
             c = c_or_id
-            self.items.remove(c)
-            del self.items_id_map[c.id]
-            del self.items_raddr_map[c.remote_host, c.remote_port]
         else:
-            c_id = c_or_id
-            c = self.items_id_map.pop(c_id)
-            self.items.remove(c)
-            del self.items_raddr_map[c.remote_host, c.remote_port]
+            c = self.items_id_map[c_or_id]
+
+        i, c_id, remote_address = self.items_index.pop(c)
+
+        # swap-remove, last contact takes place of removed one
+        last = self.items.pop()
+
+        if last is not c:
+            self.items[i] = last
+            self.items_index[last] = (i,) + self.items_index[last][1:]
+
+        # contact's id could be assigned after it was added, so drop
+        # keys it was added with, if they still point to it
+        if self.items_id_map.get(c_id) is c:
+            del self.items_id_map[c_id]
+
+        if self.items_raddr_map.get(remote_address) is c:
+            del self.items_raddr_map[remote_address]
 
+        for listener in self.listeners:
+            listener.contact_removed(self, c)
+
+        return c
+
+    def set_id(self, c, id):
+        # contact known only by address, e.g. bootstrap one, gets its id
+        # once it answers, then it has to be found by id too
+        i, c_id, remote_address = self.items_index[c]
+        c.id = id
+
+        if c_id == id:
+            return c
+
+        if self.items_id_map.get(c_id) is c:
+            del self.items_id_map[c_id]
+
+        self.items_id_map[id] = c
+        self.items_index[c] = (i, id, remote_address)
         return c
 
     def random(self, without_id=None):
-        if not len(self.items):
+        n = len(self.items)
+        excluded = self.items_id_map.get(without_id) if without_id is not None else None
+
+        if excluded is None:
+            if not n:
+                return None
+
+            return self.items[random.randrange(n)]
+
+        if n < 2:
             return None
 
-        # filter contacts
-        i = random.randint(0, len(self.items) - 1)
-        c = self.items[i]
+        # pick among all but excluded index, then shift past it
+        j = self.items_index[excluded][0]
+        i = random.randrange(n - 1)
+
+        if i >= j:
+            i += 1
 
-        if c.id == without_id:
+        return self.items[i]
+
+    def sample(self, k, without_id=None):
+        n = len(self.items)
+        excluded = self.items_id_map.get(without_id) if without_id is not None else None
+
+        if excluded is None:
+            return [self.items[i] for i in random.sample(range(n), min(k, n))]
+
+        j = self.items_index[excluded][0]
+        indexes = random.sample(range(n - 1), min(k, n - 1))
+        return [self.items[i + 1 if i >= j else i] for i in indexes]
+
+    def weighted_random(self, weight, k=8, without_id=None):
+        # one of `k` random contacts, picked with probability
+        # proportional to positive `weight(c)`
+        contacts = self.sample(k, without_id)
+
+        if not contacts:
             return None
 
-        return c
+        return random.choices(contacts, [weight(c) for c in contacts])[0]
 
     def all(self, version=0, max_old=None):
+        # contacts changed after routing table `version`,
+        # and seen within last `max_old` seconds
         contacts = []
+        t = time.time()
 
         for c in self.items:
             if c.bootstrap:
                 contacts.append(c)
                 continue
 
-            # FIXME: use version and max_old
+            if c.version is not None and c.version <= version:
+                continue
+
+            if max_old is not None and c.last_seen is not None and t - c.last_seen > max_old:
+                continue
+
             contacts.append(c)
 
         return contacts
@@ -0,0 +1,434 @@
+__all__ = ['ContactStore', 'ContactView']
+
+import math
+import time
+import array
+import random
+import socket
+import weakref
+
+from contact import Contact
+from contact_codec import ContactCodec
+
+class ObjectColumn(object):
+    def __init__(self):
+        self.values = []
+
+    def append(self):
+        self.values.append(None)
+
+    def get(self, slot):
+        return self.values[slot]
+
+    def set(self, slot, value):
+        self.values[slot] = value
+
+class NumericColumn(object):
+    def __init__(self, typecode, none_value):
+        self.values = array.array(typecode)
+        self.none_value = none_value
+
+    def append(self):
+        self.values.append(self.none_value)
+
+    def get(self, slot):
+        value = self.values[slot]
+        return None if value == self.none_value else value
+
+    def set(self, slot, value):
+        self.values[slot] = self.none_value if value is None else value
+
+class BoolColumn(NumericColumn):
+    def __init__(self):
+        NumericColumn.__init__(self, 'B', 0)
+
+    def get(self, slot):
+        return bool(self.values[slot])
+
+    def set(self, slot, value):
+        self.values[slot] = 1 if value else 0
+
+class FloatColumn(NumericColumn):
+    def __init__(self):
+        NumericColumn.__init__(self, 'd', math.nan)
+
+    def get(self, slot):
+        value = self.values[slot]
+        return None if value != value else value
+
+class HostColumn(object):
+    # IPv4/IPv6 addresses packed into 16 bytes per slot, names kept aside
+    def __init__(self):
+        self.packed = bytearray()
+        self.kinds = array.array('B')
+        self.names = {} # {slot: host}
+
+    def append(self):
+        self.packed += bytes(16)
+        self.kinds.append(ContactCodec.HOST_NONE)
+
+    def get(self, slot):
+        kind = self.kinds[slot]
+        offset = slot << 4
+
+        if kind == ContactCodec.HOST_IPV4:
+            return socket.inet_ntop(socket.AF_INET, self.packed[offset:offset + 4])
+        elif kind == ContactCodec.HOST_IPV6:
+            return socket.inet_ntop(socket.AF_INET6, self.packed[offset:offset + 16])
+        elif kind == ContactCodec.HOST_NAME:
+            return self.names[slot]
+
+        return None
+
+    def set(self, slot, host):
+        kind, host_data = self.pack(host)
+        offset = slot << 4
+        self.kinds[slot] = kind
+        self.names.pop(slot, None)
+
+        if kind == ContactCodec.HOST_NAME:
+            self.names[slot] = host
+            host_data = b''
+
+        self.packed[offset:offset + 16] = host_data.ljust(16, b'\0')
+
+    def get_key(self, slot, port):
+        # compact hashable key for remote address lookups
+        kind = self.kinds[slot]
+
+        if kind == ContactCodec.HOST_NAME:
+            return (self.names[slot], port)
+
+        offset = slot << 4
+        return (kind << 144) | (int.from_bytes(self.packed[offset:offset + 16], 'big') << 16) | (port or 0)
+
+    @staticmethod
+    def pack(host):
+        if host is None:
+            return ContactCodec.HOST_NONE, b''
+
+        try:
+            return ContactCodec.HOST_IPV4, socket.inet_pton(socket.AF_INET, host)
+        except OSError:
+            pass
+
+        try:
+            return ContactCodec.HOST_IPV6, socket.inet_pton(socket.AF_INET6, host)
+        except OSError:
+            pass
+
+        return ContactCodec.HOST_NAME, None
+
+    @classmethod
+    def make_key(cls, host, port):
+        kind, host_data = cls.pack(host)
+
+        if kind == ContactCodec.HOST_NAME:
+            return (host, port)
+
+        return (kind << 144) | (int.from_bytes(host_data.ljust(16, b'\0'), 'big') << 16) | (port or 0)
+
+class ContactView(Contact):
+    # lightweight handle to row of `ContactStore`; view removed from store
+    # is detached and keeps its own values, so it can be added to another store
+    __slots__ = ('store', 'slot', 'values', '__weakref__')
+
+def view_property(name):
+    def fget(self):
+        if self.store is None:
+            return self.values[name]
+
+        return self.store.get_value(self.slot, name)
+
+    def fset(self, value):
+        if self.store is None:
+            self.values[name] = value
+        else:
+            self.store.set_value(self.slot, name, value)
+
+    return property(fget, fset)
+
+for name in Contact.__slots__:
+    setattr(ContactView, name, view_property(name))
+
+class ContactStore(object):
+    # columnar alternative to `ContactList` with same API, for very large tables
+    def __init__(self):
+        self.columns = {
+            'id': ObjectColumn(),
+            'local_host': HostColumn(),
+            'local_port': NumericColumn('H', 0),
+            'remote_host': HostColumn(),
+            'remote_port': NumericColumn('H', 0),
+            'bootstrap': BoolColumn(),
+            'version': NumericColumn('q', -1),
+            'last_seen': FloatColumn(),
+            'rt_version': NumericColumn('q', -1),
+            'protocol_minor_version': NumericColumn('b', -1),
+            'rtt': FloatColumn(),
+            'jitter': FloatColumn(),
+        }
+
+        self.n_slots = 0
+        self.free_slots = []
+        self.order = array.array('I')       # slots of stored contacts
+        self.positions = array.array('I')   # {slot: index in order}
+        self.views = weakref.WeakValueDictionary() # {slot: ContactView}
+        self.items_id_map = {}              # {id: slot}
+        self.items_raddr_map = {}           # {remote_address_key: slot}
+        self.listeners = []
+
+    def __len__(self):
+        return len(self.order)
+
+    def __iter__(self):
+        # iterate over snapshot, same as iterating over list of contacts
+        for slot in array.array('I', self.order):
+            yield self.get_view(slot)
+
+    def __contains__(self, c):
+        return isinstance(c, ContactView) and c.store is self
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self.listeners.remove(listener)
+
+    def get_value(self, slot, name):
+        return self.columns[name].get(slot)
+
+    def set_value(self, slot, name, value):
+        if name == 'id':
+            ids = self.columns['id']
+            c_id = ids.get(slot)
+
+            if self.items_id_map.get(c_id) == slot:
+                del self.items_id_map[c_id]
+
+            ids.set(slot, value)
+            self.items_id_map[value] = slot
+        elif name == 'remote_host' or name == 'remote_port':
+            k = self.get_raddr_key(slot)
+
+            if self.items_raddr_map.get(k) == slot:
+                del self.items_raddr_map[k]
+
+            self.columns[name].set(slot, value)
+            self.items_raddr_map[self.get_raddr_key(slot)] = slot
+        else:
+            self.columns[name].set(slot, value)
+
+    def get_raddr_key(self, slot):
+        return self.columns['remote_host'].get_key(slot, self.columns['remote_port'].get(slot))
+
+    def get_view(self, slot):
+        v = self.views.get(slot)
+
+        if v is None:
+            v = ContactView.__new__(ContactView)
+            v.store = self
+            v.slot = slot
+            v.values = None
+            self.views[slot] = v
+
+        return v
+
+    def add(self, c):
+        if c.id is None and not c.bootstrap:
+            raise ValueError('Contact it cannot be None, it its is not bootstrap node')
+
+        if c.id is None and c.id in self.items_id_map:
+            raise ValueError('Bootstrap contact with id=None is already known')
+
+        if isinstance(c, ContactView) and c.store is self:
+            return c
+
+        values = {name: getattr(c, name) for name in Contact.__slots__}
+
+        if self.free_slots:
+            slot = self.free_slots.pop()
+        else:
+            slot = self.n_slots
+            self.n_slots += 1
+            self.positions.append(0)
+
+            for column in self.columns.values():
+                column.append()
+
+        for name, value in values.items():
+            self.columns[name].set(slot, value)
+
+        self.positions[slot] = len(self.order)
+        self.order.append(slot)
+        self.items_id_map[c.id] = slot
+        self.items_raddr_map[self.get_raddr_key(slot)] = slot
+
+        if isinstance(c, ContactView) and c.store is None:
+            # attach detached view to its new row
+            c.store = self
+            c.slot = slot
+            c.values = None
+            self.views[slot] = c
+        else:
+            c = self.get_view(slot)
+
+        for listener in self.listeners:
+            listener.contact_added(self, c)
+
+        return c
+
+    def get(self, id_or_remote_address_or_idx):
+        slot = None
+
+        if isinstance(id_or_remote_address_or_idx, (str, bytes)):
+            slot = self.items_id_map.get(id_or_remote_address_or_idx)
+        elif isinstance(id_or_remote_address_or_idx, (tuple, list)):
+            remote_host, remote_port = id_or_remote_address_or_idx
+            slot = self.items_raddr_map.get(HostColumn.make_key(remote_host, remote_port))
+        elif isinstance(id_or_remote_address_or_idx, int):
+            i = id_or_remote_address_or_idx
+
+            try:
+                slot = self.order[i]
+            except IndexError as e:
+                pass
+
+        if slot is None:
+            return None
+
+        return self.get_view(slot)
+
+    def get_key(self, c):
+        # slot, so indexes kept aside of store do not keep views alive
+        return c.slot
+
+    def get_by_key(self, k):
+        return self.get_view(k)
+
+    def get_at_address(self, remote_address, id):
+        # contact at address, unless it is known under another id;
+        # nodes hosted by same `NodeHost` share address
+        c = self.get(remote_address)
+
+        if c is not None and c.id is not None and c.id != id:
+            return None
+
+        return c
+
+    def set_id(self, c, id):
+        # views index their id on assignment, see `set_value`
+        c.id = id
+        return c
+
+    def remove(self, c_or_id):
+        if isinstance(c_or_id, ContactView) and c_or_id.store is self:
+            slot = c_or_id.slot
+        elif isinstance(c_or_id, Contact):
+            slot = self.items_id_map[c_or_id.id]
+        else:
+            slot = self.items_id_map[c_or_id]
+
+        c = self.get_view(slot)
+
+        # detach view, it keeps row's values
+        c.values = {name: self.columns[name].get(slot) for name in Contact.__slots__}
+        c.store = None
+        del self.views[slot]
+
+        c_id = self.columns['id'].get(slot)
+
+        if self.items_id_map.get(c_id) == slot:
+            del self.items_id_map[c_id]
+
+        k = self.get_raddr_key(slot)
+
+        if self.items_raddr_map.get(k) == slot:
+            del self.items_raddr_map[k]
+
+        # swap-remove from order, slot is reused by next added contact
+        i = self.positions[slot]
+        last_slot = self.order.pop()
+
+        if last_slot != slot:
+            self.order[i] = last_slot
+            self.positions[last_slot] = i
+
+        self.columns['id'].set(slot, None)
+        self.columns['local_host'].set(slot, None)
+        self.columns['remote_host'].set(slot, None)
+        self.free_slots.append(slot)
+
+        for listener in self.listeners:
+            listener.contact_removed(self, c)
+
+        return c
+
+    def random(self, without_id=None):
+        n = len(self.order)
+        excluded = self.items_id_map.get(without_id) if without_id is not None else None
+
+        if excluded is None:
+            if not n:
+                return None
+
+            return self.get_view(self.order[random.randrange(n)])
+
+        if n < 2:
+            return None
+
+        # pick among all but excluded index, then shift past it
+        j = self.positions[excluded]
+        i = random.randrange(n - 1)
+
+        if i >= j:
+            i += 1
+
+        return self.get_view(self.order[i])
+
+    def sample(self, k, without_id=None):
+        n = len(self.order)
+        excluded = self.items_id_map.get(without_id) if without_id is not None else None
+
+        if excluded is None:
+            return [self.get_view(self.order[i]) for i in random.sample(range(n), min(k, n))]
+
+        j = self.positions[excluded]
+        indexes = random.sample(range(n - 1), min(k, n - 1))
+        return [self.get_view(self.order[i + 1 if i >= j else i]) for i in indexes]
+
+    def weighted_random(self, weight, k=8, without_id=None):
+        # one of `k` random contacts, picked with probability
+        # proportional to positive `weight(c)`
+        contacts = self.sample(k, without_id)
+
+        if not contacts:
+            return None
+
+        return random.choices(contacts, [weight(c) for c in contacts])[0]
+
+    def all(self, version=0, max_old=None):
+        # same as `ContactList.all`
+        contacts = []
+        t = time.time()
+        versions = self.columns['version']
+        last_seens = self.columns['last_seen']
+
+        for slot in array.array('I', self.order):
+            if self.columns['bootstrap'].get(slot):
+                contacts.append(self.get_view(slot))
+                continue
+
+            c_version = versions.get(slot)
+
+            if c_version is not None and c_version <= version:
+                continue
+
+            last_seen = last_seens.get(slot)
+
+            if max_old is not None and last_seen is not None and t - last_seen > max_old:
+                continue
+
+            contacts.append(self.get_view(slot))
+
+        return contacts
@@ -1,26 +1,21 @@
 __all__ = ['DateTimeProtocolCommand']
 
-import time
-import random
 import datetime
 
-from print_colors import PrintColors
-from contact import Contact
 from protocol_command import ProtocolCommand
 
 class DateTimeProtocolCommand(ProtocolCommand):
     def start(self):
         self.req()
+        self.timer = self.node.timers.call_periodic(0.0, self.req, jitter=10.0)
 
     def stop(self):
-        raise NotImplementedError
+        self.timer.cancel()
 
     def req(self):
-        c = self.node.rt.contacts.random(without_id=self.node.id)
+        c = self.select_contact(self.node.rt.contacts)
 
         if not c:
-            # schedule next discover
-            self.node.loop.call_later(0.0 + random.random() * 10.0, self.req)
             return
 
         args = ()
@@ -42,10 +37,7 @@ class DateTimeProtocolCommand(ProtocolCommand):
         del res
 
         # send message
-        self.node.send_message(message_data, c.remote_host, c.remote_port)
-
-        # schedule next discover
-        self.node.loop.call_later(0.0 + random.random() * 10.0, self.req)
+        self.node.send_message(message_data, c.remote_host, c.remote_port, c.id)
     
     def on_req(self, remote_host, remote_port, *args, **kwargs):
         # forward to res
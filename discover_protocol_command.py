@@ -1,27 +1,89 @@
 __all__ = ['DiscoverProtocolCommand']
 
 import time
+import heapq
 import random
+import collections
 
-from print_colors import PrintColors
 from contact import Contact
+from contact_codec import ContactCodec
 from protocol_command import ProtocolCommand
+from peer_selection import LatencyPeerSelection
 
 class DiscoverProtocolCommand(ProtocolCommand):
+    # since protocol version 1.1 contacts are sent encoded by `ContactCodec`
+    COMPACT_PROTOCOL_VERSION_MINOR = 1
+
+    # sampling of contacts, when there are more than fit into response
+    SAMPLING_RANDOM = 'random'
+    SAMPLING_FRESH = 'fresh'
+
+    def __init__(self, node, protocol_major_version, protocol_minor_version, protocol_command_code, max_contacts=64, sampling=SAMPLING_RANDOM, max_page_snapshots=8):
+        ProtocolCommand.__init__(self, node, protocol_major_version, protocol_minor_version, protocol_command_code)
+
+        # keeps every response within a handful of packs
+        self.max_contacts = max_contacts
+        self.sampling = sampling
+
+        # contacts as they were when paging started, pages are slices of
+        # them, so contacts swap-removed meanwhile do not shift pages;
+        # least recently paged snapshot goes first
+        self.page_snapshots = collections.OrderedDict() # {version: [contact, ...]}
+        self.max_page_snapshots = max_page_snapshots
+
+        # discover from nearby peers, responses come back sooner
+        self.peer_selection = LatencyPeerSelection()
+
     def start(self):
+        # older protocol version only answers legacy peers
+        # if newer one is registered and drives requests
+        if self.get_latest_protocol_command() is not self:
+            return
+
         self.req()
 
+    def get_latest_protocol_command(self):
+        latest = self
+
+        for k, protocol_command in self.node.protocol_commands.items():
+            if k[0] != self.protocol_major_version or k[2] != self.protocol_command_code:
+                continue
+
+            if protocol_command.protocol_minor_version > latest.protocol_minor_version:
+                latest = protocol_command
+
+        return latest
+
+    def get_protocol_command_for(self, c):
+        # pick newest protocol version known to be spoken by contact,
+        # unknown contacts are asked using legacy version
+        latest = self.get_latest_protocol_command()
+        protocol_minor_version = c.protocol_minor_version or 0
+
+        if protocol_minor_version >= latest.protocol_minor_version:
+            return latest
+
+        k = (self.protocol_major_version, protocol_minor_version, self.protocol_command_code)
+        return self.node.protocol_commands.get(k, latest)
+
     def stop(self):
-        raise NotImplementedError
+        if self.timer is not None:
+            self.timer.cancel()
 
     def req(self):
         # request
-        c = self.node.rt.contacts.random(without_id=self.node.id)
+        c = self.select_contact(self.node.rt.contacts)
 
         if not c or c.id is None:
-            self.node.loop.call_later(5.0 + random.random() * 5.0, self.req)
+            self.timer = self.node.timers.call_later(5.0 + random.random() * 5.0, self.req)
             return
 
+        self.req_contact(c)
+
+        # schedule next discover
+        self.timer = self.node.timers.call_later(0.0 + random.random() * 10.0, self.req)
+
+    def req_contact(self, c, cursor=None):
         # print('discover_nodes:', c)
         node_id = self.node.id
         node_local_host = self.node.listen_host
@@ -33,16 +95,31 @@ class DiscoverProtocolCommand(ProtocolCommand):
             'id': node_id,
             'local_host': node_local_host,
             'local_port': node_local_port,
+            'protocol_minor_version': self.protocol_minor_version,
+
+            # large table is sent page by page, `None` asks for first page
+            'cursor': cursor,
         }
 
+        # structured routing table asks for contacts closest to key
+        target_key = self.node.rt.get_discover_key()
+
+        if target_key is not None:
+            kwargs['target_key'] = target_key
+
+        # ask only for contacts changed since last response of this contact
+        if c.rt_version is not None:
+            kwargs['version'] = c.rt_version
+
         res = (args, kwargs)
+        protocol_command = self.get_protocol_command_for(c)
 
         # build message
         message_data = self.node.build_message(
-            self.protocol_major_version,
-            self.protocol_minor_version,
+            protocol_command.protocol_major_version,
+            protocol_command.protocol_minor_version,
             self.PROTOCOL_REQ,
-            self.protocol_command_code,
+            protocol_command.protocol_command_code,
             res,
         )
 
@@ -52,28 +129,26 @@ class DiscoverProtocolCommand(ProtocolCommand):
         del res
 
         # send message
-        self.node.send_message(message_data, c.remote_host, c.remote_port)
-
-        # schedule next discover
-        self.node.loop.call_later(0.0 + random.random() * 10.0, self.req)
+        self.node.send_message(message_data, c.remote_host, c.remote_port, c.id)
 
     def on_req(self, remote_host, remote_port, *args, **kwargs):
         node_id = kwargs['id']
         local_host = kwargs['local_host']
         local_port = kwargs['local_port']
         bootstrap = kwargs.get('bootstrap', False)
+        protocol_minor_version = kwargs.get('protocol_minor_version', self.protocol_minor_version)
 
         # update contact's `last_seen`, or add contact
         c = self.node.rt.contacts.get(node_id)
         
         if c:
-            c.id = node_id
+            self.node.rt.set_contact_id(c, node_id)
             c.last_seen = time.time()
         else:
-            c = self.node.rt.contacts.get((remote_host, remote_port))
+            c = self.node.rt.contacts.get_at_address((remote_host, remote_port), node_id)
         
             if c:
-                c.id = node_id
+                self.node.rt.set_contact_id(c, node_id)
                 c.last_seen = time.time()
             else:
                 # add_contact
@@ -81,38 +156,34 @@ class DiscoverProtocolCommand(ProtocolCommand):
 
                 if c:
                     self.node.rt.add_contacts.remove(c)
-                    self.node.rt.contacts.add(c)
-                    c.id = node_id
+                    self.node.rt.set_contact_id(c, node_id)
                     c.last_seen = time.time()
-                    print(PrintColors.GREEN + 'new contact [DISCOVERY REQ]:', self.node, c, PrintColors.END)
+                    c = self.add_contact(c, 'DISCOVERY REQ')
                 else:
-                    c = self.node.rt.add_contacts.get((remote_host, remote_port))
+                    c = self.node.rt.add_contacts.get_at_address((remote_host, remote_port), node_id)
                 
                     if c:
                         self.node.rt.add_contacts.remove(c)
-                        self.node.rt.contacts.add(c)
-                        c.id = node_id
+                        self.node.rt.set_contact_id(c, node_id)
                         c.last_seen = time.time()
-                        print(PrintColors.GREEN + 'new contact [DISCOVERY REQ]:', self.node, c, PrintColors.END)
+                        c = self.add_contact(c, 'DISCOVERY REQ')
                     else:
                         # remove_contact
                         c = self.node.rt.remove_contacts.get(node_id)
 
                         if c:
                             self.node.rt.remove_contacts.remove(c)
-                            self.node.rt.contacts.add(c)
-                            c.id = node_id
+                            self.node.rt.set_contact_id(c, node_id)
                             c.last_seen = time.time()
-                            print(PrintColors.GREEN + 'new contact [DISCOVERY REQ]:', self.node, c, PrintColors.END)
+                            c = self.add_contact(c, 'DISCOVERY REQ')
                         else:
-                            c = self.node.rt.remove_contacts.get((remote_host, remote_port))
+                            c = self.node.rt.remove_contacts.get_at_address((remote_host, remote_port), node_id)
                         
                             if c:
                                 self.node.rt.remove_contacts.remove(c)
-                                self.node.rt.contacts.add(c)
-                                c.id = node_id
+                                self.node.rt.set_contact_id(c, node_id)
                                 c.last_seen = time.time()
-                                print(PrintColors.GREEN + 'new contact [DISCOVERY REQ]:', self.node, c, PrintColors.END)
+                                c = self.add_contact(c, 'DISCOVERY REQ')
                             else:
                                 c = Contact(
                                     id = node_id,
@@ -126,8 +197,9 @@ class DiscoverProtocolCommand(ProtocolCommand):
                                 # because `c` is requesting to discover nodes
                                 # put it into known active contacts
                                 c.last_seen = time.time()
-                                self.node.rt.contacts.add(c)
-                                print(PrintColors.GREEN + 'new contact [DISCOVERY REQ]:', self.node, c, PrintColors.END)
+                                c = self.add_contact(c, 'DISCOVERY REQ')
+
+        c.protocol_minor_version = protocol_minor_version
 
         # forward to res_discover_nodes
         self.res(remote_host, remote_port, *args, **kwargs)
@@ -137,13 +209,35 @@ class DiscoverProtocolCommand(ProtocolCommand):
         node_id = self.node.id
         local_host = self.node.listen_host
         local_port = self.node.listen_port
-        contacts = [c.__getstate__() for c in self.node.rt.contacts]
+        version = self.node.rt.version
+        cursor = None
+        contacts = self.node.rt.get_discover_contacts(kwargs.get('id'), kwargs.get('target_key'), kwargs.get('version'))
+
+        if 'cursor' in kwargs and (kwargs['cursor'] is not None or len(contacts) > self.max_contacts):
+            # requester pages through whole table, every page reports
+            # version table had when paging started
+            version, cursor, contacts = self.get_page(kwargs['cursor'])
+        elif len(contacts) > self.max_contacts:
+            # legacy requester gets sample, without version
+            # as it does not cover all changes
+            version = None
+            contacts = self.get_sample(contacts)
+
+        if self.protocol_minor_version >= self.COMPACT_PROTOCOL_VERSION_MINOR:
+            contacts = ContactCodec.encode(contacts)
+        else:
+            contacts = [c.__getstate__() for c in contacts]
 
         res = {
             'id': node_id,
             'local_host': local_host,
             'local_port': local_port,
             'contacts': contacts,
+            'version': version,
+            'cursor': cursor,
+
+            # let legacy requesters know newer version can be used
+            'protocol_minor_version': self.get_latest_protocol_command().protocol_minor_version,
         }
 
         # build message
@@ -160,7 +254,56 @@ class DiscoverProtocolCommand(ProtocolCommand):
         del res
 
         # send message
-        self.node.send_message(message_data, remote_host, remote_port)
+        self.node.send_message(message_data, remote_host, remote_port, kwargs.get('id'))
+
+    def get_page(self, cursor):
+        contacts = None
+
+        if cursor is not None:
+            version, offset = cursor
+            contacts = self.page_snapshots.get(version)
+
+        if contacts is None or not 0 <= offset < len(contacts):
+            # new paging, or its snapshot is gone, starts over
+            # from snapshot of current table
+            version, offset = self.node.rt.version, 0
+            contacts = self.get_page_snapshot(version)
+        else:
+            self.page_snapshots.move_to_end(version)
+
+        end = min(offset + self.max_contacts, len(contacts))
+        page = contacts[offset:end]
+        next_cursor = (version, end) if end < len(contacts) else None
+        return version, next_cursor, page
+
+    def get_page_snapshot(self, version):
+        contacts = self.page_snapshots.get(version)
+
+        if contacts is None:
+            contacts = self.page_snapshots[version] = list(self.node.rt.contacts)
+
+            if len(self.page_snapshots) > self.max_page_snapshots:
+                self.page_snapshots.popitem(last=False)
+        else:
+            self.page_snapshots.move_to_end(version)
+
+        return contacts
+
+    def get_sample(self, contacts):
+        contacts = list(contacts)
+
+        if self.sampling == self.SAMPLING_FRESH:
+            # weighted sampling without replacement, recently seen contacts
+            # are more likely to be picked, key = u ** (1 / weight)
+            t = time.time()
+
+            def key(c):
+                age = max(t - (c.last_seen or 0.0), 0.0)
+                return random.random() ** (1.0 + age)
+
+            return heapq.nlargest(self.max_contacts, contacts, key=key)
+
+        return random.sample(contacts, self.max_contacts)
 
     def on_res(self, remote_host, remote_port, res):
         node_id = res['id']
@@ -168,18 +311,22 @@ class DiscoverProtocolCommand(ProtocolCommand):
         local_port = res['local_port']
         contacts = res['contacts']
         bootstrap = res.get('bootstrap', False)
+        protocol_minor_version = res.get('protocol_minor_version', self.protocol_minor_version)
+
+        if isinstance(contacts, bytes):
+            contacts = ContactCodec.decode(contacts)
 
         # update contact's `last_seen`, or add contact
         c = self.node.rt.contacts.get(node_id)
         
         if c:
-            c.id = node_id
+            self.node.rt.set_contact_id(c, node_id)
             c.last_seen = time.time()
         else:
-            c = self.node.rt.contacts.get((remote_host, remote_port))
+            c = self.node.rt.contacts.get_at_address((remote_host, remote_port), node_id)
         
             if c:
-                c.id = node_id
+                self.node.rt.set_contact_id(c, node_id)
                 c.last_seen = time.time()
             else:
                 # add_contact
@@ -187,38 +334,34 @@ class DiscoverProtocolCommand(ProtocolCommand):
 
                 if c:
                     self.node.rt.add_contacts.remove(c)
-                    self.node.rt.contacts.add(c)
-                    c.id = node_id
+                    self.node.rt.set_contact_id(c, node_id)
                     c.last_seen = time.time()
-                    print(PrintColors.GREEN + 'new contact [DISCOVERY ON RES]:', self.node, c, PrintColors.END)
+                    c = self.add_contact(c, 'DISCOVERY ON RES')
                 else:
-                    c = self.node.rt.add_contacts.get((remote_host, remote_port))
+                    c = self.node.rt.add_contacts.get_at_address((remote_host, remote_port), node_id)
                 
                     if c:
                         self.node.rt.add_contacts.remove(c)
-                        self.node.rt.contacts.add(c)
-                        c.id = node_id
+                        self.node.rt.set_contact_id(c, node_id)
                         c.last_seen = time.time()
-                        print(PrintColors.GREEN + 'new contact [DISCOVERY ON RES]:', self.node, c, PrintColors.END)
+                        c = self.add_contact(c, 'DISCOVERY ON RES')
                     else:
                         # remove_contact
                         c = self.node.rt.remove_contacts.get(node_id)
 
                         if c:
                             self.node.rt.remove_contacts.remove(c)
-                            self.node.rt.contacts.add(c)
-                            c.id = node_id
+                            self.node.rt.set_contact_id(c, node_id)
                             c.last_seen = time.time()
-                            print(PrintColors.GREEN + 'new contact [DISCOVERY ON RES]:', self.node, c, PrintColors.END)
+                            c = self.add_contact(c, 'DISCOVERY ON RES')
                         else:
-                            c = self.node.rt.remove_contacts.get((remote_host, remote_port))
+                            c = self.node.rt.remove_contacts.get_at_address((remote_host, remote_port), node_id)
                         
                             if c:
                                 self.node.rt.remove_contacts.remove(c)
-                                self.node.rt.contacts.add(c)
-                                c.id = node_id
+                                self.node.rt.set_contact_id(c, node_id)
                                 c.last_seen = time.time()
-                                print(PrintColors.GREEN + 'new contact [DISCOVERY ON RES]:', self.node, c, PrintColors.END)
+                                c = self.add_contact(c, 'DISCOVERY ON RES')
                             else:
                                 c = Contact(
                                     id = node_id,
@@ -232,8 +375,16 @@ class DiscoverProtocolCommand(ProtocolCommand):
                                 # because `c` is requesting to discover nodes
                                 # put it into known active contacts
                                 c.last_seen = time.time()
-                                self.node.rt.contacts.add(c)
-                                print(PrintColors.GREEN + 'new contact [DISCOVERY ON RES]:', self.node, c, PrintColors.END)
+                                c = self.add_contact(c, 'DISCOVERY ON RES')
+
+        c.protocol_minor_version = protocol_minor_version
+        cursor = res.get('cursor')
+
+        if cursor is None:
+            c.rt_version = res.get('version')
+        else:
+            # ask for next page right away
+            self.req_contact(c, cursor)
 
         # update discovered nodes/contacts
         for cd in contacts:
@@ -244,42 +395,49 @@ class DiscoverProtocolCommand(ProtocolCommand):
             remote_port = cd['remote_port']
             bootstrap = cd.get('bootstrap', False)
 
+            if node_id == self.node.id:
+                # peer knows us, we are not our own contact
+                continue
+
             # update contact's `last_seen`, or add contact
             c = self.node.rt.contacts.get(node_id)
             
             if c:
-                c.id = node_id
+                self.node.rt.set_contact_id(c, node_id)
             else:
-                c = self.node.rt.contacts.get((remote_host, remote_port))
+                c = self.node.rt.contacts.get_at_address((remote_host, remote_port), node_id)
             
                 if c:
-                    c.id = node_id
+                    self.node.rt.set_contact_id(c, node_id)
                 else:
                     # add_contact
                     c = self.node.rt.add_contacts.get(node_id)
 
                     if c:
-                        c.id = node_id
+                        self.node.rt.set_contact_id(c, node_id)
                     else:
-                        c = self.node.rt.add_contacts.get((remote_host, remote_port))
+                        c = self.node.rt.add_contacts.get_at_address((remote_host, remote_port), node_id)
                     
                         if c:
-                            c.id = node_id
+                            self.node.rt.set_contact_id(c, node_id)
+                        elif not self.node.rt.can_add_contact(node_id):
+                            # e.g. full k-bucket would decline it
+                            continue
                         else:
                             # remove_contact
                             c = self.node.rt.remove_contacts.get(node_id)
 
                             if c:
                                 self.node.rt.remove_contacts.remove(c)
-                                self.node.rt.add_contacts.add(c)
-                                c.id = node_id
+                                c = self.node.rt.add_contacts.add(c)
+                                self.node.rt.set_contact_id(c, node_id)
                             else:
-                                c = self.node.rt.remove_contacts.get((remote_host, remote_port))
+                                c = self.node.rt.remove_contacts.get_at_address((remote_host, remote_port), node_id)
                             
                                 if c:
                                     self.node.rt.remove_contacts.remove(c)
-                                    self.node.rt.add_contacts.add(c)
-                                    c.id = node_id
+                                    c = self.node.rt.add_contacts.add(c)
+                                    self.node.rt.set_contact_id(c, node_id)
                                 else:
                                     c = Contact(
                                         id = node_id,
@@ -293,4 +451,4 @@ class DiscoverProtocolCommand(ProtocolCommand):
                                     # because `c` is requesting to discover nodes
                                     # put it into known active contacts
                                     c.last_seen = time.time()
-                                    self.node.rt.add_contacts.add(c)
+                                    c = self.node.rt.add_contacts.add(c)
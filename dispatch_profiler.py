@@ -0,0 +1,116 @@
+__all__ = ['DispatchProfiler', 'CProfileDispatchProfiler']
+
+import io
+import pstats
+import cProfile
+
+from protocol_command import ProtocolCommand
+
+class DispatchStats(object):
+    __slots__ = ('n', 'decode_seconds', 'handle_seconds', 'max_seconds', 'payload_bytes', 'max_payload_size')
+
+    def __init__(self):
+        self.n = 0
+        self.decode_seconds = 0.0
+        self.handle_seconds = 0.0
+        self.max_seconds = 0.0
+        self.payload_bytes = 0
+        self.max_payload_size = 0
+
+class DispatchProfiler(object):
+    # dispatch listener, aggregates sampled dispatches by
+    # (major, minor, code, message type); see `Node.add_dispatch_listener`
+    def __init__(self):
+        self.stats = {} # {(major, minor, code, protocol_message_type): DispatchStats}
+
+    def dispatch_started(self, node, protocol_command, protocol_message_type, remote_host, remote_port):
+        pass
+
+    def dispatch_finished(self, node, protocol_command, protocol_message_type, remote_host, remote_port, payload_size, decode_seconds, handle_seconds):
+        k = (
+            protocol_command.protocol_major_version,
+            protocol_command.protocol_minor_version,
+            protocol_command.protocol_command_code,
+            protocol_message_type,
+        )
+
+        stats = self.stats.get(k)
+
+        if stats is None:
+            stats = self.stats[k] = DispatchStats()
+
+        seconds = decode_seconds + handle_seconds
+        stats.n += 1
+        stats.decode_seconds += decode_seconds
+        stats.handle_seconds += handle_seconds
+        stats.payload_bytes += payload_size
+
+        if seconds > stats.max_seconds:
+            stats.max_seconds = seconds
+
+        if payload_size > stats.max_payload_size:
+            stats.max_payload_size = payload_size
+
+    def clear(self):
+        self.stats = {}
+
+    def get_stats(self):
+        # most expensive first
+        rows = []
+
+        for (major, minor, code, protocol_message_type), stats in self.stats.items():
+            rows.append({
+                'command': '{}.{}.{}'.format(major, minor, code),
+                'type': 'req' if protocol_message_type == ProtocolCommand.PROTOCOL_REQ else 'res',
+                'n': stats.n,
+                'seconds': stats.decode_seconds + stats.handle_seconds,
+                'decode_seconds': stats.decode_seconds,
+                'handle_seconds': stats.handle_seconds,
+                'max_seconds': stats.max_seconds,
+                'payload_bytes': stats.payload_bytes,
+                'max_payload_size': stats.max_payload_size,
+            })
+
+        rows.sort(key=lambda row: row['seconds'], reverse=True)
+        return rows
+
+    def format_stats(self):
+        lines = ['{:>8} {:>4} {:>8} {:>10} {:>10} {:>10} {:>10} {:>8} {:>8}'.format(
+            'command', 'type', 'n', 'total ms', 'decode us', 'handle us', 'max us', 'avg B', 'max B',
+        )]
+
+        for row in self.get_stats():
+            n = row['n']
+
+            lines.append('{:>8} {:>4} {:>8} {:>10.2f} {:>10.1f} {:>10.1f} {:>10.1f} {:>8} {:>8}'.format(
+                row['command'],
+                row['type'],
+                n,
+                row['seconds'] * 1e3,
+                row['decode_seconds'] / n * 1e6,
+                row['handle_seconds'] / n * 1e6,
+                row['max_seconds'] * 1e6,
+                row['payload_bytes'] // n,
+                row['max_payload_size'],
+            ))
+
+        return '\n'.join(lines)
+
+class CProfileDispatchProfiler(object):
+    # dispatch listener, profiles sampled dispatches with `cProfile`,
+    # so time spent inside handlers is broken down by function;
+    # only dispatch runs under profiler, rest of loop does not
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def dispatch_started(self, node, protocol_command, protocol_message_type, remote_host, remote_port):
+        self.profile.enable()
+
+    def dispatch_finished(self, node, protocol_command, protocol_message_type, remote_host, remote_port, payload_size, decode_seconds, handle_seconds):
+        self.profile.disable()
+
+    def format_stats(self, sort='cumulative', limit=20):
+        f = io.StringIO()
+        stats = pstats.Stats(self.profile, stream=f)
+        stats.sort_stats(sort).print_stats(limit)
+        return f.getvalue()
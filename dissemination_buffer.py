@@ -0,0 +1,89 @@
+__all__ = ['DisseminationBuffer']
+
+import math
+import collections
+
+class DisseminationBuffer(object):
+    # recent membership updates piggybacked on ping messages (SWIM);
+    # every update is sent `retransmit_mult * log2(n)` times, so it
+    # reaches whole cluster of `n` contacts in O(log n) rounds
+    ALIVE = 0
+    SUSPECT = 1
+    DEAD = 2
+
+    def __init__(self, retransmit_mult=3, max_updates=8):
+        self.retransmit_mult = retransmit_mult
+        self.max_updates = max_updates
+        self.updates = {} # {id: [n_sent, update]}
+
+        # one queue per send count, least sent updates are taken
+        # from front of lowest queues without looking at others;
+        # replaced entry stays in its queue with update `None`
+        self.queues = [] # [deque([n_sent, update])]
+
+    def __len__(self):
+        return len(self.updates)
+
+    def add(self, state, c):
+        # latest state of contact replaces older one,
+        # same state already being spread keeps its count
+        if c.id is None:
+            return
+
+        entry = self.updates.get(c.id)
+
+        if entry is not None:
+            if entry[1][0] == state:
+                return
+
+            entry[1] = None
+
+        update = (state, c.id, c.local_host, c.local_port, c.remote_host, c.remote_port, c.bootstrap)
+        entry = self.updates[c.id] = [0, update]
+        self.get_queue(0).append(entry)
+
+    def get_queue(self, n_sent):
+        while len(self.queues) <= n_sent:
+            self.queues.append(collections.deque())
+
+        return self.queues[n_sent]
+
+    def get_updates(self, n_contacts):
+        if not self.updates:
+            return []
+
+        max_sent = self.retransmit_mult * int(math.ceil(math.log2(n_contacts + 2)))
+
+        # least sent updates first
+        entries = []
+
+        for queue in self.queues:
+            while queue and len(entries) < self.max_updates:
+                entry = queue.popleft()
+
+                if entry[1] is not None:
+                    entries.append(entry)
+
+            if len(entries) >= self.max_updates:
+                break
+
+        updates = []
+
+        for entry in entries:
+            entry[0] += 1
+            update = entry[1]
+            updates.append(update)
+
+            if entry[0] >= max_sent:
+                del self.updates[update[1]]
+            else:
+                self.get_queue(entry[0]).append(entry)
+
+        return updates
+
+    def contact_added(self, contact_list, c):
+        # contact turned green
+        self.add(self.ALIVE, c)
+
+    def contact_removed(self, contact_list, c):
+        pass
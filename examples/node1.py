@@ -7,9 +7,13 @@ import asyncio
 
 from node import Node
 from contact import Contact
+from node_logging import setup_logging
 
 from datetime_protocol_command import DateTimeProtocolCommand
 
+# routing table events, written to console by background thread
+setup_logging()
+
 # event loop
 loop = asyncio.get_event_loop()
 
@@ -31,6 +35,9 @@ for cd in node_config['contacts']:
     c = Contact(**cd)
     node.rt.add_contacts.add(c)
 
+# socket is bound, wait until it listens
+loop.run_until_complete(node.start())
+
 # run loop
 loop.run_forever()
 loop.close()
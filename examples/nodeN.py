@@ -7,12 +7,20 @@ import asyncio
 
 from node import Node
 from contact import Contact
+from node_logging import setup_logging
+from timer_wheel import TimerWheel
 
 from datetime_protocol_command import DateTimeProtocolCommand
 
+# routing table events, written to console by background thread
+setup_logging()
+
 # event loop
 loop = asyncio.get_event_loop()
 
+# all nodes share single timer wheel
+timers = TimerWheel(loop)
+
 with open('nodeN.json', 'r') as f:
     node_config = json.load(f)
 
@@ -23,8 +31,11 @@ for i in range(100):
         listen_host = node_config['listen_host'],
         listen_port = node_config['listen_port'] + i,
         bootstrap = node_config.get('bootstrap', False),
+        timers = timers,
     )
 
+    loop.run_until_complete(node.start())
+
     pc = DateTimeProtocolCommand(node, 1, 0, 10)
     node.add_protocol_command(pc)
 
@@ -0,0 +1,49 @@
+import os
+import sys
+sys.path.append(os.path.abspath('..'))
+
+import json
+import asyncio
+
+from node import Node
+from node_host import NodeHost
+from contact import Contact
+from node_logging import setup_logging
+
+from datetime_protocol_command import DateTimeProtocolCommand
+
+# routing table events, written to console by background thread
+setup_logging()
+
+# event loop
+loop = asyncio.get_event_loop()
+
+with open('nodeN.json', 'r') as f:
+    node_config = json.load(f)
+
+# all virtual nodes share single socket, buffers and timer wheel
+host = NodeHost(
+    loop,
+    listen_host = node_config['listen_host'],
+    listen_port = node_config['listen_port'],
+)
+
+loop.run_until_complete(host.start())
+
+for i in range(1000):
+    node = Node(
+        loop,
+        bootstrap = node_config.get('bootstrap', False),
+        host = host,
+    )
+
+    pc = DateTimeProtocolCommand(node, 1, 0, 10)
+    node.add_protocol_command(pc)
+
+    for cd in node_config['contacts']:
+        c = Contact(**cd)
+        node.rt.add_contacts.add(c)
+
+# run loop
+loop.run_forever()
+loop.close()
@@ -0,0 +1,424 @@
+import os
+import sys
+sys.path.append(os.path.abspath('..'))
+
+import gc
+import json
+import time
+import random
+import marshal
+import asyncio
+import argparse
+import platform
+import statistics
+import subprocess
+
+from node import Node
+from node_host import NodeHost
+from contact import Contact
+from contact_list import ContactList
+from contact_codec import ContactCodec
+from dissemination_buffer import DisseminationBuffer
+from protocol_command import ProtocolCommand
+from simulator import Simulator, SimulatedNetwork, SimulatedTransport, VirtualEventLoop
+import wire_codec
+
+# microbenchmarks of hot paths and loopback pings per second;
+# results are printed and, with `--json`, saved for comparison
+# with run of another commit by `--compare`
+#
+#   python benchmarks.py --json before.json
+#   python benchmarks.py --json after.json --compare before.json
+
+def measure(fn, number, repeat):
+    # seconds per call of `fn`, one value per repeat
+    times = []
+    gc.collect()
+    gc.disable()
+
+    try:
+        for r in range(repeat):
+            t = time.perf_counter()
+
+            for i in range(number):
+                fn()
+
+            times.append((time.perf_counter() - t) / number)
+    finally:
+        gc.enable()
+
+    return times
+
+class BenchmarkSuite(object):
+    def __init__(self, quick=False, name_filter=None):
+        self.quick = quick
+        self.name_filter = name_filter
+        self.repeat = 3 if quick else 7
+        self.results = {} # {name: result}
+
+    def selected(self, name):
+        return self.name_filter is None or self.name_filter in name
+
+    def add_result(self, name, times, number):
+        result = {
+            'unit': 's/op',
+            'min': min(times),
+            'median': statistics.median(times),
+            'mean': statistics.mean(times),
+            'stdev': statistics.stdev(times) if len(times) > 1 else 0.0,
+            'number': number,
+            'repeat': len(times),
+        }
+
+        self.results[name] = result
+        print('{:48} {:12.3f} us  median {:12.3f} us  +- {:5.1%}'.format(
+            name,
+            result['min'] * 1e6,
+            result['median'] * 1e6,
+            result['stdev'] / result['mean'] if result['mean'] else 0.0,
+        ))
+
+    def bench(self, name, fn, number, repeat=None):
+        if not self.selected(name):
+            return
+
+        if self.quick:
+            number = max(number // 10, 1)
+
+        times = measure(fn, number, repeat or self.repeat)
+        self.add_result(name, times, number)
+
+    def run(self):
+        random.seed(0)
+
+        self.bench_packs()
+        self.bench_reassembly()
+        self.bench_message()
+        self.bench_contact_list()
+        self.bench_dissemination_buffer()
+        self.bench_discover_on_res()
+        self.bench_remove_dead_contacts()
+        self.bench_loopback_pings()
+
+        return self.results
+
+    #
+    # codec
+    #
+    def bench_packs(self):
+        for size in (100, 1400, 65536):
+            message_data = os.urandom(size)
+            self.bench('build_packs/{}B'.format(size), lambda: wire_codec.build_packs(message_data), 200000 // (1 + size // 1400))
+
+        pack_data = os.urandom(wire_codec.PACK_DATA_SIZE)
+        self.bench('build_pack', lambda: wire_codec.build_pack(1, len(pack_data), 1, len(pack_data), 0, pack_data), 100000)
+
+    def bench_reassembly(self):
+        # host without nodes, so messages stop right after header is
+        # parsed; multi pack messages arrive pack by pack
+        loop = VirtualEventLoop()
+        network = SimulatedNetwork(loop)
+        host = NodeHost(loop, listen_host='10.0.0.1', transport=SimulatedTransport(network, ('10.0.0.1', 6633)))
+        remote_address = ('10.0.0.2', 6633)
+
+        for size in (100, 65536):
+            message_data = wire_codec.build_message(1, 0, ProtocolCommand.PROTOCOL_REQ, 0, ((), {'data': os.urandom(size)}))
+            message_data = wire_codec.extend_message_header(message_data, 'missing')
+            packs = [bytes(pack) for pack in wire_codec.build_packs(message_data)]
+
+            def process_sock_data():
+                for pack in packs:
+                    host.process_sock_data(pack, remote_address)
+
+            self.bench('process_sock_data/{}B/{}packs'.format(size, len(packs)), process_sock_data, 100000 // len(packs))
+
+        loop.close()
+
+    def bench_message(self):
+        obj = ((), {
+            'id': 'e8a0c5b2-4a17-4b8e-9a63-3c4d7a2f10aa',
+            'local_host': '10.0.0.1',
+            'local_port': 6633,
+            'updates': [(0, 'peer-{}'.format(i), None, None, '10.0.0.{}'.format(i), 6633, False) for i in range(4)],
+            'time': 1.0,
+        })
+
+        def build_message():
+            message_data = wire_codec.build_message(1, 0, ProtocolCommand.PROTOCOL_REQ, 0, obj)
+            return wire_codec.extend_message_header(message_data, 'e8a0c5b2-4a17-4b8e-9a63-3c4d7a2f10ab', 1)
+
+        message_data = bytes(build_message())
+
+        def parse_message():
+            header = wire_codec.parse_message_header(message_data)
+            return marshal.loads(memoryview(message_data)[header[-1]:])
+
+        self.bench('build_message', build_message, 100000)
+        self.bench('parse_message', parse_message, 100000)
+
+    #
+    # contacts
+    #
+    def make_contacts(self, n, prefix='c'):
+        t = time.time()
+        contacts = []
+
+        for i in range(n):
+            c = Contact(id='{}-{}'.format(prefix, i), remote_host='10.{}.{}.{}'.format(i >> 16 & 255, i >> 8 & 255, i & 255), remote_port=6633)
+            c.last_seen = t
+            contacts.append(c)
+
+        return contacts
+
+    def bench_contact_list(self):
+        n = 10000
+        contacts = self.make_contacts(n)
+        extra = self.make_contacts(1000, 'x')
+        contact_list = ContactList()
+
+        for c in contacts:
+            contact_list.add(c)
+
+        ids = [c.id for c in contacts]
+        i = [0]
+
+        def add_remove():
+            c = extra[i[0] % 1000]
+            i[0] += 1
+            contact_list.add(c)
+            contact_list.remove(c)
+
+        def get():
+            i[0] += 1
+            return contact_list.get(ids[i[0] % n])
+
+        self.bench('ContactList.add+remove/{}'.format(n), add_remove, 100000)
+        self.bench('ContactList.get/{}'.format(n), get, 200000)
+        self.bench('ContactList.random/{}'.format(n), contact_list.random, 200000)
+
+    def bench_dissemination_buffer(self):
+        # backlog of updates after many joins, every ping takes few
+        for n in (100, 100000):
+            membership_updates = DisseminationBuffer()
+
+            for c in self.make_contacts(n):
+                membership_updates.add(DisseminationBuffer.ALIVE, c)
+
+            self.bench('DisseminationBuffer.get_updates/{}'.format(n), lambda: membership_updates.get_updates(1000), 20000)
+
+    #
+    # protocol handlers
+    #
+    def bench_discover_on_res(self):
+        n_known = 1000
+
+        for n_contacts in (64, 256):
+            for known in (True, False):
+                name = 'DiscoverProtocolCommand.on_res/{}/{}'.format(n_contacts, 'known' if known else 'new')
+
+                if not self.selected(name):
+                    continue
+
+                with Simulator(seed=0) as sim:
+                    node = sim.add_node()
+                    contacts = self.make_contacts(n_known)
+
+                    for c in contacts:
+                        node.rt.contacts.add(c)
+
+                    protocol_command = node.get_protocol_command(1, 1, 1)
+                    number = 2000 if known else 200
+
+                    if self.quick:
+                        number //= 10
+
+                    if known:
+                        batches = [contacts[:n_contacts]]
+                    else:
+                        # every call merges contacts not seen before
+                        batches = [
+                            self.make_contacts(n_contacts, 'new-{}'.format(b))
+                            for b in range(number * self.repeat)
+                        ]
+
+                    responses = [{
+                        'id': contacts[0].id,
+                        'local_host': contacts[0].local_host,
+                        'local_port': contacts[0].local_port,
+                        'contacts': ContactCodec.encode(batch),
+                        'version': None,
+                        'cursor': None,
+                        'protocol_minor_version': 1,
+                    } for batch in batches]
+
+                    i = [0]
+
+                    def on_res():
+                        res = responses[i[0] % len(responses)]
+                        i[0] += 1
+                        protocol_command.on_res(contacts[0].remote_host, contacts[0].remote_port, res)
+
+                    times = measure(on_res, number, self.repeat)
+                    self.add_result(name, times, number)
+
+    def bench_remove_dead_contacts(self):
+        sizes = (1000, 10000) if self.quick else (1000, 10000, 100000)
+
+        for n in sizes:
+            # every contact seen recently, nothing expires
+            name = 'Node.remove_dead_contacts/{}/fresh'.format(n)
+
+            if self.selected(name):
+                with Simulator(seed=0) as sim:
+                    node = sim.add_node()
+
+                    for c in self.make_contacts(n):
+                        node.rt.contacts.add(c)
+
+                    self.bench(name, node.remove_dead_contacts, 10000)
+
+            # 1% of contacts expired, one sweep per fresh table
+            name = 'Node.remove_dead_contacts/{}/expired'.format(n)
+
+            if self.selected(name):
+                # table is built for every sweep, so fewer repeats
+                times = []
+
+                for r in range(min(self.repeat, 3)):
+                    with Simulator(seed=r) as sim:
+                        node = sim.add_node()
+                        contacts = self.make_contacts(n)
+
+                        for c in contacts[:n // 100]:
+                            c.last_seen -= 2 * node.contact_timeout
+
+                        for c in contacts:
+                            node.rt.contacts.add(c)
+
+                        times.extend(measure(node.remove_dead_contacts, 1, 1))
+
+                self.add_result(name, times, 1)
+
+    #
+    # end to end
+    #
+    def bench_loopback_pings(self, duration=2.0, concurrency=32):
+        name = 'loopback_pings'
+
+        if not self.selected(name):
+            return
+
+        if self.quick:
+            duration = 0.5
+
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        a = Node(loop, id='bench-a', listen_host='127.0.0.1', listen_port=0)
+        b = Node(loop, id='bench-b', listen_host='127.0.0.1', listen_port=0)
+        b_port = b.host.sock.getsockname()[1]
+        a_port = a.host.sock.getsockname()[1]
+        c = Contact(id=b.id, remote_host='127.0.0.1', remote_port=b_port)
+        pings_per_sec = []
+
+        async def pinger(t_end, counts):
+            while loop.time() < t_end:
+                try:
+                    await a.request(a.ping_protocol_command, c, id=a.id, local_host='127.0.0.1', local_port=a_port, time=loop.time(), timeout=1.0)
+                    counts[0] += 1
+                except asyncio.TimeoutError:
+                    pass
+
+        async def run():
+            # let endpoints start
+            await asyncio.sleep(0.1)
+
+            for r in range(self.repeat):
+                counts = [0]
+                t = loop.time()
+                await asyncio.gather(*[pinger(t + duration, counts) for i in range(concurrency)])
+                pings_per_sec.append(counts[0] / (loop.time() - t))
+
+        loop.run_until_complete(run())
+
+        for node in (a, b):
+            node.host.transport.close()
+
+        loop.run_until_complete(asyncio.sleep(0))
+        loop.close()
+
+        self.results[name] = {
+            'unit': 'pings/s',
+            'max': max(pings_per_sec),
+            'median': statistics.median(pings_per_sec),
+            'mean': statistics.mean(pings_per_sec),
+            'stdev': statistics.stdev(pings_per_sec) if len(pings_per_sec) > 1 else 0.0,
+            'duration': duration,
+            'concurrency': concurrency,
+            'repeat': len(pings_per_sec),
+        }
+
+        print('{:48} {:12.0f} pings/s  median {:8.0f} pings/s'.format(name, max(pings_per_sec), statistics.median(pings_per_sec)))
+
+def get_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline_results, threshold=0.1):
+    # best of repeats of both runs, so noise mostly shows as speedup
+    print()
+    print('{:48} {:>12} {:>12} {:>8}'.format('benchmark', 'baseline', 'current', 'change'))
+
+    for name, result in results.items():
+        baseline = baseline_results.get(name)
+
+        if baseline is None or baseline['unit'] != result['unit']:
+            continue
+
+        if result['unit'] == 's/op':
+            old, new = baseline['min'], result['min']
+            change = new / old - 1.0
+            fmt = '{:48} {:9.3f} us {:9.3f} us {:+7.1%} {}'
+            old, new = old * 1e6, new * 1e6
+        else:
+            old, new = baseline['max'], result['max']
+            change = old / new - 1.0
+            fmt = '{:48} {:12.0f} {:12.0f} {:+7.1%} {}'
+
+        # positive change is slowdown for both units
+        print(fmt.format(name, old, new, change, 'SLOWER' if change > threshold else ''))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks of routing table hot paths')
+    parser.add_argument('--json', help='save results to file')
+    parser.add_argument('--compare', help='compare with results saved by earlier run')
+    parser.add_argument('--filter', help='run only benchmarks with name containing this')
+    parser.add_argument('--quick', action='store_true', help='fewer iterations and smaller tables')
+    args = parser.parse_args()
+
+    suite = BenchmarkSuite(quick=args.quick, name_filter=args.filter)
+    results = suite.run()
+
+    report = {
+        'commit': get_commit(),
+        'time': time.time(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'quick': args.quick,
+        'results': results,
+    }
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+
+        compare(results, baseline['results'])
@@ -0,0 +1,69 @@
+import os
+import sys
+sys.path.append(os.path.abspath('..'))
+
+import time
+import uuid
+import marshal
+
+from contact import Contact
+from contact_codec import ContactCodec
+
+def make_contacts(n):
+    contacts = []
+
+    for i in range(n):
+        c = Contact(
+            id = str(uuid.uuid4()),
+            local_host = '0.0.0.0',
+            local_port = 6633,
+            remote_host = '10.{}.{}.{}'.format(i >> 16 & 0xff, i >> 8 & 0xff, i & 0xff),
+            remote_port = 6633 + i % 1000,
+        )
+
+        contacts.append(c)
+
+    return contacts
+
+def bench(n_contacts, n_rounds):
+    contacts = make_contacts(n_contacts)
+
+    # marshal dicts, as sent by discover protocol version 1.0
+    t0 = time.perf_counter()
+
+    for _ in range(n_rounds):
+        marshal_data = marshal.dumps([c.__getstate__() for c in contacts])
+
+    t1 = time.perf_counter()
+
+    for _ in range(n_rounds):
+        marshal.loads(marshal_data)
+
+    t2 = time.perf_counter()
+
+    # compact encoding, as sent by discover protocol version 1.1
+    for _ in range(n_rounds):
+        compact_data = ContactCodec.encode(contacts)
+
+    t3 = time.perf_counter()
+
+    for _ in range(n_rounds):
+        decoded = ContactCodec.decode(compact_data)
+
+    t4 = time.perf_counter()
+    assert decoded == marshal.loads(marshal_data)
+
+    n = n_contacts * n_rounds
+    print('contacts: {}'.format(n_contacts))
+    print('  marshal: {:>6.1f} bytes/contact  encode: {:>10.1f} contacts/s  decode: {:>10.1f} contacts/s'.format(
+        len(marshal_data) / n_contacts,
+        n / (t1 - t0),
+        n / (t2 - t1),
+    ))
+    print('  compact: {:>6.1f} bytes/contact  encode: {:>10.1f} contacts/s  decode: {:>10.1f} contacts/s'.format(
+        len(compact_data) / n_contacts,
+        n / (t3 - t2),
+        n / (t4 - t3),
+    ))
+
+bench(1000, 100)
@@ -0,0 +1,64 @@
+import os
+import sys
+sys.path.append(os.path.abspath('..'))
+
+import gc
+import uuid
+import time
+import tracemalloc
+
+from contact import Contact
+from contact_list import ContactList
+from contact_store import ContactStore
+from routing_table import RoutingTable
+
+class DictContact(object):
+    # `Contact` as it was before `__slots__`
+    def __init__(self, id=None, local_host=None, local_port=None, remote_host=None, remote_port=None, bootstrap=False, version=None):
+        self.id = id
+        self.local_host = local_host
+        self.local_port = local_port
+        self.remote_host = remote_host
+        self.remote_port = remote_port
+        self.bootstrap = bootstrap
+        self.version = version
+        self.last_seen = None
+        self.protocol_minor_version = None
+
+def measure(contact_list_class, contact_class, n):
+    gc.collect()
+    tracemalloc.start()
+    l = contact_list_class()
+
+    if isinstance(l, RoutingTable):
+        # whole table, green contacts with their expiry index
+        rt, l = l, l.contacts
+    t = time.time()
+
+    for i in range(n):
+        c = contact_class(
+            id = str(uuid.UUID(int=i)),
+            local_host = '0.0.0.0',
+            local_port = 6633,
+            remote_host = '10.{}.{}.{}'.format(i >> 16 & 0xff, i >> 8 & 0xff, i & 0xff),
+            remote_port = 6633 + (i >> 24),
+        )
+
+        c.last_seen = t
+        l.add(c)
+
+    del c
+    gc.collect()
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del l
+    rt = None
+    return size / n
+
+for n in (10000, 100000, 1000000):
+    print('contacts: {}'.format(n))
+    print('  ContactList, dict Contact:  {:>6.1f} bytes/contact'.format(measure(ContactList, DictContact, n)))
+    print('  ContactList, slots Contact: {:>6.1f} bytes/contact'.format(measure(ContactList, Contact, n)))
+    print('  ContactStore:               {:>6.1f} bytes/contact'.format(measure(ContactStore, Contact, n)))
+    print('  RoutingTable:               {:>6.1f} bytes/contact'.format(measure(RoutingTable, Contact, n)))
+    print('  RoutingTable, columnar:     {:>6.1f} bytes/contact'.format(measure(lambda: RoutingTable(columnar=True), Contact, n)))
@@ -0,0 +1,118 @@
+import os
+import sys
+sys.path.append(os.path.abspath('..'))
+
+import time
+import contextlib
+
+from node import Node
+from node_host import NodeHost
+from simulator import VirtualEventLoop, SimulatedNetwork, SimulatedTransport
+from contact import Contact
+from contact_codec import ContactCodec
+from protocol_command import ProtocolCommand
+from dispatch_profiler import DispatchProfiler, CProfileDispatchProfiler
+import wire_codec
+
+# pings and discover responses of many peers are fed to
+# `NodeHost.process_sock_data`, with and without dispatch listeners
+N_PEERS = 1000
+N_CONTACTS = 64
+N_MESSAGES = 50000
+
+def make_datagram(node, code, minor, message_type, obj):
+    message_data = node.build_message(1, minor, message_type, code, obj)
+    message_data = wire_codec.extend_message_header(message_data, node.id)
+    return b''.join(bytes(pack) for pack in wire_codec.build_packs(message_data))
+
+def make_datagrams(node):
+    datagrams = []
+
+    for i in range(N_PEERS):
+        remote_address = ('10.0.{}.{}'.format(i // 256, i % 256), 6633)
+
+        # ping request
+        data = make_datagram(node, 0, 0, ProtocolCommand.PROTOCOL_REQ, ((), {
+            'id': 'peer-{}'.format(i),
+            'local_host': remote_address[0],
+            'local_port': remote_address[1],
+            'updates': [],
+            'time': 0.0,
+        }))
+
+        datagrams.append((data, remote_address))
+
+        # discover response, with contacts of other peers
+        contacts = [
+            Contact(id='peer-{}'.format(j), remote_host='10.0.{}.{}'.format(j // 256, j % 256), remote_port=6633)
+            for j in ((i + n + 1) % N_PEERS for n in range(N_CONTACTS))
+        ]
+
+        data = make_datagram(node, 1, 1, ProtocolCommand.PROTOCOL_RES, {
+            'id': 'peer-{}'.format(i),
+            'local_host': remote_address[0],
+            'local_port': remote_address[1],
+            'contacts': ContactCodec.encode(contacts),
+            'version': None,
+            'cursor': None,
+            'protocol_minor_version': 1,
+        })
+
+        datagrams.append((data, remote_address))
+
+    return datagrams
+
+def bench(node, datagrams):
+    host = node.host
+    t = time.perf_counter()
+
+    for i in range(N_MESSAGES):
+        data, remote_address = datagrams[i % len(datagrams)]
+        host.process_sock_data(data, remote_address)
+
+        if i % 1000 == 0:
+            # loop is not running, responses are dropped
+            host.send_queues.clear()
+
+    return (time.perf_counter() - t) / N_MESSAGES
+
+if __name__ == '__main__':
+    # simulated transport, no socket or endpoint to set up
+    loop = VirtualEventLoop()
+    network = SimulatedNetwork(loop)
+
+    for dispatch_sample_every, listener_class in (
+        (8, None),
+        (8, DispatchProfiler),
+        (1, DispatchProfiler),
+        (8, CProfileDispatchProfiler),
+    ):
+        host = NodeHost(loop, listen_host='10.1.0.1', transport=SimulatedTransport(network, ('10.1.0.1', 6633)))
+        node = Node(loop, id='node', host=host, dispatch_sample_every=dispatch_sample_every)
+        datagrams = make_datagrams(node)
+
+        # fill routing table, new contacts are printed
+        with open(os.devnull, 'w') as f, contextlib.redirect_stdout(f):
+            for data, remote_address in datagrams:
+                node.host.process_sock_data(data, remote_address)
+
+        listener = None
+
+        if listener_class is not None:
+            listener = listener_class()
+            node.add_dispatch_listener(listener)
+
+        t = bench(node, datagrams)
+
+        print('sample every: {:2}  listener: {:26} {:6.2f} us/message'.format(
+            dispatch_sample_every,
+            listener_class.__name__ if listener_class else '-',
+            t * 1e6,
+        ))
+
+        if isinstance(listener, DispatchProfiler) and dispatch_sample_every == 8:
+            print(listener.format_stats())
+        elif isinstance(listener, CProfileDispatchProfiler):
+            print(listener.format_stats(sort='tottime', limit=8))
+
+    loop.close()
@@ -0,0 +1,51 @@
+import os
+import sys
+sys.path.append(os.path.abspath('..'))
+
+import random
+
+from contact import Contact
+from dissemination_buffer import DisseminationBuffer
+
+# every node pings one random contact per round, update rides along
+# on ping and its response; rounds until every node knows the update
+def simulate(n_nodes, seed=0):
+    rnd = random.Random(seed)
+    buffers = [DisseminationBuffer() for i in range(n_nodes)]
+    knows = [False] * n_nodes
+    c = Contact(id='joined', remote_host='127.0.0.1', remote_port=6633)
+    buffers[0].add(DisseminationBuffer.ALIVE, c)
+    knows[0] = True
+    n_messages = 0
+    rounds = 0
+
+    while not all(knows) and rounds < 1000:
+        rounds += 1
+
+        for i in range(n_nodes):
+            j = rnd.randrange(n_nodes - 1)
+
+            if j >= i:
+                j += 1
+
+            # ping request and its response
+            for src, dst in ((i, j), (j, i)):
+                updates = buffers[src].get_updates(n_nodes)
+                n_messages += 1
+
+                if updates and not knows[dst]:
+                    knows[dst] = True
+                    buffers[dst].add(DisseminationBuffer.ALIVE, c)
+
+    return rounds, sum(knows), n_messages / n_nodes / rounds
+
+if __name__ == '__main__':
+    for n_nodes in (16, 64, 256, 1024, 4096):
+        rounds, n_knows, messages_per_round = simulate(n_nodes)
+
+        print('nodes: {:5}  rounds: {:3}  knows: {:5}  messages per node per round: {:.1f}'.format(
+            n_nodes,
+            rounds,
+            n_knows,
+            messages_per_round,
+        ))
@@ -0,0 +1,107 @@
+import os
+import sys
+sys.path.append(os.path.abspath('..'))
+
+import random
+
+from failure_detector import TimeoutFailureDetector, PhiAccrualFailureDetector
+
+# one node probing its contacts round-robin, one ping per 0-0.5 s
+# like `PingProtocolCommand`; responses are lost or delayed at random,
+# some contacts crash at `CRASH_TIME`
+PING_JITTER = 0.5
+LOSS = 0.05
+RTT = 0.05
+RTT_JITTER = 0.2
+CRASH_TIME = 600.0
+DURATION = 1200.0
+CHECK_INTERVAL = 1.0
+CRASH_RATIO = 0.1
+
+def simulate(failure_detector, n_contacts, seed=0):
+    rnd = random.Random(seed)
+    contacts = list(range(n_contacts))
+    crashed = set(rnd.sample(contacts, max(1, int(n_contacts * CRASH_RATIO))))
+    heartbeats = [] # [(t, c), ...] in flight responses
+    probe_order = []
+    suspected = set()
+    detected = {} # {c: t}
+    n_false_positives = 0
+    n_pings = 0
+    t_ping = 0.0
+    t_check = CHECK_INTERVAL
+
+    while t_check < DURATION:
+        if t_ping <= t_check:
+            if not probe_order:
+                probe_order = contacts[:]
+                rnd.shuffle(probe_order)
+
+            c = probe_order.pop()
+            n_pings += 1
+
+            if not (c in crashed and t_ping >= CRASH_TIME) and rnd.random() >= LOSS:
+                heartbeats.append((t_ping + RTT + rnd.random() * RTT_JITTER, c))
+
+            t_ping += rnd.random() * PING_JITTER
+            continue
+
+        heartbeats.sort()
+
+        while heartbeats and heartbeats[0][0] <= t_check:
+            t, c = heartbeats.pop(0)
+            failure_detector.heartbeat(c, t)
+
+        for c in contacts:
+            available = failure_detector.is_available(c, t_check)
+
+            if c in crashed and t_check >= CRASH_TIME:
+                if not available:
+                    detected.setdefault(c, t_check)
+
+                continue
+
+            if available:
+                suspected.discard(c)
+                continue
+
+            if c in suspected:
+                continue
+
+            suspected.add(c)
+
+            if t_check > 60.0:
+                # warm-up excluded, contact was not probed yet
+                n_false_positives += 1
+
+        t_check += CHECK_INTERVAL
+
+    detection_times = [t - CRASH_TIME for t in detected.values()]
+    mean_detection_time = sum(detection_times) / len(detection_times) if detection_times else float('nan')
+    live_contact_hours = (n_contacts - len(crashed)) * DURATION / 3600.0 + len(crashed) * CRASH_TIME / 3600.0
+    return mean_detection_time, len(detected), len(crashed), n_false_positives / live_contact_hours, n_pings / DURATION
+
+if __name__ == '__main__':
+    detectors = [
+        ('timeout 15 s', lambda: TimeoutFailureDetector(15.0)),
+        ('timeout 30 s', lambda: TimeoutFailureDetector(30.0)),
+        ('timeout 60 s', lambda: TimeoutFailureDetector(60.0)),
+        ('phi 4', lambda: PhiAccrualFailureDetector(threshold=4.0)),
+        ('phi 8', lambda: PhiAccrualFailureDetector(threshold=8.0)),
+        ('phi 12', lambda: PhiAccrualFailureDetector(threshold=12.0)),
+    ]
+
+    for n_contacts in (10, 100, 400):
+        print('contacts:', n_contacts)
+
+        for name, f in detectors:
+            mean_detection_time, n_detected, n_crashed, false_positive_rate, ping_rate = simulate(f(), n_contacts)
+
+            print('  {:14} detection: {:7.1f} s  detected: {:3}/{:<3}  false positives: {:7.2f} / contact-hour  pings: {:.1f} / s'.format(
+                name,
+                mean_detection_time,
+                n_detected,
+                n_crashed,
+                false_positive_rate,
+                ping_rate,
+            ))
@@ -0,0 +1,96 @@
+import os
+import sys
+sys.path.append(os.path.abspath('..'))
+
+import time
+import logging
+
+from node import Node
+from node_host import NodeHost
+from simulator import VirtualEventLoop, SimulatedNetwork, SimulatedTransport
+from protocol_command import ProtocolCommand
+from node_logging import logger, setup_logging, ConsoleFormatter
+import wire_codec
+
+# cluster restart, pings of many unknown peers each add new contact;
+# log goes to slow terminal, written synchronously as `print` did,
+# or through queue and rate limit of `setup_logging`
+N_PEERS = 2000
+WRITE_DELAY = 0.0005
+
+class SlowStream(object):
+    def __init__(self):
+        self.n_lines = 0
+
+    def write(self, s):
+        time.sleep(WRITE_DELAY)
+        self.n_lines += s.count('\n')
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return True
+
+def make_datagrams(node):
+    datagrams = []
+
+    for i in range(N_PEERS):
+        remote_address = ('10.{}.{}.{}'.format(i // 65536, i // 256 % 256, i % 256), 6633)
+
+        message_data = node.build_message(1, 0, ProtocolCommand.PROTOCOL_REQ, 0, ((), {
+            'id': 'peer-{}'.format(i),
+            'local_host': remote_address[0],
+            'local_port': remote_address[1],
+            'updates': [],
+            'time': 0.0,
+        }))
+
+        message_data = wire_codec.extend_message_header(message_data, node.id)
+        datagrams.append((bytes(wire_codec.build_packs(message_data)[0]), remote_address))
+
+    return datagrams
+
+def bench(loop, network):
+    # simulated transport, no socket or endpoint to set up
+    host = NodeHost(loop, listen_host='10.1.0.1', transport=SimulatedTransport(network, ('10.1.0.1', 6633)))
+    node = Node(loop, id='node', host=host)
+    datagrams = make_datagrams(node)
+    latencies = []
+
+    for data, remote_address in datagrams:
+        t = time.perf_counter()
+        node.host.process_sock_data(data, remote_address)
+        latencies.append(time.perf_counter() - t)
+
+    node.host.send_queues.clear()
+    latencies.sort()
+    return sum(latencies) / len(latencies), latencies[int(len(latencies) * 0.99)]
+
+if __name__ == '__main__':
+    loop = VirtualEventLoop()
+    network = SimulatedNetwork(loop)
+
+    # no logging
+    logger.setLevel(logging.WARNING)
+    mean, p99 = bench(loop, network)
+    print('no logging:     mean {:8.1f} us  p99 {:8.1f} us'.format(mean * 1e6, p99 * 1e6))
+
+    # synchronous
+    stream = SlowStream()
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(ConsoleFormatter())
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    mean, p99 = bench(loop, network)
+    logger.removeHandler(handler)
+    print('sync handler:   mean {:8.1f} us  p99 {:8.1f} us  lines {}'.format(mean * 1e6, p99 * 1e6, stream.n_lines))
+
+    # queue, rate limited
+    stream = SlowStream()
+    listener = setup_logging(stream=stream)
+    mean, p99 = bench(loop, network)
+    listener.stop()
+    print('queue handler:  mean {:8.1f} us  p99 {:8.1f} us  lines {}'.format(mean * 1e6, p99 * 1e6, stream.n_lines))
+
+    loop.close()
@@ -0,0 +1,119 @@
+import os
+import sys
+sys.path.append(os.path.abspath('..'))
+
+import time
+
+from node import Node
+from node_host import NodeHost
+from simulator import VirtualEventLoop, SimulatedNetwork, SimulatedTransport
+from metrics import MetricsRegistry
+from protocol_command import ProtocolCommand
+import wire_codec
+
+# cost of metrics on ping path: ping requests from many peers are fed
+# to `NodeHost.process_sock_data`, node answers into its send queue;
+# metric updates done per ping are then timed alone
+N_PEERS = 1000
+N_PINGS = 100000
+
+def make_datagrams(node):
+    datagrams = []
+
+    for i in range(N_PEERS):
+        remote_address = ('10.0.{}.{}'.format(i // 256, i % 256), 6633)
+
+        message_data = node.build_message(1, 0, ProtocolCommand.PROTOCOL_REQ, 0, ((), {
+            'id': 'peer-{}'.format(i),
+            'local_host': remote_address[0],
+            'local_port': remote_address[1],
+            'updates': [],
+            'time': 0.0,
+        }))
+
+        message_data = wire_codec.extend_message_header(message_data, node.id)
+        data = bytes(wire_codec.build_packs(message_data)[0])
+        datagrams.append((data, remote_address))
+
+    return datagrams
+
+def bench_ping_path(node, datagrams):
+    host = node.host
+    t = time.perf_counter()
+
+    for i in range(N_PINGS):
+        data, remote_address = datagrams[i % N_PEERS]
+        host.process_sock_data(data, remote_address)
+
+        if i % N_PEERS == 0:
+            # loop is not running, responses are dropped
+            host.send_queues.clear()
+
+    return (time.perf_counter() - t) / N_PINGS
+
+def bench_metric_updates():
+    # same updates as one ping does: datagram, pack and message in,
+    # dispatch with its sampled latency, message and datagram out
+    metrics = MetricsRegistry()
+    datagrams_in = metrics.counter('datagrams_in')
+    bytes_in = metrics.counter('bytes_in')
+    packs_in = metrics.counter('packs_in')
+    messages_in = metrics.counter('messages_in')
+    dispatched = metrics.counter('dispatched')
+    dispatch_seconds = metrics.histogram('dispatch_seconds')
+    messages_out = metrics.counter('messages_out')
+    packs_out = metrics.counter('packs_out')
+    datagrams_out = metrics.counter('datagrams_out')
+    bytes_out = metrics.counter('bytes_out')
+    perf_counter = time.perf_counter
+
+    t = time.perf_counter()
+
+    for i in range(N_PINGS):
+        messages_in.value += 1
+        dispatched.value += 1
+
+        if dispatched.value & 7:
+            t0 = None
+        else:
+            t0 = perf_counter()
+
+        messages_out.value += 1
+        packs_out.value += 1
+
+        if t0 is not None:
+            dispatch_seconds.observe(perf_counter() - t0)
+
+        datagrams_in.value += 1
+        bytes_in.value += 100
+        packs_in.value += 1
+        datagrams_out.value += 1
+        bytes_out.value += 100
+
+    return (time.perf_counter() - t) / N_PINGS
+
+def bench_snapshot(node):
+    t = time.perf_counter()
+
+    for i in range(100):
+        node.metrics.format_text()
+
+    return (time.perf_counter() - t) / 100
+
+if __name__ == '__main__':
+    # simulated transport, no socket or endpoint to set up
+    loop = VirtualEventLoop()
+    network = SimulatedNetwork(loop)
+    host = NodeHost(loop, listen_host='10.1.0.1', transport=SimulatedTransport(network, ('10.1.0.1', 6633)))
+    node = Node(loop, id='node', host=host)
+    datagrams = make_datagrams(node)
+
+    ping_path = bench_ping_path(node, datagrams)
+    metric_updates = bench_metric_updates()
+    snapshot = bench_snapshot(node)
+
+    print('ping path:      {:6.2f} us/ping'.format(ping_path * 1e6))
+    print('metric updates: {:6.2f} us/ping ({:.1%} of ping path)'.format(metric_updates * 1e6, metric_updates / ping_path))
+    print('text snapshot:  {:6.2f} us, green contacts: {}'.format(snapshot * 1e6, len(node.rt.contacts)))
+
+    loop.close()
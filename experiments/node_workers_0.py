@@ -0,0 +1,107 @@
+import os
+import sys
+sys.path.append(os.path.abspath('..'))
+
+import time
+import socket
+import select
+import multiprocessing
+
+import wire_codec
+from node_workers import NodeWorkers
+from protocol_command import ProtocolCommand
+
+# ping requests from many client sockets, so SO_REUSEPORT spreads
+# them over workers, answered pings per second are counted
+LISTEN_PORT = 17300
+N_CLIENTS = 4
+N_SOCKETS = 16
+WINDOW = 8
+DURATION = 5.0
+
+def run_client(client_index, results):
+    socks = []
+
+    for i in range(N_SOCKETS):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(('127.0.0.1', 0))
+        sock.setblocking(False)
+        socks.append(sock)
+
+    datagrams = []
+
+    for i, sock in enumerate(socks):
+        kwargs = {
+            'id': 'client-{}-{}'.format(client_index, i),
+            'local_host': '127.0.0.1',
+            'local_port': sock.getsockname()[1],
+        }
+
+        message_data = wire_codec.build_message(1, 0, ProtocolCommand.PROTOCOL_REQ, 0, ((), kwargs))
+        datagrams.append(bytes(wire_codec.build_packs(message_data)[0]))
+
+    n_res = 0
+    t_end = time.time() + DURATION
+
+    for sock, datagram in zip(socks, datagrams):
+        for i in range(WINDOW):
+            sock.sendto(datagram, ('127.0.0.1', LISTEN_PORT))
+
+    datagram_by_fd = {sock.fileno(): (sock, datagram) for sock, datagram in zip(socks, datagrams)}
+
+    while time.time() < t_end:
+        readable, _, _ = select.select(socks, [], [], 0.1)
+
+        if not readable:
+            # whole window could be dropped by kernel, refill it
+            for sock, datagram in zip(socks, datagrams):
+                for i in range(WINDOW):
+                    sock.sendto(datagram, ('127.0.0.1', LISTEN_PORT))
+
+        for sock in readable:
+            while True:
+                try:
+                    data, remote_address = sock.recvfrom(1500)
+                except BlockingIOError:
+                    break
+
+                header_size = wire_codec.PACK_HEADER.size
+                message_type = wire_codec.MESSAGE_HEADER.unpack_from(data, header_size)[2]
+
+                if message_type != ProtocolCommand.PROTOCOL_RES:
+                    # node pinging us back
+                    continue
+
+                n_res += 1
+
+                # keep window full
+                sock.sendto(datagram_by_fd[sock.fileno()][1], ('127.0.0.1', LISTEN_PORT))
+
+    results.put(n_res)
+
+def bench(n_workers):
+    node_workers = NodeWorkers(n_workers, id='server', listen_host='127.0.0.1', listen_port=LISTEN_PORT)
+    node_workers.start()
+    node_workers.run(1.0)
+
+    results = multiprocessing.Queue()
+    clients = [multiprocessing.Process(target=run_client, args=(i, results)) for i in range(N_CLIENTS)]
+
+    for p in clients:
+        p.start()
+
+    node_workers.run(DURATION + 1.0)
+    n_res = sum(results.get() for p in clients)
+
+    for p in clients:
+        p.join()
+
+    node_workers.stop()
+    return n_res / DURATION, len(node_workers.rt.contacts)
+
+if __name__ == '__main__':
+    print('cpus:', multiprocessing.cpu_count())
+
+    for n_workers in (1, 2, 4, 8):
+        res_per_sec, n_contacts = bench(n_workers)
+        print('workers: {}  pings/s: {:9.1f}  contacts in shared table: {}'.format(n_workers, res_per_sec, n_contacts))
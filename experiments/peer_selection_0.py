@@ -0,0 +1,65 @@
+import os
+import sys
+sys.path.append(os.path.abspath('..'))
+
+import time
+import random
+
+from contact import Contact
+from contact_list import ContactList
+from contact_store import ContactStore
+from peer_selection import RandomPeerSelection, LatencyPeerSelection
+
+# contacts spread over continents, rtt measured by pings,
+# mean rtt of picked contacts and share of contacts ever picked
+N_CONTACTS = 1000
+N_SELECTIONS = 100000
+
+def make_contacts(contact_list_class):
+    rnd = random.Random(0)
+    contacts = contact_list_class()
+    t = time.time()
+
+    for i in range(N_CONTACTS):
+        c = Contact(id=str(i), remote_host='10.0.{}.{}'.format(i // 256, i % 256), remote_port=6633)
+        base_rtt = rnd.choice((0.005, 0.03, 0.1, 0.25))
+
+        for j in range(8):
+            c.update_rtt(base_rtt * (1.0 + rnd.random() * 0.2))
+
+        c.last_seen = t - rnd.random() * 120.0
+        contacts.add(c)
+
+    return contacts
+
+def bench(contacts, peer_selection):
+    picked = set()
+    rtt_sum = 0.0
+    t = time.perf_counter()
+
+    for i in range(N_SELECTIONS):
+        c = peer_selection.select(contacts)
+        picked.add(c.id)
+        rtt_sum += c.rtt
+
+    t = time.perf_counter() - t
+    return rtt_sum / N_SELECTIONS, len(picked) / N_CONTACTS, t / N_SELECTIONS
+
+if __name__ == '__main__':
+    for contact_list_class in (ContactList, ContactStore):
+        contacts = make_contacts(contact_list_class)
+
+        for name, peer_selection in (
+            ('random', RandomPeerSelection()),
+            ('latency', LatencyPeerSelection()),
+            ('latency, no exploration', LatencyPeerSelection(exploration=0.0)),
+        ):
+            mean_rtt, coverage, t = bench(contacts, peer_selection)
+
+            print('{:12} {:24} mean rtt: {:6.1f} ms  contacts picked: {:5.1%}  select: {:5.2f} us'.format(
+                contact_list_class.__name__,
+                name,
+                mean_rtt * 1000.0,
+                coverage,
+                t * 1e6,
+            ))
@@ -0,0 +1,130 @@
+import os
+import sys
+sys.path.append(os.path.abspath('..'))
+
+import math
+import time
+import struct
+import random
+
+from message_reassembler import MessageReassembler
+
+def build_packs(message_data):
+    message_id = random.getrandbits(64)
+    step = 1400 - 3 * 4
+    message_n_packs = int(math.ceil(len(message_data) / step))
+    packs = []
+
+    for pack_index, s in enumerate(range(0, len(message_data), step)):
+        pack_data = message_data[s:s + step]
+        pack = struct.pack('!QIIII', message_id, len(message_data), message_n_packs, len(pack_data), pack_index)
+        packs.append(pack + pack_data)
+
+    return packs
+
+def legacy_process(recv_buffers, recv_packs, data, remote_address):
+    # byte concatenation path as it was in `Node.process_sock_data`
+    if remote_address not in recv_buffers:
+        recv_buffers[remote_address] = []
+
+    recv_buffers[remote_address].append(data)
+    recv_buffer = b''.join(recv_buffers[remote_address])
+    pack_header_size = struct.calcsize('!QIIII')
+
+    if len(recv_buffer) < pack_header_size:
+        return
+
+    del recv_buffers[remote_address][:]
+    pack_header = recv_buffer[:pack_header_size]
+    recv_buffer_rest = recv_buffer[pack_header_size:]
+    msg_id, msg_size, msg_n_packs, pack_size, pack_index = struct.unpack('!QIIII', pack_header)
+
+    if pack_size > len(recv_buffer_rest):
+        recv_buffers[remote_address].append(pack_header)
+        recv_buffers[remote_address].append(recv_buffer_rest)
+        return
+
+    pack_data = recv_buffer_rest[:pack_size]
+    rest_data = recv_buffer_rest[pack_size:]
+    recv_buffers[remote_address].append(rest_data)
+
+    if msg_id not in recv_packs:
+        recv_packs[msg_id] = {}
+
+    recv_packs[msg_id][pack_index] = pack_data
+
+    if len(recv_packs[msg_id]) < msg_n_packs:
+        return
+
+    msg = b''.join([recv_packs[msg_id][i] for i in range(msg_n_packs)])
+    del recv_packs[msg_id]
+    return msg
+
+def reassembler_process(reassembler, data, remote_address):
+    # pack path as it is in `NodeHost.process_sock_data`
+    data_view = memoryview(data)
+    msg_id, msg_size, msg_n_packs, pack_size, pack_index = struct.unpack_from('!QIIII', data)
+
+    if msg_n_packs == 1 and pack_size == msg_size and pack_index == 0:
+        return data_view[24:24 + pack_size]
+
+    return reassembler.add_pack(remote_address, msg_id, msg_size, msg_n_packs, pack_index, data_view[24:24 + pack_size])
+
+def best_time(f, n_repeats=5):
+    # single cpu is noisy, best of repeats is what path costs
+    ts = []
+
+    for _ in range(n_repeats):
+        t0 = time.perf_counter()
+        msg = f()
+        ts.append(time.perf_counter() - t0)
+
+    return min(ts), msg
+
+def bench(n_packs, n_messages):
+    message_data = os.urandom(n_packs * (1400 - 3 * 4) - 100)
+    messages = [build_packs(message_data) for _ in range(n_messages)]
+    remote_address = ('127.0.0.1', 6633)
+
+    def run_legacy():
+        recv_buffers, recv_packs = {}, {}
+
+        for packs in messages:
+            for pack in packs:
+                msg = legacy_process(recv_buffers, recv_packs, pack, remote_address)
+
+        return msg
+
+    def run_reassembler():
+        reassembler = MessageReassembler()
+
+        # host drains socket in batches, see `NodeDatagramProtocol`,
+        # and expires partial messages once per batch; here packs
+        # of one message arrive together
+        for packs in messages:
+            reassembler.expire()
+
+            for pack in packs:
+                msg = reassembler_process(reassembler, pack, remote_address)
+
+        return msg
+
+    legacy_t, msg = best_time(run_legacy)
+    assert msg == message_data
+
+    reassembler_t, msg = best_time(run_reassembler)
+    assert msg == message_data
+
+    legacy_rate = n_messages / legacy_t
+    reassembler_rate = n_messages / reassembler_t
+
+    print('packs: {:>3}  legacy: {:>10.1f} msg/s  reassembler: {:>10.1f} msg/s  speedup: {:.2f}x'.format(
+        n_packs,
+        legacy_rate,
+        reassembler_rate,
+        reassembler_rate / legacy_rate,
+    ))
+
+bench(1, 100000)
+bench(10, 10000)
+bench(100, 1000)
@@ -0,0 +1,60 @@
+import os
+import sys
+sys.path.append(os.path.abspath('..'))
+
+import time
+
+from simulator import Simulator
+from contact import Contact
+
+# cluster bootstrapping from one seed node in virtual time, then split
+# in half by partition and healed; prints convergence over virtual time
+N_NODES = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+SEED = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+STEP = 30.0
+
+def report(sim, label, t_wall):
+    sizes = [len(node.rt.contacts) for node in sim.nodes.values()]
+    network = sim.network
+
+    print('{:10} t: {:6.0f} s  green: mean {:7.1f} min {:5} max {:5}  delivered: {:9}  lost: {:7}  partitioned: {:7}  wall: {:6.1f} s'.format(
+        label,
+        sim.loop.time(),
+        sum(sizes) / len(sizes),
+        min(sizes),
+        max(sizes),
+        network.n_delivered,
+        network.n_lost,
+        network.n_partitioned,
+        time.perf_counter() - t_wall,
+    ))
+
+if __name__ == '__main__':
+    t_wall = time.perf_counter()
+
+    with Simulator(seed=SEED, latency=0.02, jitter=0.02, loss=0.01) as sim:
+        seed_node = sim.add_node(bootstrap=True)
+
+        for i in range(N_NODES - 1):
+            node = sim.add_node()
+            node.rt.add_contacts.add(Contact(remote_host=seed_node.listen_host, remote_port=seed_node.listen_port, bootstrap=True))
+
+        for i in range(10):
+            sim.run(STEP)
+            report(sim, 'bootstrap', t_wall)
+
+        nodes = list(sim.nodes.values())
+        addresses = [(node.listen_host, node.listen_port) for node in nodes]
+        sim.network.partition(addresses[:N_NODES // 2], addresses[N_NODES // 2:])
+
+        for i in range(6):
+            sim.run(STEP)
+            report(sim, 'partition', t_wall)
+
+        sim.network.heal()
+
+        for i in range(6):
+            sim.run(STEP)
+            report(sim, 'healed', t_wall)
+
+        print('virtual/wall: {:.1f}x'.format(sim.loop.time() / (time.perf_counter() - t_wall)))
@@ -0,0 +1,51 @@
+import os
+import sys
+sys.path.append(os.path.abspath('..'))
+
+import time
+import random
+import asyncio
+
+from timer_wheel import TimerWheel
+
+# 100 nodes in one loop, each with few periodic jobs, like `examples/nodeN.py`
+N_JOBS = 10000
+DURATION = 5.0
+
+def bench_call_later():
+    loop = asyncio.new_event_loop()
+    n_calls = [0]
+
+    def f(a):
+        n_calls[0] += 1
+        loop.call_later(random.random() * 0.5, f, a + 1)
+
+    for i in range(N_JOBS):
+        loop.call_soon(f, 0)
+
+    t = time.process_time()
+    loop.run_until_complete(asyncio.sleep(DURATION))
+    t = time.process_time() - t
+    loop.close()
+    return n_calls[0], t
+
+def bench_timer_wheel():
+    loop = asyncio.new_event_loop()
+    timers = TimerWheel(loop)
+    n_calls = [0]
+
+    def f():
+        n_calls[0] += 1
+
+    for i in range(N_JOBS):
+        timers.call_periodic(0.0, f, jitter=0.5)
+
+    t = time.process_time()
+    loop.run_until_complete(asyncio.sleep(DURATION))
+    t = time.process_time() - t
+    loop.close()
+    return n_calls[0], t
+
+for name, bench in (('call_later', bench_call_later), ('timer_wheel', bench_timer_wheel)):
+    n_calls, t = bench()
+    print('{:<12} calls: {:>8}  cpu: {:>6.3f} s  cpu/call: {:>6.2f} us'.format(name, n_calls, t, t / n_calls * 1e6))
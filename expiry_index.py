@@ -0,0 +1,62 @@
+__all__ = ['ExpiryIndex']
+
+import heapq
+import itertools
+
+class ExpiryIndex(object):
+    # lazily updated min-heap of contacts ordered by `last_seen`;
+    # handlers only bump `c.last_seen`, stale heap entries are
+    # re-pushed with current value when they reach top of heap;
+    # contacts are kept by their list's keys, e.g. slots of `ContactStore`
+    def __init__(self, contact_list):
+        self.contact_list = contact_list
+        self.heap = [] # [(last_seen, seq, key), ...]
+        self.entries = {} # {key: seq of its latest heap entry}
+        self.seq = itertools.count()
+
+        for c in contact_list:
+            self.push(c)
+
+        contact_list.add_listener(self)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def push(self, c):
+        k = self.contact_list.get_key(c)
+        seq = next(self.seq)
+        self.entries[k] = seq
+        heapq.heappush(self.heap, (c.last_seen or 0.0, seq, k))
+
+    def contact_added(self, contact_list, c):
+        self.push(c)
+
+    def contact_removed(self, contact_list, c):
+        self.entries.pop(contact_list.get_key(c), None)
+
+    def pop_expired(self, now, timeout):
+        # contacts not seen for longer than `timeout`, removed from index
+        expired = []
+        heap = self.heap
+        entries = self.entries
+        get_by_key = self.contact_list.get_by_key
+
+        while heap and heap[0][0] + timeout < now:
+            last_seen, seq, k = heapq.heappop(heap)
+
+            if entries.get(k) != seq:
+                # contact removed, or superseded by newer entry
+                continue
+
+            c = get_by_key(k)
+
+            if c.last_seen is not None and c.last_seen > last_seen:
+                seq = next(self.seq)
+                entries[k] = seq
+                heapq.heappush(heap, (c.last_seen, seq, k))
+                continue
+
+            del entries[k]
+            expired.append(c)
+
+        return expired
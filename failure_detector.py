@@ -0,0 +1,110 @@
+__all__ = ['FailureDetector', 'TimeoutFailureDetector', 'PhiAccrualFailureDetector']
+
+import math
+import collections
+
+class FailureDetector(object):
+    # fed by heartbeats, e.g. arrival of ping responses, of contacts
+    def heartbeat(self, c, t):
+        raise NotImplementedError
+
+    def is_available(self, c, t):
+        raise NotImplementedError
+
+    def remove(self, c):
+        raise NotImplementedError
+
+class TimeoutFailureDetector(FailureDetector):
+    # contact is available until `timeout` seconds pass without heartbeat
+    def __init__(self, timeout=30.0):
+        self.timeout = timeout
+        self.last_heartbeats = {} # {contact: t}
+
+    def heartbeat(self, c, t):
+        self.last_heartbeats[c] = t
+
+    def is_available(self, c, t):
+        last_heartbeat = self.last_heartbeats.get(c)
+
+        if last_heartbeat is None:
+            return False
+
+        return t - last_heartbeat < self.timeout
+
+    def remove(self, c):
+        self.last_heartbeats.pop(c, None)
+
+class HeartbeatHistory(object):
+    __slots__ = ('intervals', 'intervals_sum', 'intervals_squared_sum', 'last_heartbeat')
+
+    def __init__(self, window_size, t):
+        self.intervals = collections.deque(maxlen=window_size)
+        self.intervals_sum = 0.0
+        self.intervals_squared_sum = 0.0
+        self.last_heartbeat = t
+
+    def add(self, interval):
+        if len(self.intervals) == self.intervals.maxlen:
+            dropped = self.intervals[0]
+            self.intervals_sum -= dropped
+            self.intervals_squared_sum -= dropped * dropped
+
+        self.intervals.append(interval)
+        self.intervals_sum += interval
+        self.intervals_squared_sum += interval * interval
+
+class PhiAccrualFailureDetector(FailureDetector):
+    # phi accrual failure detector (Hayashibara et al.), suspicion level
+    # grows with time since last heartbeat relative to observed distribution
+    # of heartbeat intervals; phi 8 means roughly 1e-8 chance of mistake
+    def __init__(self, threshold=8.0, window_size=100, min_std=0.5, acceptable_pause=0.0, first_interval=1.0):
+        self.threshold = threshold
+        self.window_size = window_size
+        self.min_std = min_std
+        self.acceptable_pause = acceptable_pause
+        self.first_interval = first_interval
+        self.histories = {} # {contact: HeartbeatHistory}
+
+    def heartbeat(self, c, t):
+        history = self.histories.get(c)
+
+        if history is None:
+            # seed with guessed interval, so phi is defined from start
+            history = self.histories[c] = HeartbeatHistory(self.window_size, t)
+            history.add(self.first_interval)
+            history.add(self.first_interval * 2.0)
+            return
+
+        interval = t - history.last_heartbeat
+
+        if interval > 0.0:
+            history.add(interval)
+
+        history.last_heartbeat = t
+
+    def phi(self, c, t):
+        history = self.histories.get(c)
+
+        if history is None:
+            return math.inf
+
+        n = len(history.intervals)
+        mean = history.intervals_sum / n
+        variance = max(history.intervals_squared_sum / n - mean * mean, 0.0)
+        std = max(math.sqrt(variance), self.min_std)
+
+        # logistic approximation of normal cumulative distribution,
+        # phi = -log10(1 - cdf(y)) = log10(1 + exp(a)), kept overflow free
+        y = (t - history.last_heartbeat - mean - self.acceptable_pause) / std
+        a = y * (1.5976 + 0.070566 * y * y)
+
+        if a > 0.0:
+            return (a + math.log1p(math.exp(-a))) / math.log(10.0)
+
+        return math.log1p(math.exp(a)) / math.log(10.0)
+
+    def is_available(self, c, t):
+        return self.phi(c, t) < self.threshold
+
+    def remove(self, c):
+        self.histories.pop(c, None)
@@ -0,0 +1,238 @@
+__all__ = ['KBucketRoutingTable']
+
+import time
+import random
+import hashlib
+import collections
+
+from contact_list import ContactList
+from routing_table import RoutingTable
+from expiry_index import ExpiryIndex
+
+# keys are 128 bits long, same as UUID ids
+KEY_BITS = 128
+
+def id_to_key(id):
+    # UUID ids map to their own 128 bits, any other id is hashed
+    if id is None:
+        return None
+
+    if len(id) == 36:
+        try:
+            return int(id.replace('-', ''), 16)
+        except ValueError:
+            pass
+
+    return int.from_bytes(hashlib.sha1(id.encode('utf-8')).digest()[:KEY_BITS // 8], 'big')
+
+class KBucket(object):
+    def __init__(self, k):
+        self.contacts = []
+        self.replacements = collections.deque(maxlen=k)
+        self.last_updated = 0.0
+
+class KBucketContactList(ContactList):
+    def __init__(self, rt):
+        ContactList.__init__(self)
+        self.rt = rt
+        self.items_bucket = {} # {contact: bucket_index}
+
+    def add(self, c):
+        # returns `None` if contact is declined, kept only as replacement
+        key = id_to_key(c.id)
+
+        if key is None:
+            # bootstrap contact without id yet, kept outside of buckets
+            return ContactList.add(self, c)
+
+        i = self.rt.get_bucket_index(key)
+
+        if i is None:
+            # our own id
+            return ContactList.add(self, c)
+
+        bucket = self.rt.buckets[i]
+        now = self.rt.clock()
+
+        if len(bucket.contacts) >= self.rt.k:
+            # prefer long-lived contacts, only stale one gives its place
+            lrs = self.rt.get_stale_contact(bucket, now)
+
+            if lrs is None:
+                # declined, kept as most recently seen replacement
+                for r in bucket.replacements:
+                    if r.id == c.id:
+                        bucket.replacements.remove(r)
+                        break
+
+                bucket.replacements.append(c)
+                return None
+
+            # newcomer takes freed place, no replacement is promoted
+            self.remove(lrs, promote=False)
+            self.rt.remove_contacts.add(lrs)
+
+        ContactList.add(self, c)
+        bucket.contacts.append(c)
+        bucket.last_updated = now
+        self.items_bucket[c] = i
+        return c
+
+    def set_id(self, c, id):
+        if c in self.items_bucket or id_to_key(id) is None:
+            return ContactList.set_id(self, c, id)
+
+        # contact kept outside of buckets until its id was known
+        self.remove(c)
+        c.id = id
+        return self.add(c)
+
+    def remove(self, c_or_id, promote=True):
+        c = ContactList.remove(self, c_or_id)
+        i = self.items_bucket.pop(c, None)
+
+        if i is None:
+            return c
+
+        bucket = self.rt.buckets[i]
+        bucket.contacts.remove(c)
+
+        if not promote:
+            return c
+
+        # promote most recently seen replacement, unless it is
+        # already known again in some list
+        while bucket.replacements:
+            r = bucket.replacements.pop()
+
+            if self.get(r.id) is None and self.rt.add_contacts.get(r.id) is None and self.rt.remove_contacts.get(r.id) is None:
+                self.add(r)
+                break
+
+        return c
+
+class KBucketRoutingTable(RoutingTable):
+    def __init__(self, node_id, k=20, refresh_interval=60.0, stale_after=60.0, max_add_contacts=None, clock=None):
+        RoutingTable.__init__(self)
+        self.node_id = node_id
+        self.node_key = id_to_key(node_id)
+        self.k = k
+
+        # discovered contacts waiting for ping, few are enough
+        # to fill buckets, table has to stay logarithmic
+        if max_add_contacts is None:
+            max_add_contacts = 2 * k
+
+        self.max_add_contacts = max_add_contacts
+
+        # looked up when table is created, so it follows
+        # `time.time` replaced by `Simulator`, as `last_seen` does
+        if clock is None:
+            clock = time.time
+
+        self.refresh_interval = refresh_interval
+        self.stale_after = stale_after
+        self.clock = clock
+
+        # bucket `i` holds contacts at XOR distance [2 ** i, 2 ** (i + 1))
+        self.buckets = [KBucket(k) for i in range(KEY_BITS)]
+        self.contacts = KBucketContactList(self)
+        self.contacts.add_listener(self)
+        self.contacts_expiry = ExpiryIndex(self.contacts)
+
+    def get_bucket_index(self, key):
+        d = key ^ self.node_key
+
+        if not d:
+            return None
+
+        return d.bit_length() - 1
+
+    def get_stale_contact(self, bucket, now):
+        # least recently seen contact of bucket, or `None` if it is fresh
+        lrs = min(bucket.contacts, key=lambda bc: bc.last_seen or 0.0)
+
+        if lrs.last_seen is not None and now - lrs.last_seen < self.stale_after:
+            return None
+
+        return lrs
+
+    def can_add_contact(self, id):
+        # contact which full bucket would decline is not pinged at all,
+        # nor is one already waiting in bucket's replacement cache
+        if len(self.add_contacts) >= self.max_add_contacts:
+            return False
+
+        key = id_to_key(id)
+
+        if key is None:
+            return True
+
+        i = self.get_bucket_index(key)
+
+        if i is None:
+            return False
+
+        bucket = self.buckets[i]
+
+        if any(r.id == id for r in bucket.replacements):
+            return False
+
+        return len(bucket.contacts) < self.k or self.get_stale_contact(bucket, self.clock()) is not None
+
+    def find_closest(self, target_key, k=None):
+        if k is None:
+            k = self.k
+
+        d = target_key ^ self.node_key
+        i = d.bit_length() - 1
+        candidates = []
+
+        # target's bucket is closest, then all buckets below it share
+        # target's highest bit, then buckets above it in increasing order
+        if i >= 0:
+            candidates.extend(self.buckets[i].contacts)
+            self.buckets[i].last_updated = self.clock()
+
+            for j in range(i - 1, -1, -1):
+                candidates.extend(self.buckets[j].contacts)
+
+        j = i + 1
+
+        while len(candidates) < k and j < KEY_BITS:
+            candidates.extend(self.buckets[j].contacts)
+            j += 1
+
+        candidates.sort(key=lambda c: id_to_key(c.id) ^ target_key)
+        return candidates[:k]
+
+    def get_refresh_key(self):
+        # random key from stale bucket, or `None` if every bucket is fresh
+        t = self.clock() - self.refresh_interval
+        stale = [i for i, bucket in enumerate(self.buckets) if bucket.contacts and bucket.last_updated < t]
+
+        if not stale:
+            return None
+
+        i = random.choice(stale)
+        self.buckets[i].last_updated = self.clock()
+        return self.node_key ^ ((1 << i) | random.getrandbits(i))
+
+    def get_discover_contacts(self, requester_id, target_key=None, version=None):
+        # closest contacts are few, they are always sent in full
+        if target_key is None:
+            target_key = id_to_key(requester_id)
+
+        if target_key is None:
+            return self.find_closest(self.node_key)
+
+        return self.find_closest(target_key)
+
+    def get_discover_key(self):
+        key = self.get_refresh_key()
+
+        if key is None:
+            # look up our own neighbourhood
+            key = self.node_key
+
+        return key
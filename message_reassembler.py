@@ -0,0 +1,165 @@
+__all__ = ['MessageReassembler']
+
+import time
+import collections
+
+from wire_codec import PACK_DATA_SIZE
+
+class PartialMessage(object):
+    __slots__ = ('remote_address', 'msg_id', 'deadline', 'buffer', 'view', 'n_packs', 'last_index', 'last_size', 'n_received', 'received')
+
+    def __init__(self, remote_address, msg_id, deadline, msg_size, msg_n_packs):
+        self.remote_address = remote_address
+        self.msg_id = msg_id
+        self.deadline = deadline
+        self.buffer = bytearray(msg_size)
+        self.view = memoryview(self.buffer)
+        self.n_packs = msg_n_packs
+        self.last_index = msg_n_packs - 1
+        self.last_size = msg_size - self.last_index * PACK_DATA_SIZE
+        self.n_received = 0
+        self.received = bytearray((msg_n_packs + 7) >> 3) # bitmap of pack indexes
+
+    def get_size(self):
+        # bytes held, counted against reassembler's budget
+        return len(self.buffer) + len(self.received)
+
+class MessageReassembler(object):
+    def __init__(self, max_age=10.0, max_bytes=64 * 1024 * 1024, max_peer_messages=64, clock=time.monotonic):
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.max_peer_messages = max_peer_messages
+        self.clock = clock
+
+        # time of last `expire`, new messages' deadlines start from it
+        self.now = clock()
+
+        # oldest first, so both expiry and eviction pop from the front
+        self.messages = collections.OrderedDict() # {(remote_address, msg_id): PartialMessage}
+        self.peer_messages = {} # {remote_address: OrderedDict{msg_id: PartialMessage}}
+        self.n_bytes = 0
+
+        # counters
+        self.n_completed = 0
+        self.n_expired = 0
+        self.n_evicted = 0
+        self.n_dropped = 0
+
+    def __len__(self):
+        return len(self.messages)
+
+    def add_pack(self, remote_address, msg_id, msg_size, msg_n_packs, pack_index, pack_data):
+        # returns complete message buffer, or None if message is still partial;
+        # header must describe message split as `wire_codec.build_packs`
+        # does, so bitmap and buffer sizes follow from `msg_size` alone;
+        # clock is not read per pack, caller runs `expire` once per batch
+        m = self.messages.get((remote_address, msg_id))
+        pack_size = len(pack_data)
+
+        if m is None:
+            # header is checked once, when message is created
+            if msg_n_packs != max((msg_size + PACK_DATA_SIZE - 1) // PACK_DATA_SIZE, 1) or pack_index >= msg_n_packs:
+                self.n_dropped += 1
+                return None
+
+            if pack_size != (PACK_DATA_SIZE if pack_index < msg_n_packs - 1 else msg_size - pack_index * PACK_DATA_SIZE):
+                self.n_dropped += 1
+                return None
+
+            m = self.create(remote_address, msg_id, msg_size, msg_n_packs, self.now)
+
+            if m is None:
+                self.n_dropped += 1
+                return None
+        elif pack_index < m.last_index:
+            # all packs but last one are full
+            if pack_size != PACK_DATA_SIZE:
+                self.n_dropped += 1
+                return None
+        elif pack_index > m.last_index or pack_size != m.last_size:
+            self.n_dropped += 1
+            return None
+
+        offset = pack_index * PACK_DATA_SIZE
+        i = pack_index >> 3
+        bit = 1 << (pack_index & 7)
+
+        if m.received[i] & bit:
+            # duplicate pack
+            return None
+
+        m.received[i] |= bit
+        m.view[offset:offset + pack_size] = pack_data
+        m.n_received += 1
+
+        if m.n_received < m.n_packs:
+            return None
+
+        self.remove(remote_address, msg_id)
+        self.n_completed += 1
+        return m.buffer
+
+    def create(self, remote_address, msg_id, msg_size, msg_n_packs, now):
+        size = msg_size + ((msg_n_packs + 7) >> 3)
+
+        if size > self.max_bytes:
+            return None
+
+        # per-peer cap, evict peer's oldest incomplete message
+        peer_messages = self.peer_messages.get(remote_address)
+
+        if peer_messages is None:
+            peer_messages = self.peer_messages[remote_address] = collections.OrderedDict()
+        elif len(peer_messages) >= self.max_peer_messages:
+            oldest_msg_id = next(iter(peer_messages))
+            self.remove(remote_address, oldest_msg_id)
+            self.n_evicted += 1
+
+            # peer's state could be gone with its last message
+            peer_messages = self.peer_messages.setdefault(remote_address, collections.OrderedDict())
+
+        # global byte budget, evict oldest incomplete messages
+        while self.messages and self.n_bytes + size > self.max_bytes:
+            oldest_remote_address, oldest_msg_id = next(iter(self.messages))
+            self.remove(oldest_remote_address, oldest_msg_id)
+            self.n_evicted += 1
+
+        m = PartialMessage(remote_address, msg_id, now + self.max_age, msg_size, msg_n_packs)
+        self.messages[remote_address, msg_id] = m
+        peer_messages[msg_id] = m
+        self.n_bytes += size
+        return m
+
+    def expire(self, now=None):
+        # messages are in order of their deadlines, so only oldest ones
+        # are looked at, and partials of silent peers go away even if
+        # no new message arrives
+        if now is None:
+            now = self.clock()
+
+        self.now = now
+
+        while self.messages:
+            m = next(iter(self.messages.values()))
+
+            if m.deadline > now:
+                break
+
+            self.remove(m.remote_address, m.msg_id)
+            self.n_expired += 1
+
+    def remove(self, remote_address, msg_id):
+        m = self.messages.pop((remote_address, msg_id), None)
+
+        if m is None:
+            return None
+
+        peer_messages = self.peer_messages[remote_address]
+        del peer_messages[msg_id]
+
+        if not peer_messages:
+            del self.peer_messages[remote_address]
+
+        self.n_bytes -= m.get_size()
+        m.view.release()
+        return m
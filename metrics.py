@@ -0,0 +1,169 @@
+__all__ = ['MetricsRegistry', 'Counter', 'Gauge', 'Histogram']
+
+import bisect
+import asyncio
+
+# seconds, from 10 us to 10 s
+LATENCY_BUCKETS = (
+    0.00001, 0.000025, 0.00005,
+    0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0,
+)
+
+# packs per reassembled message
+PACKS_BUCKETS = (2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+class Counter(object):
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, n=1):
+        self.value += n
+
+class Gauge(object):
+    # value is read from `fn` when snapshot is taken,
+    # so hot paths never update gauges
+    __slots__ = ('fn',)
+
+    def __init__(self, fn):
+        self.fn = fn
+
+    @property
+    def value(self):
+        return self.fn()
+
+class Histogram(object):
+    # fixed buckets, `counts[i]` counts values `<= buckets[i]`,
+    # last count is for values above all buckets
+    __slots__ = ('buckets', 'counts', 'sum')
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+class MetricsRegistry(object):
+    # metrics are created once and kept by their users,
+    # updating one is attribute increment without lookups
+    def __init__(self):
+        self.counters = {} # {key: Counter}
+        self.gauges = {} # {key: Gauge}
+        self.histograms = {} # {key: Histogram}
+        self.server = None
+
+    @staticmethod
+    def get_key(name, labels):
+        if not labels:
+            return name
+
+        return '{}{{{}}}'.format(name, ','.join('{}="{}"'.format(k, v) for k, v in sorted(labels.items())))
+
+    def counter(self, name, labels=None):
+        k = self.get_key(name, labels)
+        counter = self.counters.get(k)
+
+        if counter is None:
+            counter = self.counters[k] = Counter()
+
+        return counter
+
+    def gauge(self, name, fn, labels=None):
+        k = self.get_key(name, labels)
+        gauge = self.gauges[k] = Gauge(fn)
+        return gauge
+
+    def histogram(self, name, buckets=LATENCY_BUCKETS, labels=None):
+        k = self.get_key(name, labels)
+        histogram = self.histograms.get(k)
+
+        if histogram is None:
+            histogram = self.histograms[k] = Histogram(buckets)
+
+        return histogram
+
+    def snapshot(self):
+        return {
+            'counters': {k: counter.value for k, counter in self.counters.items()},
+            'gauges': {k: gauge.value for k, gauge in self.gauges.items()},
+            'histograms': {
+                k: {
+                    'buckets': list(histogram.buckets),
+                    'counts': list(histogram.counts),
+                    'count': histogram.count,
+                    'sum': histogram.sum,
+                }
+                for k, histogram in self.histograms.items()
+            },
+        }
+
+    def format_text(self):
+        # prometheus text exposition format
+        lines = []
+        snapshot = self.snapshot()
+
+        for k, value in sorted(snapshot['counters'].items()):
+            lines.append('{} {}'.format(k, value))
+
+        for k, value in sorted(snapshot['gauges'].items()):
+            lines.append('{} {}'.format(k, value))
+
+        for k, histogram in sorted(snapshot['histograms'].items()):
+            name, _, labels = k.partition('{')
+            labels = labels.rstrip('}')
+            labels = labels + ',' if labels else ''
+            n = 0
+
+            for le, count in zip(histogram['buckets'] + ['+Inf'], histogram['counts']):
+                n += count
+                lines.append('{}_bucket{{{}le="{}"}} {}'.format(name, labels, le, n))
+
+            suffix = '{{{}}}'.format(labels.rstrip(',')) if labels else ''
+            lines.append('{}_sum{} {}'.format(name, suffix, histogram['sum']))
+            lines.append('{}_count{} {}'.format(name, suffix, histogram['count']))
+
+        lines.append('')
+        return '\n'.join(lines)
+
+    #
+    # text exposition endpoint
+    #
+    async def start_server(self, host='127.0.0.1', port=9633):
+        # answers every HTTP request with `format_text`
+        self.server = await asyncio.start_server(self.handle_client, host, port)
+        return self.server
+
+    def stop_server(self):
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+
+    async def handle_client(self, reader, writer):
+        try:
+            # request line and headers are not needed
+            while True:
+                line = await reader.readline()
+
+                if not line or line in (b'\r\n', b'\n'):
+                    break
+
+            body = self.format_text().encode('utf-8')
+            writer.write(b'HTTP/1.0 200 OK\r\n')
+            writer.write(b'Content-Type: text/plain; version=0.0.4\r\n')
+            writer.write('Content-Length: {}\r\n\r\n'.format(len(body)).encode('ascii'))
+            writer.write(body)
+            await writer.drain()
+        finally:
+            writer.close()
@@ -1,23 +1,25 @@
 __all__ = ['Node']
 
-import math
 import uuid
 import time
-import struct
-import random
-import socket
 import asyncio
 import marshal
 
-from print_colors import PrintColors
-from contact import Contact
+from node_logging import log_contact, CONTACT_SUSPECTED, CONTACT_REMOVED
+from node_host import NodeHost
+from failure_detector import PhiAccrualFailureDetector
+from dissemination_buffer import DisseminationBuffer
+from pending_requests import PendingRequests
 from routing_table import RoutingTable
+from kbucket_routing_table import KBucketRoutingTable
 from protocol_command import ProtocolCommand
 from ping_protocol_command import PingProtocolCommand
+from ping_req_protocol_command import PingReqProtocolCommand
 from discover_protocol_command import DiscoverProtocolCommand
+import wire_codec
 
 class Node(object):
-    def __init__(self, loop, id=None, listen_host='0.0.0.0', listen_port=6633, bootstrap=False):
+    def __init__(self, loop, id=None, listen_host='0.0.0.0', listen_port=6633, bootstrap=False, kbucket_size=None, columnar_contacts=False, contact_timeout=60.0, remove_contact_timeout=120.0, timers=None, coalesce_delay=0.0, failure_detector=None, reuse_port=False, host=None, dispatch_sample_every=8):
         self.loop = loop
         
         if id == None:
@@ -25,33 +27,96 @@ class Node(object):
 
         self.id = id
 
-        self.listen_host = listen_host
-        self.listen_port = listen_port
+        # socket, buffers and timers, shared by virtual nodes of same host;
+        # `listen_host`, `listen_port`, `timers`, `coalesce_delay` and
+        # `reuse_port` configure node's own host when none is given
+        if host is None:
+            host = NodeHost(
+                loop,
+                listen_host = listen_host,
+                listen_port = listen_port,
+                timers = timers,
+                coalesce_delay = coalesce_delay,
+                reuse_port = reuse_port,
+            )
+
+        self.host = host
+        self.host.add_node(self)
+
+        self.listen_host = host.listen_host
+        self.listen_port = host.listen_port
         self.bootstrap = bootstrap
 
-        # routing table
-        self.rt = RoutingTable()
+        # green contact not seen for `contact_timeout` turns yellow
+        # once failure detector suspects it too,
+        # yellow contact not seen for `remove_contact_timeout` is removed
+        self.contact_timeout = contact_timeout
+        self.remove_contact_timeout = remove_contact_timeout
+
+        # fed by ping round trips
+        if failure_detector is None:
+            failure_detector = PhiAccrualFailureDetector()
+
+        self.failure_detector = failure_detector
+
+        # periodic work of node and its protocol commands
+        self.timers = host.timers
+
+        # registry of host, see `NodeHost.add_metrics`
+        self.metrics = host.metrics
+        self.metric_request_seconds = self.metrics.histogram('request_seconds')
+        self.metric_contacts_suspected = self.metrics.counter('contacts_suspected')
+        self.metric_contacts_removed = self.metrics.counter('contacts_removed')
+        self.metric_messages_unknown = self.metrics.counter('messages_unknown')
+
+        # one of every `dispatch_sample_every` dispatched messages of command
+        # is timed and passed to dispatch listeners, clock reads cost more
+        # than rest of metrics; `1` samples every message
+        if dispatch_sample_every < 1 or dispatch_sample_every & (dispatch_sample_every - 1):
+            raise ValueError('dispatch_sample_every must be power of two, got {}'.format(dispatch_sample_every))
+
+        self.dispatch_sample_mask = dispatch_sample_every - 1
+        self.dispatch_listeners = []
+
+        # awaited requests, see `request`
+        self.pending_requests = PendingRequests(loop, self.timers)
+
+        # (remote_host, remote_port, correlation_id) of request being
+        # dispatched, responses sent while handling it echo its correlation id
+        self.request_context = None
+
+        # routing table, flat unless k-bucket size is given
+        if kbucket_size is None:
+            self.rt = RoutingTable(columnar=columnar_contacts)
+        else:
+            self.rt = KBucketRoutingTable(self.id, k=kbucket_size)
+
+        # membership changes piggybacked on pings,
+        # contacts turning green are spread as alive
+        self.membership_updates = DisseminationBuffer()
+        self.rt.contacts.add_listener(self.membership_updates)
 
         # default protocol_commands
         self.protocol_commands = {}
+        self.protocol_command_metrics = {} # {(major, minor, code): ((req Counter, req Histogram), (res Counter, res Histogram))}
         
-        protocol_command = PingProtocolCommand(self, 1, 0, 0)
-        self.add_protocol_command(protocol_command)
+        self.ping_protocol_command = PingProtocolCommand(self, 1, 0, 0)
+        self.add_protocol_command(self.ping_protocol_command)
         
-        protocol_command = DiscoverProtocolCommand(self, 1, 0, 1)
+        protocol_command = DiscoverProtocolCommand(self, 1, 1, 1)
         self.add_protocol_command(protocol_command)
-        
-        # socket
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.sock.bind((self.listen_host, self.listen_port))
 
-        self.recv_buffer = {} # {(remote_host: remote_port): [socket_data, ...]}
-        self.recv_packs = {} # {msg_id: {pack_index: pack_data}}
-        self.loop.add_reader(self.sock, self.rect_sock_data)
+        # legacy discover, answers peers that do not speak 1.1 yet
+        protocol_command = DiscoverProtocolCommand(self, 1, 0, 1)
+        self.add_protocol_command(protocol_command)
 
+        # indirect probes, sent only to peers speaking 1.1
+        self.ping_req_protocol_command = PingReqProtocolCommand(self, 1, 1, 2)
+        self.add_protocol_command(self.ping_req_protocol_command)
+        
         # tasks
-        self.loop.call_soon(self.check_recv_buffer)
         self.loop.call_soon(self.remove_dead_contacts)
+        self.remove_dead_contacts_timer = self.timers.call_periodic(15.0, self.remove_dead_contacts, jitter=15.0)
 
     def __repr__(self):
         return '<{} id={}>'.format(
@@ -59,6 +124,10 @@ class Node(object):
             self.id,
         )
 
+    async def start(self):
+        # waits until node's host listens, see `NodeHost.start`
+        await self.host.start()
+
     #
     # protocol commands
     #
@@ -80,6 +149,18 @@ class Node(object):
         )
 
         self.protocol_commands[k] = protocol_command
+
+        # same command of virtual nodes shares metrics,
+        # indexed by message type
+        command = '{}.{}.{}'.format(*k)
+        labels_req = {'command': command, 'type': 'req'}
+        labels_res = {'command': command, 'type': 'res'}
+
+        self.protocol_command_metrics[k] = (
+            (self.metrics.counter('dispatched', labels_req), self.metrics.histogram('dispatch_seconds', labels=labels_req)),
+            (self.metrics.counter('dispatched', labels_res), self.metrics.histogram('dispatch_seconds', labels=labels_res)),
+        )
+
         protocol_command.start()
 
     def remove_protocol_command(self, protocol_command):
@@ -92,146 +173,165 @@ class Node(object):
         )
 
         del self.protocol_commands[k]
+        del self.protocol_command_metrics[k]
+
+    def add_dispatch_listener(self, listener):
+        # listener is notified of sampled dispatches by
+        # `dispatch_started(node, protocol_command, protocol_message_type, remote_host, remote_port)`
+        # and `dispatch_finished(node, protocol_command, protocol_message_type, remote_host, remote_port,
+        # payload_size, decode_seconds, handle_seconds)`, see `DispatchProfiler`
+        self.dispatch_listeners.append(listener)
+
+    def remove_dispatch_listener(self, listener):
+        self.dispatch_listeners.remove(listener)
 
     #
     # tasks
     #
     def remove_dead_contacts(self):
-        # print(PrintColors.VIOLET, 'remove_dead_contacts:', self, len(self.rt.contacts), len(self.rt.remove_contacts), PrintColors.END)
+        # logger.debug('remove_dead_contacts: %s %s %s', self, len(self.rt.contacts), len(self.rt.remove_contacts))
         t = time.time()
-        move_remove_contacts = []
-        remove_remove_contacts = []
 
-        for c in self.rt.contacts:
+        # only contacts past their deadline are touched
+        for c in self.rt.contacts_expiry.pop_expired(t, self.contact_timeout):
             if c.id == self.id:
                 continue
 
-            if t - c.last_seen > 15.0 + len(self.rt.contacts) + len(self.rt.add_contacts):
-                move_remove_contacts.append(c)
+            if self.failure_detector.is_available(c, t) or self.ping_req_protocol_command.probe(c):
+                # slow but steady peer, or indirect probe just started,
+                # look again later
+                self.rt.contacts_expiry.push(c)
+                continue
 
-        for c in move_remove_contacts:
             self.rt.contacts.remove(c)
             self.rt.remove_contacts.add(c)
-            print(PrintColors.YELLOW + 'remove_dead_contacts:', self, c, PrintColors.END)
-
-        for c in self.rt.remove_contacts:
-            if t - c.last_seen > 30.0 + (len(self.rt.contacts) + len(self.rt.add_contacts)) * 2.0:
-                remove_remove_contacts.append(c)
+            self.membership_updates.add(self.membership_updates.SUSPECT, c)
+            self.metric_contacts_suspected.value += 1
+            log_contact(CONTACT_SUSPECTED, 'REMOVE DEAD CONTACTS', self, c)
 
-        for c in remove_remove_contacts:
+        for c in self.rt.remove_contacts_expiry.pop_expired(t, self.remove_contact_timeout):
             self.rt.remove_contacts.remove(c)
-            print(PrintColors.RED + 'remove_dead_contacts:', self, c, PrintColors.END)
-
-        self.loop.call_later(15.0 + random.random() * 15.0, self.remove_dead_contacts)
+            self.failure_detector.remove(c)
+            self.membership_updates.add(self.membership_updates.DEAD, c)
+            self.metric_contacts_removed.value += 1
+            log_contact(CONTACT_REMOVED, 'REMOVE DEAD CONTACTS', self, c)
 
     #
-    # socket
+    # message
     #
-    def check_recv_buffer(self):
-        for remote_address, recv_buffer in self.recv_buffer.items():
-            if not len(recv_buffer):
-                continue
+    def build_message(self, protocol_major_version, protocol_minor_version, protocol_message_type, protocol_command_code, obj):
+        return wire_codec.build_message(protocol_major_version, protocol_minor_version, protocol_message_type, protocol_command_code, obj)
 
-            self.process_sock_data(b'', remote_address)
+    def send_message(self, message_data, remote_host, remote_port, remote_id=None, correlation_id=None, extend=False):
+        # `remote_id` routes message to node hosted at remote address
+        request_context = self.request_context
 
-        self.loop.call_later(random.random(), self.check_recv_buffer)
+        if correlation_id is None and request_context is not None:
+            request_remote_host, request_remote_port, request_correlation_id = request_context
 
-    def rect_sock_data(self):
-        data, remote_address = self.sock.recvfrom(1500)
-        self.process_sock_data(data, remote_address)
+            if message_data[2] == ProtocolCommand.PROTOCOL_RES and request_remote_host == remote_host and request_remote_port == remote_port:
+                correlation_id = request_correlation_id
 
-    def process_sock_data(self, data, remote_address):
-        remote_host, remote_port = remote_address
+        self.host.send_message(message_data, remote_host, remote_port, remote_id, correlation_id, extend)
 
-        if remote_address not in self.recv_buffer:
-            self.recv_buffer[remote_address] = []
+    async def request(self, protocol_command, c, *args, timeout=5.0, retries=0, **kwargs):
+        # sends request of `protocol_command` to contact `c` and returns
+        # its response, which is passed to `protocol_command.on_res` too;
+        # raises `asyncio.TimeoutError` if none of `retries + 1` attempts
+        # is answered within `timeout` seconds; peers which do not speak
+        # header extensions can not be awaited
+        message_data = self.build_message(
+            protocol_command.protocol_major_version,
+            protocol_command.protocol_minor_version,
+            ProtocolCommand.PROTOCOL_REQ,
+            protocol_command.protocol_command_code,
+            (args, kwargs),
+        )
 
-        self.recv_buffer[remote_address].append(data)
-        recv_buffer = b''.join(self.recv_buffer[remote_address])
-        pack_header_size = struct.calcsize('!QIIII')
+        pending_request = self.pending_requests.create()
 
-        if len(recv_buffer) < pack_header_size:
-            return
+        try:
+            for i in range(retries + 1):
+                pending_request.sent_at = self.loop.time()
 
-        del self.recv_buffer[remote_address][:]
-        pack_header = recv_buffer[:pack_header_size]
-        recv_buffer_rest = recv_buffer[pack_header_size:]
-        msg_id, msg_size, msg_n_packs, pack_size, pack_index = struct.unpack('!QIIII', pack_header)
+                # every attempt carries correlation id, even to peer
+                # which did not send extended header yet
+                self.send_message(message_data, c.remote_host, c.remote_port, c.id, pending_request.correlation_id, extend=True)
 
-        if pack_size > len(recv_buffer_rest):
-            self.recv_buffer[remote_address].append(pack_header)
-            self.recv_buffer[remote_address].append(recv_buffer_rest)
-            return
+                try:
+                    obj = await asyncio.wait_for(asyncio.shield(pending_request.future), timeout)
+                except asyncio.TimeoutError:
+                    continue
 
-        pack_data = recv_buffer_rest[:pack_size]
-        rest_data = recv_buffer_rest[pack_size:]
-        self.recv_buffer[remote_address].append(rest_data)
+                # round trip of last attempt
+                self.metric_request_seconds.observe(self.loop.time() - pending_request.sent_at)
+                return obj
 
-        if msg_id not in self.recv_packs:
-            self.recv_packs[msg_id] = {}
+            self.pending_requests.n_timeouts += 1
+            raise asyncio.TimeoutError('No response from {} after {} attempts'.format(c, retries + 1))
+        finally:
+            self.pending_requests.finish(pending_request)
 
-        self.recv_packs[msg_id][pack_index] = pack_data
+    def dispatch_message(self, protocol_version_major, protocol_version_minor, protocol_message_type, protocol_command_code, message_data, remote_host, remote_port, correlation_id=None):
+        # message without header, as parsed by host
+        k = (protocol_version_major, protocol_version_minor, protocol_command_code)
+        protocol_command = self.protocol_commands.get(k)
 
-        if len(self.recv_packs[msg_id]) < msg_n_packs:
+        if protocol_command is None or protocol_message_type > ProtocolCommand.PROTOCOL_RES:
+            # command or version this node does not speak
+            self.metric_messages_unknown.value += 1
             return
 
-        msg = b''.join([self.recv_packs[msg_id][i] for i in range(msg_n_packs)])
-        del self.recv_packs[msg_id]
-        self.parse_message(msg, remote_host, remote_port)
+        metric_dispatched, metric_dispatch_seconds = self.protocol_command_metrics[k][protocol_message_type]
+        metric_dispatched.value += 1
+        sampled = not (metric_dispatched.value & self.dispatch_sample_mask)
 
-    #
-    # message
-    #
-    def build_message(self, protocol_major_version, protocol_minor_version, protocol_message_type, protocol_command_code, obj):
-        obj_data = marshal.dumps(obj)
+        if sampled:
+            for listener in self.dispatch_listeners:
+                listener.dispatch_started(self, protocol_command, protocol_message_type, remote_host, remote_port)
 
-        message_data = struct.pack(
-            '!BBBB',
-            protocol_major_version,
-            protocol_minor_version,
-            protocol_message_type,
-            protocol_command_code,
-        )
+            t0 = time.perf_counter()
+            t1 = None
 
-        message_data += obj_data
-        return message_data
-
-    def send_message(self, message_data, remote_host, remote_port):
-        for pack in self.build_packs(message_data):
-            self.sock.sendto(pack, (remote_host, remote_port))
-
-    def build_packs(self, message_data):
-        message_id = random.randint(0, 2 ** 64)
-        step = 1400 - 3 * 4
-        pack_index = 0
-        message_n_packs = int(math.ceil(len(message_data) / step))
-
-        for s in range(0, len(message_data), step):
-            e = s + step
-            pack_data = message_data[s:e]
-            pack = self.build_pack(message_id, len(message_data), message_n_packs, len(pack_data), pack_index, pack_data)
-            pack_index += 1
-            yield pack
-
-    def build_pack(self, message_id, message_size, message_n_packs, pack_size, pack_index, pack_data):
-        pack = struct.pack('!QIIII', message_id, message_size, message_n_packs, pack_size, pack_index)
-        pack += pack_data
-        return pack
-
-    def parse_message(self, message, remote_host, remote_port):
-        message_header_size = struct.calcsize('!BBBB')
-        message_header = message[:message_header_size]
-        message_data = message[message_header_size:]
-        protocol_version_major, protocol_version_minor, protocol_message_type, protocol_command_code = struct.unpack('!BBBB', message_header)
-        protocol_command = self.get_protocol_command(protocol_version_major, protocol_version_minor, protocol_command_code)
-
-        if protocol_message_type == ProtocolCommand.PROTOCOL_REQ:
-            if message_data:
-                args, kwargs = marshal.loads(message_data)
+        try:
+            # decode
+            if protocol_message_type == ProtocolCommand.PROTOCOL_REQ:
+                if message_data:
+                    args, kwargs = marshal.loads(message_data)
+                else:
+                    args, kwargs = (), {}
             else:
-                args, kwargs = (), {}
-
-            protocol_command.on_req(remote_host, remote_port, *args, **kwargs)
-        elif protocol_message_type == ProtocolCommand.PROTOCOL_RES:
-            obj = marshal.loads(message_data)
-            protocol_command.on_res(remote_host, remote_port, obj)
+                obj = marshal.loads(message_data)
+
+                # duplicate response is decoded, but not handled
+                duplicate = correlation_id is not None and not self.pending_requests.resolve(correlation_id, obj)
+
+            if sampled:
+                t1 = time.perf_counter()
+
+            # handle
+            if protocol_message_type == ProtocolCommand.PROTOCOL_REQ:
+                if correlation_id is None:
+                    protocol_command.on_req(remote_host, remote_port, *args, **kwargs)
+                else:
+                    self.request_context = (remote_host, remote_port, correlation_id)
+
+                    try:
+                        protocol_command.on_req(remote_host, remote_port, *args, **kwargs)
+                    finally:
+                        self.request_context = None
+            elif not duplicate:
+                protocol_command.on_res(remote_host, remote_port, obj)
+        finally:
+            # listeners see failed dispatches too, profiler has to stop
+            if sampled:
+                t2 = time.perf_counter()
+
+                if t1 is None:
+                    # failed in decode
+                    t1 = t2
+
+                metric_dispatch_seconds.observe(t2 - t0)
+
+                for listener in self.dispatch_listeners:
+                    listener.dispatch_finished(self, protocol_command, protocol_message_type, remote_host, remote_port, len(message_data), t1 - t0, t2 - t1)
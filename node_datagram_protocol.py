@@ -0,0 +1,40 @@
+__all__ = ['NodeDatagramProtocol']
+
+import asyncio
+
+class NodeDatagramProtocol(asyncio.DatagramProtocol):
+    RECV_SIZE = 1500
+    MAX_BATCH_SIZE = 256
+
+    def __init__(self, host):
+        self.host = host
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.host.connection_made(transport)
+
+    def connection_lost(self, exc):
+        self.transport = None
+        self.host.connection_lost(exc)
+
+    def datagram_received(self, data, remote_address):
+        # transport reads exactly one datagram per readiness callback,
+        # so drain whatever else is already queued on the socket
+        datagrams = [(data, remote_address)]
+        sock = self.host.sock
+
+        try:
+            while len(datagrams) < self.MAX_BATCH_SIZE:
+                datagrams.append(sock.recvfrom(self.RECV_SIZE))
+        except (BlockingIOError, InterruptedError):
+            pass
+        except OSError as e:
+            # e.g. ICMP port unreachable reported on the next recvfrom
+            pass
+
+        self.host.process_sock_datagrams(datagrams)
+
+    def error_received(self, exc):
+        # UDP peers come and go, ICMP errors are expected
+        pass
@@ -0,0 +1,336 @@
+__all__ = ['NodeHost']
+
+import socket
+
+from metrics import MetricsRegistry, PACKS_BUCKETS
+from timer_wheel import TimerWheel
+from message_reassembler import MessageReassembler
+from node_datagram_protocol import NodeDatagramProtocol
+from node_logging import logger
+import wire_codec
+
+class NodeHost(object):
+    # owns UDP socket, receive and send buffers and timers shared by nodes
+    # listening on same address; messages are dispatched to node by
+    # destination id in message header, messages without one go to first node
+    def __init__(self, loop, listen_host='0.0.0.0', listen_port=6633, timers=None, coalesce_delay=0.0, reuse_port=False, max_legacy_addresses=65536, metrics=None, transport=None):
+        self.loop = loop
+        self.listen_host = listen_host
+        self.listen_port = listen_port
+
+        # periodic work of hosted nodes and their protocol commands,
+        # wheel can be shared by many hosts running in same loop
+        if timers is None:
+            timers = TimerWheel(loop)
+
+        self.timers = timers
+
+        # packs sent to same peer within `coalesce_delay` seconds
+        # share datagrams, `0.0` coalesces within loop iteration
+        self.coalesce_delay = coalesce_delay
+
+        self.nodes = {} # {id: Node}
+        self.default_node = None
+
+        # peers which sent extended headers, and peers which did not
+        # answer extended one yet, legacy peers ignore those; see `send_message`
+        self.extended_addresses = {} # {(remote_host, remote_port): True}
+        self.legacy_addresses = {} # {(remote_host, remote_port): True}
+        self.max_legacy_addresses = max_legacy_addresses
+
+        self.recv_packs = MessageReassembler(clock=self.loop.time)
+
+        # shared by hosted nodes, gauges sum over them; registry can be
+        # shared by hosts too, then their gauges differ by `host` label
+        if metrics is None:
+            metrics = MetricsRegistry()
+
+        self.metrics = metrics
+
+        self.transport = None
+        self.send_queues = {} # {(remote_host, remote_port): [pack, ...]}
+        self.send_queue_scheduled = False
+
+        if transport is not None:
+            # given transport, e.g. of simulated network, see `Simulator`;
+            # it passes received datagrams to `process_sock_datagrams`
+            self.sock = None
+            self.endpoint_task = None
+            self.add_metrics()
+            self.loop.call_soon(self.connection_made, transport)
+            return
+
+        # socket
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+
+        if reuse_port:
+            # several worker processes share `listen_port`, see `NodeWorkers`
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+
+        self.sock.bind((self.listen_host, self.listen_port))
+
+        if not self.listen_port:
+            # ephemeral port, nodes and metrics need the bound one
+            self.listen_port = self.sock.getsockname()[1]
+
+        self.add_metrics()
+
+        # kept, so endpoint is not collected while pending
+        # and its failure is raised by `start`
+        self.endpoint_task = self.loop.create_task(self.loop.create_datagram_endpoint(
+            lambda: NodeDatagramProtocol(self),
+            sock=self.sock,
+        ))
+
+    def __repr__(self):
+        return '<{} {}:{} nodes={}>'.format(
+            self.__class__.__name__,
+            self.listen_host,
+            self.listen_port,
+            len(self.nodes),
+        )
+
+    #
+    # metrics
+    #
+    def add_metrics(self):
+        metrics = self.metrics
+
+        # hot path keeps metrics, so updates are attribute increments
+        self.metric_datagrams_in = metrics.counter('datagrams_in')
+        self.metric_datagrams_failed = metrics.counter('datagrams_failed')
+        self.metric_bytes_in = metrics.counter('bytes_in')
+        self.metric_packs_in = metrics.counter('packs_in')
+        self.metric_message_packs_in = metrics.histogram('message_packs_in', PACKS_BUCKETS)
+        self.metric_messages_in = metrics.counter('messages_in')
+        self.metric_messages_malformed = metrics.counter('messages_malformed')
+        self.metric_messages_unroutable = metrics.counter('messages_unroutable')
+        self.metric_messages_out = metrics.counter('messages_out')
+        self.metric_packs_out = metrics.counter('packs_out')
+        self.metric_datagrams_out = metrics.counter('datagrams_out')
+        self.metric_bytes_out = metrics.counter('bytes_out')
+
+        # gauges are per host, registry keeps only last gauge of key
+        host_labels = {'host': '{}:{}'.format(self.listen_host, self.listen_port)}
+
+        # reassembly, read from reassembler when snapshot is taken
+        recv_packs = self.recv_packs
+        metrics.gauge('reassembly_messages', lambda: len(recv_packs), host_labels)
+        metrics.gauge('reassembly_bytes', lambda: recv_packs.n_bytes, host_labels)
+        metrics.gauge('reassembly_completed', lambda: recv_packs.n_completed, host_labels)
+        metrics.gauge('reassembly_expired', lambda: recv_packs.n_expired, host_labels)
+        metrics.gauge('reassembly_evicted', lambda: recv_packs.n_evicted, host_labels)
+        metrics.gauge('reassembly_dropped', lambda: recv_packs.n_dropped, host_labels)
+
+        # routing tables and requests of hosted nodes
+        nodes = self.nodes
+        metrics.gauge('nodes', lambda: len(nodes), host_labels)
+        metrics.gauge('contacts', lambda: sum(len(n.rt.contacts) for n in nodes.values()), dict(host_labels, state='green'))
+        metrics.gauge('contacts', lambda: sum(len(n.rt.add_contacts) for n in nodes.values()), dict(host_labels, state='blue'))
+        metrics.gauge('contacts', lambda: sum(len(n.rt.remove_contacts) for n in nodes.values()), dict(host_labels, state='yellow'))
+        metrics.gauge('membership_updates', lambda: sum(len(n.membership_updates) for n in nodes.values()), host_labels)
+        metrics.gauge('pending_requests', lambda: sum(len(n.pending_requests) for n in nodes.values()), host_labels)
+        metrics.gauge('requests_timed_out', lambda: sum(n.pending_requests.n_timeouts for n in nodes.values()), host_labels)
+        metrics.gauge('responses_duplicate', lambda: sum(n.pending_requests.n_duplicates for n in nodes.values()), host_labels)
+        metrics.gauge('extended_addresses', lambda: len(self.extended_addresses), host_labels)
+        metrics.gauge('legacy_addresses', lambda: len(self.legacy_addresses), host_labels)
+        metrics.gauge('timers', lambda: len(self.timers), host_labels)
+
+    #
+    # nodes
+    #
+    def add_node(self, node):
+        if node.id in self.nodes:
+            raise ValueError('Node with id={} is already hosted'.format(node.id))
+
+        self.nodes[node.id] = node
+
+        if self.default_node is None:
+            self.default_node = node
+
+    def remove_node(self, node):
+        del self.nodes[node.id]
+
+        if self.default_node is node:
+            self.default_node = next(iter(self.nodes.values()), None)
+
+    #
+    # socket
+    #
+    async def start(self):
+        # waits until endpoint is ready; packs sent before are queued
+        if self.endpoint_task is not None:
+            await self.endpoint_task
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+        # packs queued before the endpoint was ready
+        self.flush_send_queue()
+
+    def connection_lost(self, exc):
+        self.transport = None
+
+    def process_sock_datagrams(self, datagrams):
+        # clock is read and stale partial messages expired once per batch
+        self.recv_packs.expire()
+
+        # malformed datagram, or failing handler, drops only its own datagram
+        for data, remote_address in datagrams:
+            try:
+                self.process_sock_data(data, remote_address)
+            except Exception:
+                self.metric_datagrams_failed.value += 1
+                logger.warning('failed datagram from %s:%s', remote_address[0], remote_address[1], exc_info=True)
+
+    def process_sock_data(self, data, remote_address):
+        # every datagram carries whole packs, so it is processed right away
+        # and nothing is kept per remote address between datagrams
+        pack_header_size = wire_codec.PACK_HEADER.size
+        data_view = memoryview(data)
+        data_size = len(data)
+        offset = 0
+        n_packs = 0
+
+        while data_size - offset >= pack_header_size:
+            msg_id, msg_size, msg_n_packs, pack_size, pack_index = wire_codec.PACK_HEADER.unpack_from(data, offset)
+            pack_start = offset + pack_header_size
+            pack_end = pack_start + pack_size
+
+            if pack_end > data_size:
+                break
+
+            offset = pack_end
+            n_packs += 1
+
+            if msg_n_packs == 1 and pack_size == msg_size and pack_index == 0:
+                # single pack fast path, message is the pack itself
+                self.parse_message(data_view[pack_start:pack_end], remote_address)
+                continue
+
+            msg = self.recv_packs.add_pack(remote_address, msg_id, msg_size, msg_n_packs, pack_index, data_view[pack_start:pack_end])
+
+            if msg is not None:
+                self.metric_message_packs_in.observe(msg_n_packs)
+                self.parse_message(msg, remote_address)
+
+        # truncated trailing pack, if any, is dropped
+        self.metric_datagrams_in.value += 1
+        self.metric_bytes_in.value += data_size
+        self.metric_packs_in.value += n_packs
+
+    #
+    # message
+    #
+    def parse_message(self, message, remote_address):
+        if len(message) < wire_codec.MESSAGE_HEADER.size:
+            self.metric_messages_malformed.value += 1
+            return
+
+        protocol_major_version, protocol_minor_version, protocol_message_type, protocol_command_code, has_destination_id, destination_id, correlation_id, offset = wire_codec.parse_message_header(message)
+        self.metric_messages_in.value += 1
+
+        # plain header proves nothing, new peer sends it too
+        # while it does not know us, see `send_message`
+        if has_destination_id and remote_address not in self.extended_addresses:
+            self.legacy_addresses.pop(remote_address, None)
+            self.add_address(self.extended_addresses, remote_address)
+
+        if destination_id is None:
+            node = self.default_node
+        else:
+            node = self.nodes.get(destination_id)
+
+        if node is None:
+            self.metric_messages_unroutable.value += 1
+            return
+
+        remote_host, remote_port = remote_address
+        message_data = memoryview(message)[offset:]
+        node.dispatch_message(protocol_major_version, protocol_minor_version, protocol_message_type, protocol_command_code, message_data, remote_host, remote_port, correlation_id)
+
+    def send_message(self, message_data, remote_host, remote_port, remote_id=None, correlation_id=None, extend=False):
+        remote_address = (remote_host, remote_port)
+
+        # peer which never sent extended header gets plain one, which any
+        # peer understands, if there is no destination or correlation id
+        # to carry; otherwise it gets one extended message, which new peer
+        # answers with extended header, and legacy one ignores, then it
+        # gets plain messages; `extend` forces extended header, e.g. for
+        # request awaiting response, which plain message can not get
+        if remote_address in self.extended_addresses or extend:
+            message_data = wire_codec.extend_message_header(message_data, remote_id, correlation_id)
+        elif remote_address not in self.legacy_addresses and (remote_id is not None or correlation_id is not None):
+            self.add_address(self.legacy_addresses, remote_address)
+            message_data = wire_codec.extend_message_header(message_data, remote_id, correlation_id)
+
+        send_queue = self.send_queues.get(remote_address)
+
+        if send_queue is None:
+            send_queue = self.send_queues[remote_address] = []
+
+        packs = wire_codec.build_packs(message_data)
+        send_queue.extend(packs)
+        self.metric_messages_out.value += 1
+        self.metric_packs_out.value += len(packs)
+
+        if not self.send_queue_scheduled:
+            self.send_queue_scheduled = True
+
+            if self.coalesce_delay:
+                self.loop.call_later(self.coalesce_delay, self.flush_send_queue)
+            else:
+                self.loop.call_soon(self.flush_send_queue)
+
+    def add_address(self, addresses, remote_address):
+        # bounded, oldest address is forgotten first
+        if len(addresses) >= self.max_legacy_addresses:
+            del addresses[next(iter(addresses))]
+
+        addresses[remote_address] = True
+
+    def flush_send_queue(self):
+        self.send_queue_scheduled = False
+
+        if self.transport is None:
+            return
+
+        send_queues = self.send_queues
+        self.send_queues = {}
+        n_datagrams = 0
+        n_bytes = 0
+
+        # packs to same peer are packed back to back into datagrams,
+        # receiver walks every pack of datagram in `process_sock_data`;
+        # transport buffers internally when the socket would block
+        for remote_address, packs in send_queues.items():
+            if remote_address not in self.extended_addresses:
+                # peer which never sent extended header could be legacy
+                # one, which takes single pack per datagram
+                for pack in packs:
+                    self.transport.sendto(pack, remote_address)
+                    n_bytes += len(pack)
+
+                n_datagrams += len(packs)
+                continue
+
+            datagram = None
+
+            for pack in packs:
+                if datagram is None:
+                    datagram = pack
+                elif len(datagram) + len(pack) <= wire_codec.MAX_DATAGRAM_SIZE:
+                    datagram += pack
+                else:
+                    self.transport.sendto(datagram, remote_address)
+                    n_datagrams += 1
+                    n_bytes += len(datagram)
+                    datagram = pack
+
+            self.transport.sendto(datagram, remote_address)
+            n_datagrams += 1
+            n_bytes += len(datagram)
+
+        self.metric_datagrams_out.value += n_datagrams
+        self.metric_bytes_out.value += n_bytes
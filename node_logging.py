@@ -0,0 +1,148 @@
+__all__ = [
+    'logger',
+    'log_contact',
+    'RateLimitFilter',
+    'ConsoleFormatter',
+    'setup_logging',
+    'CONTACT_ADDED',
+    'CONTACT_SUSPECTED',
+    'CONTACT_REMOVED',
+]
+
+import sys
+import time
+import queue
+import logging
+import logging.handlers
+
+from print_colors import PrintColors
+
+# events of routing table, passed as `event` of log record
+CONTACT_ADDED = 'contact_added'
+CONTACT_SUSPECTED = 'contact_suspected'
+CONTACT_REMOVED = 'contact_removed'
+
+EVENT_TITLES = {
+    CONTACT_ADDED: 'new contact',
+    CONTACT_SUSPECTED: 'suspect contact',
+    CONTACT_REMOVED: 'dead contact',
+}
+
+EVENT_LEVELS = {
+    CONTACT_ADDED: logging.INFO,
+    CONTACT_SUSPECTED: logging.WARNING,
+    CONTACT_REMOVED: logging.WARNING,
+}
+
+EVENT_COLORS = {
+    CONTACT_ADDED: PrintColors.GREEN,
+    CONTACT_SUSPECTED: PrintColors.YELLOW,
+    CONTACT_REMOVED: PrintColors.RED,
+}
+
+LEVEL_COLORS = {
+    logging.DEBUG: PrintColors.VIOLET,
+    logging.INFO: PrintColors.BLUE,
+    logging.WARNING: PrintColors.YELLOW,
+    logging.ERROR: PrintColors.RED,
+    logging.CRITICAL: PrintColors.RED,
+}
+
+# library logger, silent until application configures logging,
+# see `setup_logging`
+logger = logging.getLogger('routingtable')
+logger.addHandler(logging.NullHandler())
+
+def log_contact(event, source, node, c):
+    # called from packet handlers, record is created only if level is
+    # enabled, and message is formatted only if record passes filters
+    level = EVENT_LEVELS[event]
+
+    if not logger.isEnabledFor(level):
+        return
+
+    logger.log(level, '%s [%s]: %s %s', EVENT_TITLES[event], source, node, c, extra={
+        'event': event,
+        'source': source,
+        'node_id': node.id,
+        'contact_id': c.id,
+    })
+
+class RateLimitFilter(logging.Filter):
+    # token bucket per event type, at most `burst` records at once and
+    # `rate` records per second after that; next passed record of event
+    # type carries number of records suppressed before it
+    def __init__(self, rate=10.0, burst=100, clock=time.monotonic):
+        logging.Filter.__init__(self)
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.buckets = {} # {event: [tokens, updated_at, n_suppressed]}
+        self.n_suppressed = 0
+
+    def filter(self, record):
+        # records without event are limited by their message template
+        event = getattr(record, 'event', record.msg)
+        t = self.clock()
+        bucket = self.buckets.get(event)
+
+        if bucket is None:
+            bucket = self.buckets[event] = [float(self.burst), t, 0]
+
+        tokens = min(bucket[0] + (t - bucket[1]) * self.rate, float(self.burst))
+        bucket[1] = t
+
+        if tokens < 1.0:
+            bucket[0] = tokens
+            bucket[2] += 1
+            self.n_suppressed += 1
+            return False
+
+        bucket[0] = tokens - 1.0
+        record.n_suppressed = bucket[2]
+        bucket[2] = 0
+        return True
+
+class ConsoleFormatter(logging.Formatter):
+    # colors by event type, or by level for records without one;
+    # only used when writing to interactive terminal
+    def __init__(self, fmt='%(asctime)s %(levelname)s %(message)s', datefmt=None, colors=True):
+        logging.Formatter.__init__(self, fmt, datefmt)
+        self.colors = colors
+
+    def format(self, record):
+        s = logging.Formatter.format(self, record)
+        n_suppressed = getattr(record, 'n_suppressed', 0)
+
+        if n_suppressed:
+            s = '{} (+{} suppressed)'.format(s, n_suppressed)
+
+        if self.colors:
+            color = EVENT_COLORS.get(getattr(record, 'event', None)) or LEVEL_COLORS.get(record.levelno, '')
+            s = color + s + PrintColors.END
+
+        return s
+
+def setup_logging(level=logging.INFO, stream=None, rate=10.0, burst=100, colors=None):
+    # handlers only put records into queue, thread of returned
+    # `QueueListener` writes them, so slow terminal does not block loop;
+    # call `stop()` of listener to flush queue on exit
+    if stream is None:
+        stream = sys.stderr
+
+    if colors is None:
+        colors = hasattr(stream, 'isatty') and stream.isatty()
+
+    stream_handler = logging.StreamHandler(stream)
+    stream_handler.setFormatter(ConsoleFormatter(colors=colors))
+
+    q = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(q)
+    queue_handler.addFilter(RateLimitFilter(rate, burst))
+
+    logger.addHandler(queue_handler)
+    logger.setLevel(level)
+
+    listener = logging.handlers.QueueListener(q, stream_handler, respect_handler_level=True)
+    listener.start()
+    return listener
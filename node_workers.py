@@ -0,0 +1,284 @@
+__all__ = ['NodeWorkers', 'RoutingTableSync']
+
+import time
+import uuid
+import queue
+import asyncio
+import threading
+import multiprocessing
+import multiprocessing.connection
+
+from contact import Contact
+from node import Node
+from routing_table import RoutingTable
+
+CONTACT_LISTS = ('contacts', 'add_contacts', 'remove_contacts')
+
+def get_contact(contact_list, c_id, remote_address):
+    if c_id is not None:
+        return contact_list.get(c_id)
+
+    return contact_list.get(remote_address)
+
+def apply_ops(rt, ops):
+    # ops are applied idempotently, same op can come from several workers
+    for op in ops:
+        if op[0] == 'add':
+            _, name, state, last_seen, protocol_minor_version = op
+            contact_list = getattr(rt, name)
+            c = get_contact(contact_list, state['id'], (state['remote_host'], state['remote_port']))
+
+            if c is None:
+                c = Contact(**state)
+                c.last_seen = last_seen
+                c.protocol_minor_version = protocol_minor_version
+                contact_list.add(c)
+            elif last_seen is not None and (c.last_seen is None or c.last_seen < last_seen):
+                c.last_seen = last_seen
+        elif op[0] == 'remove':
+            _, name, c_id, remote_address = op
+            contact_list = getattr(rt, name)
+            c = get_contact(contact_list, c_id, tuple(remote_address))
+
+            if c is not None:
+                contact_list.remove(c)
+        elif op[0] == 'seen':
+            _, last_seens = op
+
+            for c_id, last_seen in last_seens:
+                c = rt.contacts.get(c_id)
+
+                if c is not None and (c.last_seen is None or c.last_seen < last_seen):
+                    c.last_seen = last_seen
+
+def get_snapshot_ops(rt):
+    ops = []
+
+    for name in CONTACT_LISTS:
+        for c in getattr(rt, name):
+            ops.append(('add', name, c.__getstate__(), c.last_seen, c.protocol_minor_version))
+
+    return ops
+
+class RoutingTableSync(object):
+    # replicates contacts added to/removed from worker's routing table
+    # through single writer, which broadcasts them to other workers;
+    # ops are collected during loop iteration and sent after handlers
+    # finished updating contacts, `last_seen` is synced periodically
+    def __init__(self, loop, rt, conn, interval=1.0):
+        self.loop = loop
+        self.rt = rt
+        self.conn = conn
+        self.applying = False
+        self.ops = []
+        self.flush_scheduled = False
+        self.last_seen_synced = 0.0
+
+        self.list_names = {}
+
+        for name in CONTACT_LISTS:
+            contact_list = getattr(rt, name)
+            contact_list.add_listener(self)
+            self.list_names[id(contact_list)] = name
+
+        # pipe is never written from loop, so worker and writer
+        # can not block each other on full pipes
+        self.send_queue = queue.Queue()
+        threading.Thread(target=self.send_forever, daemon=True).start()
+        threading.Thread(target=self.recv_forever, daemon=True).start()
+
+        self.interval = interval
+        self.loop.call_later(interval, self.sync_last_seen)
+
+    def contact_added(self, contact_list, c):
+        if self.applying:
+            return
+
+        self.ops.append(('add', self.list_names[id(contact_list)], c))
+        self.schedule_flush()
+
+    def contact_removed(self, contact_list, c):
+        if self.applying:
+            return
+
+        self.ops.append(('remove', self.list_names[id(contact_list)], c.id, (c.remote_host, c.remote_port)))
+        self.schedule_flush()
+
+    def schedule_flush(self):
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            self.loop.call_soon(self.flush)
+
+    def flush(self):
+        self.flush_scheduled = False
+        ops = []
+
+        for op in self.ops:
+            if op[0] == 'add':
+                # contact as it is after handler which added it
+                _, name, c = op
+                op = ('add', name, c.__getstate__(), c.last_seen, c.protocol_minor_version)
+
+            ops.append(op)
+
+        self.ops = []
+        self.send_queue.put(ops)
+
+    def sync_last_seen(self):
+        t = time.time()
+
+        last_seens = [
+            (c.id, c.last_seen) for c in self.rt.contacts
+            if c.id is not None and c.last_seen is not None and c.last_seen > self.last_seen_synced
+        ]
+
+        self.last_seen_synced = t
+
+        if last_seens:
+            self.send_queue.put([('seen', last_seens)])
+
+        self.loop.call_later(self.interval, self.sync_last_seen)
+
+    def apply(self, ops):
+        self.applying = True
+
+        try:
+            apply_ops(self.rt, ops)
+        finally:
+            self.applying = False
+
+    def send_forever(self):
+        while True:
+            ops = self.send_queue.get()
+
+            try:
+                self.conn.send(ops)
+            except OSError:
+                return
+
+    def recv_forever(self):
+        while True:
+            try:
+                ops = self.conn.recv()
+            except (EOFError, OSError):
+                # writer is gone
+                self.loop.call_soon_threadsafe(self.loop.stop)
+                return
+
+            self.loop.call_soon_threadsafe(self.apply, ops)
+
+def run_worker(worker_index, conn, node_kwargs, setup):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    node = Node(loop, reuse_port=True, **node_kwargs)
+    loop.run_until_complete(node.start())
+
+    if worker_index:
+        # periodic protocol work runs once per host, in first worker;
+        # others only receive, parse and dispatch
+        for protocol_command in node.protocol_commands.values():
+            protocol_command.stop()
+
+        node.remove_dead_contacts_timer.cancel()
+
+    # kept alive by routing table as its listener
+    RoutingTableSync(loop, node.rt, conn)
+
+    if setup is not None:
+        setup(node)
+
+    loop.run_forever()
+    loop.close()
+
+class NodeWorkers(object):
+    # runs node in `n_workers` processes bound to same `listen_port`
+    # with SO_REUSEPORT, kernel spreads peers over workers by address;
+    # this process is single writer of routing table, it applies ops
+    # of every worker and broadcasts them to other workers
+    def __init__(self, n_workers=None, id=None, listen_host='0.0.0.0', listen_port=6633, contacts=(), setup=None, **node_kwargs):
+        if n_workers is None:
+            n_workers = multiprocessing.cpu_count()
+
+        self.n_workers = n_workers
+        self.setup = setup # called with node in every worker, must be picklable
+
+        self.node_kwargs = dict(node_kwargs)
+        self.node_kwargs['id'] = id
+        self.node_kwargs['listen_host'] = listen_host
+        self.node_kwargs['listen_port'] = listen_port
+
+        self.rt = RoutingTable()
+
+        for c in contacts:
+            self.rt.add_contacts.add(c)
+
+        self.conns = []
+        self.processes = []
+
+    def start(self):
+        if self.node_kwargs['id'] is None:
+            # all workers are same node
+            self.node_kwargs['id'] = str(uuid.uuid4())
+
+        snapshot_ops = get_snapshot_ops(self.rt)
+
+        for i in range(self.n_workers):
+            conn, worker_conn = multiprocessing.Pipe()
+
+            p = multiprocessing.Process(
+                target=run_worker,
+                args=(i, worker_conn, self.node_kwargs, self.setup),
+                daemon=True,
+            )
+
+            p.start()
+            worker_conn.close()
+            conn.send(snapshot_ops)
+            self.conns.append(conn)
+            self.processes.append(p)
+
+    def stop(self):
+        for p in self.processes:
+            p.terminate()
+
+        for p in self.processes:
+            p.join()
+
+        for conn in self.conns:
+            conn.close()
+
+        self.conns = []
+        self.processes = []
+
+    def run(self, duration=None):
+        # write loop, returns after `duration` seconds, or when all workers exit
+        t_end = None if duration is None else time.time() + duration
+        conns = list(self.conns)
+
+        while conns:
+            timeout = None
+
+            if t_end is not None:
+                timeout = t_end - time.time()
+
+                if timeout <= 0:
+                    break
+
+            for conn in multiprocessing.connection.wait(conns, timeout):
+                try:
+                    ops = conn.recv()
+                except (EOFError, OSError):
+                    conns.remove(conn)
+                    continue
+
+                apply_ops(self.rt, ops)
+
+                for other_conn in conns:
+                    if other_conn is conn:
+                        continue
+
+                    try:
+                        other_conn.send(ops)
+                    except OSError:
+                        # worker is gone, its conn reports EOF on next wait
+                        pass
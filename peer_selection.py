@@ -0,0 +1,40 @@
+__all__ = ['RandomPeerSelection', 'LatencyPeerSelection']
+
+import time
+import random
+
+class RandomPeerSelection(object):
+    # uniform, every contact is equally likely
+    def select(self, contacts, without_id=None):
+        return contacts.random(without_id=without_id)
+
+class LatencyPeerSelection(object):
+    # prefers contacts with low and steady round trip time which answered
+    # recently; with probability `exploration`, or for contacts without
+    # measured rtt (`default_rtt`), rest of contacts still get picked
+    def __init__(self, exploration=0.1, k=8, default_rtt=0.5, max_age=60.0):
+        self.exploration = exploration
+        self.k = k
+        self.default_rtt = default_rtt
+        self.max_age = max_age
+
+    def select(self, contacts, without_id=None):
+        if random.random() < self.exploration:
+            return contacts.random(without_id=without_id)
+
+        t = time.time()
+        return contacts.weighted_random(lambda c: self.weight(c, t), k=self.k, without_id=without_id)
+
+    def weight(self, c, t):
+        if c.rtt is None:
+            rtt = self.default_rtt
+        else:
+            rtt = c.rtt + 4.0 * c.jitter
+
+        # halves with every `max_age` seconds of silence
+        if c.last_seen is None:
+            freshness = 0.5
+        else:
+            freshness = 0.5 ** (max(t - c.last_seen, 0.0) / self.max_age)
+
+        return freshness / (rtt + 0.001)
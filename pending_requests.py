@@ -0,0 +1,60 @@
+__all__ = ['PendingRequests']
+
+import random
+
+class PendingRequest(object):
+    __slots__ = ('correlation_id', 'future', 'sent_at', 'n_responses')
+
+    def __init__(self, correlation_id, future):
+        self.correlation_id = correlation_id
+        self.future = future
+        self.sent_at = None
+        self.n_responses = 0
+
+class PendingRequests(object):
+    # requests awaiting response, keyed by correlation id; finished
+    # requests linger for a while, so late duplicate responses
+    # are recognized, then they expire on timer wheel
+    def __init__(self, loop, timers, linger=30.0):
+        self.loop = loop
+        self.timers = timers
+        self.linger = linger
+        self.requests = {} # {correlation_id: PendingRequest}
+        self.next_correlation_id = random.getrandbits(32)
+        self.n_timeouts = 0
+        self.n_duplicates = 0
+
+    def __len__(self):
+        return len(self.requests)
+
+    def create(self):
+        correlation_id = self.next_correlation_id
+        self.next_correlation_id = (correlation_id + 1) & 0xffffffff
+        pending_request = PendingRequest(correlation_id, self.loop.create_future())
+        self.requests[correlation_id] = pending_request
+        return pending_request
+
+    def finish(self, pending_request):
+        if not pending_request.future.done():
+            pending_request.future.cancel()
+
+        self.timers.call_later(self.linger, self.requests.pop, pending_request.correlation_id, None)
+
+    def resolve(self, correlation_id, obj):
+        # returns `False` for duplicate response, which is dropped
+        pending_request = self.requests.get(correlation_id)
+
+        if pending_request is None:
+            # expired, or sent by earlier run of node
+            return True
+
+        pending_request.n_responses += 1
+
+        if pending_request.n_responses > 1:
+            self.n_duplicates += 1
+            return False
+
+        if not pending_request.future.done():
+            pending_request.future.set_result(obj)
+
+        return True
@@ -3,61 +3,98 @@ __all__ = ['PingProtocolCommand']
 import time
 import random
 
-from print_colors import PrintColors
+from node_logging import log_contact, CONTACT_SUSPECTED
 from contact import Contact
 from protocol_command import ProtocolCommand
 
 class PingProtocolCommand(ProtocolCommand):
+    def __init__(self, node, protocol_major_version, protocol_minor_version, protocol_command_code):
+        ProtocolCommand.__init__(self, node, protocol_major_version, protocol_minor_version, protocol_command_code)
+
+        # known contacts are probed round-robin in shuffled order, so every
+        # contact is checked once per round at constant rate of pings;
+        # contacts to be added are probed same way
+        self.probe_order = []
+        self.add_probe_order = []
+
     def start(self):
         self.req()
+        self.timer = self.node.timers.call_periodic(0.0, self.req, jitter=0.5)
 
     def stop(self):
-        raise NotImplementedError
+        self.timer.cancel()
 
     def req(self):
-        node_id = self.node.id
-        local_host = self.node.listen_host
-        local_port = self.node.listen_port
-
         if random.random() < 0.5:
             # ping contact to be added
-            c = self.node.rt.add_contacts.get(0)
+            c = self.get_next_contact(self.node.rt.add_contacts, self.add_probe_order)
         else:
             # ping known contact
-            c = self.node.rt.contacts.random(without_id=self.node.id)
+            c = self.get_next_probe_contact()
 
         if c:
-            # print('ping:', c)
-            args = ()
-
-            kwargs = {
-                'id': node_id,
-                'local_host': local_host,
-                'local_port': local_port,
-            }
-
-            res = (args, kwargs)
-            
-            # build message
-            message_data = self.node.build_message(
-                self.protocol_major_version,
-                self.protocol_minor_version,
-                self.PROTOCOL_REQ,
-                self.protocol_command_code,
-                res,
-            )
-
-            # force del
-            del args
-            del kwargs
-            del res
-
-            # send message
-            self.node.send_message(message_data, c.remote_host, c.remote_port)
-
-        # schedule next discover
-        self.node.loop.call_later(0.0 + random.random() * 0.5, self.req)
+            self.req_contact(c)
+
+    def req_contact(self, c):
+        # print('ping:', c)
+        self.req_address(c.remote_host, c.remote_port, c.id)
+
+    def req_address(self, remote_host, remote_port, remote_id=None):
+        node_id = self.node.id
+        local_host = self.node.listen_host
+        local_port = self.node.listen_port
+        args = ()
+
+        kwargs = {
+            'id': node_id,
+            'local_host': local_host,
+            'local_port': local_port,
+            'updates': self.node.membership_updates.get_updates(len(self.node.rt.contacts)),
+
+            # echoed back in response, for round trip time
+            'time': self.node.loop.time(),
+        }
+
+        res = (args, kwargs)
+        
+        # build message
+        message_data = self.node.build_message(
+            self.protocol_major_version,
+            self.protocol_minor_version,
+            self.PROTOCOL_REQ,
+            self.protocol_command_code,
+            res,
+        )
+
+        # force del
+        del args
+        del kwargs
+        del res
+
+        # send message
+        self.node.send_message(message_data, remote_host, remote_port, remote_id)
     
+    def get_next_probe_contact(self):
+        return self.get_next_contact(self.node.rt.contacts, self.probe_order)
+
+    def get_next_contact(self, contacts, probe_order):
+        reshuffled = False
+
+        while True:
+            if not probe_order:
+                if reshuffled or not len(contacts):
+                    return None
+
+                # next round, contacts added meanwhile join here
+                probe_order.extend(contacts)
+                random.shuffle(probe_order)
+                reshuffled = True
+
+            c = probe_order.pop()
+
+            if c.id != self.node.id and c in contacts:
+                return c
+
     def on_req(self, remote_host, remote_port, *args, **kwargs):
         node_id = kwargs['id']
         local_host = kwargs['local_host']
@@ -68,13 +105,13 @@ class PingProtocolCommand(ProtocolCommand):
         c = self.node.rt.contacts.get(node_id)
         
         if c:
-            c.id = node_id
+            self.node.rt.set_contact_id(c, node_id)
             c.last_seen = time.time()
         else:
-            c = self.node.rt.contacts.get((remote_host, remote_port))
+            c = self.node.rt.contacts.get_at_address((remote_host, remote_port), node_id)
         
             if c:
-                c.id = node_id
+                self.node.rt.set_contact_id(c, node_id)
                 c.last_seen = time.time()
             else:
                 # add_contact
@@ -82,38 +119,34 @@ class PingProtocolCommand(ProtocolCommand):
 
                 if c:
                     self.node.rt.add_contacts.remove(c)
-                    self.node.rt.contacts.add(c)
-                    c.id = node_id
+                    self.node.rt.set_contact_id(c, node_id)
                     c.last_seen = time.time()
-                    print(PrintColors.GREEN + 'new contact [PING ON REQ]:', self.node, c, PrintColors.END)
+                    c = self.add_contact(c, 'PING ON REQ')
                 else:
-                    c = self.node.rt.add_contacts.get((remote_host, remote_port))
+                    c = self.node.rt.add_contacts.get_at_address((remote_host, remote_port), node_id)
                 
                     if c:
                         self.node.rt.add_contacts.remove(c)
-                        self.node.rt.contacts.add(c)
-                        c.id = node_id
+                        self.node.rt.set_contact_id(c, node_id)
                         c.last_seen = time.time()
-                        print(PrintColors.GREEN + 'new contact [PING ON REQ]:', self.node, c, PrintColors.END)
+                        c = self.add_contact(c, 'PING ON REQ')
                     else:
                         # remove_contact
                         c = self.node.rt.remove_contacts.get(node_id)
 
                         if c:
                             self.node.rt.remove_contacts.remove(c)
-                            self.node.rt.contacts.add(c)
-                            c.id = node_id
+                            self.node.rt.set_contact_id(c, node_id)
                             c.last_seen = time.time()
-                            print(PrintColors.GREEN + 'new contact [PING ON REQ]:', self.node, c, PrintColors.END)
+                            c = self.add_contact(c, 'PING ON REQ')
                         else:
-                            c = self.node.rt.remove_contacts.get((remote_host, remote_port))
+                            c = self.node.rt.remove_contacts.get_at_address((remote_host, remote_port), node_id)
                         
                             if c:
                                 self.node.rt.remove_contacts.remove(c)
-                                self.node.rt.contacts.add(c)
-                                c.id = node_id
+                                self.node.rt.set_contact_id(c, node_id)
                                 c.last_seen = time.time()
-                                print(PrintColors.GREEN + 'new contact [PING ON REQ]:', self.node, c, PrintColors.END)
+                                c = self.add_contact(c, 'PING ON REQ')
                             else:
                                 c = Contact(
                                     id = node_id,
@@ -127,8 +160,9 @@ class PingProtocolCommand(ProtocolCommand):
                                 # because `c` is requesting to discover nodes
                                 # put it into known active contacts
                                 c.last_seen = time.time()
-                                self.node.rt.contacts.add(c)
-                                print(PrintColors.GREEN + 'new contact [PING ON REQ]:', self.node, c, PrintColors.END)
+                                c = self.add_contact(c, 'PING ON REQ')
+
+        self.apply_updates(kwargs.get('updates', ()))
 
         # forward to res_discover_nodes
         self.res(remote_host, remote_port, *args, **kwargs)
@@ -143,6 +177,8 @@ class PingProtocolCommand(ProtocolCommand):
             'id': node_id,
             'local_host': local_host,
             'local_port': local_port,
+            'updates': self.node.membership_updates.get_updates(len(self.node.rt.contacts)),
+            'time': kwargs.get('time'),
         }
 
         # build message
@@ -158,25 +194,26 @@ class PingProtocolCommand(ProtocolCommand):
         del res
 
         # send message
-        self.node.send_message(message_data, remote_host, remote_port)
+        self.node.send_message(message_data, remote_host, remote_port, kwargs.get('id'))
 
     def on_res(self, remote_host, remote_port, res):
         node_id = res['id']
         local_host = res['local_host']
         local_port = res['local_port']
         bootstrap = res.get('bootstrap', False)
+        t = time.time()
 
         # update contact's `last_seen`, or add contact
         c = self.node.rt.contacts.get(node_id)
         
         if c:
-            c.id = node_id
+            self.node.rt.set_contact_id(c, node_id)
             c.last_seen = time.time()
         else:
-            c = self.node.rt.contacts.get((remote_host, remote_port))
+            c = self.node.rt.contacts.get_at_address((remote_host, remote_port), node_id)
         
             if c:
-                c.id = node_id
+                self.node.rt.set_contact_id(c, node_id)
                 c.last_seen = time.time()
             else:
                 # add_contact
@@ -184,38 +221,34 @@ class PingProtocolCommand(ProtocolCommand):
 
                 if c:
                     self.node.rt.add_contacts.remove(c)
-                    self.node.rt.contacts.add(c)
-                    c.id = node_id
+                    self.node.rt.set_contact_id(c, node_id)
                     c.last_seen = time.time()
-                    print(PrintColors.GREEN + 'new contact [PING ON RES]:', self.node, c, PrintColors.END)
+                    c = self.add_contact(c, 'PING ON RES')
                 else:
-                    c = self.node.rt.add_contacts.get((remote_host, remote_port))
+                    c = self.node.rt.add_contacts.get_at_address((remote_host, remote_port), node_id)
                 
                     if c:
                         self.node.rt.add_contacts.remove(c)
-                        self.node.rt.contacts.add(c)
-                        c.id = node_id
+                        self.node.rt.set_contact_id(c, node_id)
                         c.last_seen = time.time()
-                        print(PrintColors.GREEN + 'new contact [PING ON RES]:', self.node, c, PrintColors.END)
+                        c = self.add_contact(c, 'PING ON RES')
                     else:
                         # remove_contact
                         c = self.node.rt.remove_contacts.get(node_id)
 
                         if c:
                             self.node.rt.remove_contacts.remove(c)
-                            self.node.rt.contacts.add(c)
-                            c.id = node_id
+                            self.node.rt.set_contact_id(c, node_id)
                             c.last_seen = time.time()
-                            print(PrintColors.GREEN + 'new contact [PING ON RES]:', self.node, c, PrintColors.END)
+                            c = self.add_contact(c, 'PING ON RES')
                         else:
-                            c = self.node.rt.remove_contacts.get((remote_host, remote_port))
+                            c = self.node.rt.remove_contacts.get_at_address((remote_host, remote_port), node_id)
                         
                             if c:
                                 self.node.rt.remove_contacts.remove(c)
-                                self.node.rt.contacts.add(c)
-                                c.id = node_id
+                                self.node.rt.set_contact_id(c, node_id)
                                 c.last_seen = time.time()
-                                print(PrintColors.GREEN + 'new contact [PING ON RES]:', self.node, c, PrintColors.END)
+                                c = self.add_contact(c, 'PING ON RES')
                             else:
                                 c = Contact(
                                     id = node_id,
@@ -229,5 +262,105 @@ class PingProtocolCommand(ProtocolCommand):
                                 # because `c` is requesting to discover nodes
                                 # put it into known active contacts
                                 c.last_seen = time.time()
-                                self.node.rt.contacts.add(c)
-                                print(PrintColors.GREEN + 'new contact [PING ON RES]:', self.node, c, PrintColors.END)
+                                c = self.add_contact(c, 'PING ON RES')
+
+        if c in self.node.rt.contacts:
+            # response to our ping is heartbeat of contact,
+            # declined one is not watched
+            self.node.failure_detector.heartbeat(c, t)
+            req_time = res.get('time')
+
+            if req_time is not None:
+                c.update_rtt(self.node.loop.time() - req_time)
+
+            self.node.ping_req_protocol_command.on_ack(c)
+
+        self.apply_updates(res.get('updates', ()))
+
+    def apply_updates(self, updates):
+        # membership updates piggybacked by peer, only updates which
+        # change our routing table are spread further
+        rt = self.node.rt
+        membership_updates = self.node.membership_updates
+        t = time.time()
+
+        for state, node_id, local_host, local_port, remote_host, remote_port, bootstrap in updates:
+            if node_id == self.node.id:
+                if state != membership_updates.ALIVE:
+                    # refute rumor about our own failure
+                    c = Contact(
+                        id = self.node.id,
+                        local_host = self.node.listen_host,
+                        local_port = self.node.listen_port,
+                        bootstrap = self.node.bootstrap,
+                    )
+
+                    membership_updates.add(membership_updates.ALIVE, c)
+
+                continue
+
+            if state == membership_updates.ALIVE:
+                if rt.contacts.get(node_id) or rt.add_contacts.get(node_id):
+                    continue
+
+                if remote_host is not None:
+                    # contact could be known only by address yet,
+                    # e.g. bootstrap one before it answered
+                    remote_address = (remote_host, remote_port)
+
+                    if rt.contacts.get_at_address(remote_address, node_id) or rt.add_contacts.get_at_address(remote_address, node_id):
+                        continue
+
+                if not rt.can_add_contact(node_id):
+                    continue
+
+                c = rt.remove_contacts.get(node_id)
+
+                if c is None and remote_host is not None:
+                    c = rt.remove_contacts.get_at_address(remote_address, node_id)
+
+                if c:
+                    rt.remove_contacts.remove(c)
+                    c = rt.add_contacts.add(c)
+                elif remote_host is not None:
+                    c = Contact(
+                        id = node_id,
+                        local_host = local_host,
+                        local_port = local_port,
+                        remote_host = remote_host,
+                        remote_port = remote_port,
+                        bootstrap = bootstrap,
+                    )
+
+                    c.last_seen = t
+                    c = rt.add_contacts.add(c)
+                else:
+                    continue
+
+                membership_updates.add(state, c)
+            elif state == membership_updates.SUSPECT:
+                # check it ourselves
+                c = rt.contacts.get(node_id)
+
+                if c:
+                    self.req_contact(c)
+            elif state == membership_updates.DEAD:
+                c = rt.contacts.get(node_id)
+
+                if c:
+                    if self.node.failure_detector.is_available(c, t):
+                        # we have heard from it recently
+                        continue
+
+                    rt.contacts.remove(c)
+                    c = rt.remove_contacts.add(c)
+                    log_contact(CONTACT_SUSPECTED, 'PING UPDATE', self.node, c)
+                else:
+                    c = rt.add_contacts.get(node_id)
+
+                    if not c:
+                        continue
+
+                    rt.add_contacts.remove(c)
+
+                membership_updates.add(state, c)
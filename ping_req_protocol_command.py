@@ -0,0 +1,133 @@
+__all__ = ['PingReqProtocolCommand']
+
+import time
+
+from protocol_command import ProtocolCommand
+
+class PingReqProtocolCommand(ProtocolCommand):
+    # indirect probe (SWIM ping-req), contact which does not answer our pings
+    # is pinged on our behalf by `k` other contacts before it turns yellow
+    def __init__(self, node, protocol_major_version, protocol_minor_version, protocol_command_code, k=3, max_relays=256):
+        ProtocolCommand.__init__(self, node, protocol_major_version, protocol_minor_version, protocol_command_code)
+        self.k = k
+        self.max_relays = max_relays
+        self.probes = {} # {target_id: t}, our indirect probes
+        self.relays = {} # {target_id: [(remote_host, remote_port, remote_id), ...]}, probes we run for others
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def probe(self, c):
+        # returns `False` if previous indirect probe of `c` got no answer,
+        # otherwise starts new one
+        t = self.probes.pop(c.id, None)
+
+        if t is not None and (c.last_seen is None or c.last_seen <= t):
+            return False
+
+        self.probes[c.id] = time.time()
+
+        # one more direct try too
+        self.node.ping_protocol_command.req_contact(c)
+
+        # only contacts which speak this protocol version know ping-req
+        contacts = [
+            ic for ic in self.node.rt.contacts.sample(self.k + 2, without_id=self.node.id)
+            if ic.id != c.id and (ic.protocol_minor_version or 0) >= self.protocol_minor_version
+        ]
+
+        for ic in contacts[:self.k]:
+            self.req(ic, c)
+
+        return True
+
+    def req(self, c, target_c):
+        args = ()
+
+        kwargs = {
+            'id': self.node.id,
+            'local_host': self.node.listen_host,
+            'local_port': self.node.listen_port,
+            'target': (target_c.id, target_c.remote_host, target_c.remote_port),
+        }
+
+        req = (args, kwargs)
+
+        # build message
+        message_data = self.node.build_message(
+            self.protocol_major_version,
+            self.protocol_minor_version,
+            self.PROTOCOL_REQ,
+            self.protocol_command_code,
+            req,
+        )
+
+        # force del
+        del args
+        del kwargs
+        del req
+
+        # send message
+        self.node.send_message(message_data, c.remote_host, c.remote_port, c.id)
+
+    def on_req(self, remote_host, remote_port, *args, **kwargs):
+        target_id, target_host, target_port = kwargs['target']
+
+        if target_id not in self.relays:
+            if len(self.relays) >= self.max_relays:
+                # oldest probe is likely of dead contact
+                del self.relays[next(iter(self.relays))]
+
+            self.relays[target_id] = []
+
+        requester = (remote_host, remote_port, kwargs.get('id'))
+
+        if requester not in self.relays[target_id]:
+            self.relays[target_id].append(requester)
+
+        # answer is relayed from `on_ack`
+        self.node.ping_protocol_command.req_address(target_host, target_port, target_id)
+
+    def on_ack(self, c):
+        # ping response from `c`, relay it to contacts which asked for it
+        requesters = self.relays.pop(c.id, None)
+
+        if not requesters:
+            return
+
+        for remote_host, remote_port, remote_id in requesters:
+            self.res(remote_host, remote_port, remote_id, c.id)
+
+    def res(self, remote_host, remote_port, remote_id, target_id):
+        res = {
+            'id': self.node.id,
+            'target': target_id,
+        }
+
+        # build message
+        message_data = self.node.build_message(
+            self.protocol_major_version,
+            self.protocol_minor_version,
+            self.PROTOCOL_RES,
+            self.protocol_command_code,
+            res,
+        )
+
+        # force del
+        del res
+
+        # send message
+        self.node.send_message(message_data, remote_host, remote_port, remote_id)
+
+    def on_res(self, remote_host, remote_port, res):
+        target_id = res['target']
+        self.probes.pop(target_id, None)
+
+        # target answered someone else, so it is alive
+        c = self.node.rt.contacts.get(target_id)
+
+        if c:
+            c.last_seen = time.time()
@@ -1,5 +1,8 @@
 __all__ = ['ProtocolCommand']
 
+from node_logging import log_contact, CONTACT_ADDED
+from peer_selection import RandomPeerSelection
+
 class ProtocolCommand(object):
     # protocol version 1.0
     DEFAULT_PROTOCOL_VERSION_MAJOR = 1
@@ -21,7 +24,28 @@ class ProtocolCommand(object):
         self.protocol_major_version = protocol_major_version
         self.protocol_minor_version = protocol_minor_version
         self.protocol_command_code = protocol_command_code
+
+        # scheduled periodic work, see `Node.timers`
+        self.timer = None
+
+        # how contacts to send requests to are picked, see `peer_selection`
+        self.peer_selection = RandomPeerSelection()
     
+    def select_contact(self, contacts):
+        return self.peer_selection.select(contacts, without_id=self.node.id)
+
+    def add_contact(self, c, source):
+        # puts contact among green contacts, returns it as stored;
+        # table can decline it, e.g. full k-bucket keeps it in its
+        # replacement cache, then it is returned as it is, not logged
+        added = self.node.rt.contacts.add(c)
+
+        if added is None:
+            return c
+
+        log_contact(CONTACT_ADDED, source, self.node, added)
+        return added
+
     def start(self):
         raise NotImplementedError
 
@@ -1,10 +1,102 @@
 __all__ = ['RoutingTable']
 
+import collections
+
 from contact_list import ContactList
+from contact_store import ContactStore
+from expiry_index import ExpiryIndex
 
 class RoutingTable(object):
-    def __init__(self):
-        self.version = 0 # FIXME: not used, but should be
-        self.contacts = ContactList()           # healthy "green" contacts
-        self.add_contacts = ContactList()       # to be checked "blue" contacts
-        self.remove_contacts = ContactList()    # missing "yellow" contacts
+    def __init__(self, columnar=False, max_changes=1024):
+        # columnar store trades attribute access speed for memory
+        contact_list_class = ContactStore if columnar else ContactList
+
+        # bumped on every add/remove of contact in any list,
+        # moving contact between lists is remove and add
+        self.version = 0
+
+        # green contacts changed recently, oldest first
+        self.changes = collections.deque(maxlen=max_changes) # [(version, contact), ...]
+        self.changes_min_version = 0 # changes up to this version are truncated
+
+        self.contacts = contact_list_class()           # healthy "green" contacts
+        self.add_contacts = contact_list_class()       # to be checked "blue" contacts
+        self.remove_contacts = contact_list_class()    # missing "yellow" contacts
+
+        self.contacts.add_listener(self)
+        self.add_contacts.add_listener(self)
+        self.remove_contacts.add_listener(self)
+
+        # `last_seen` ordered indexes, used to find dead contacts
+        self.contacts_expiry = ExpiryIndex(self.contacts)
+        self.remove_contacts_expiry = ExpiryIndex(self.remove_contacts)
+
+    def contact_added(self, contact_list, c):
+        self.version += 1
+        c.version = self.version
+
+        if contact_list is self.contacts:
+            self.log_change(c)
+
+    def contact_removed(self, contact_list, c):
+        self.version += 1
+
+        if contact_list is self.contacts:
+            self.log_change(c)
+
+    def set_contact_id(self, c, id):
+        # id assigned to contact already in one of lists is indexed by it
+        for contact_list in (self.contacts, self.add_contacts, self.remove_contacts):
+            if c in contact_list:
+                return contact_list.set_id(c, id)
+
+        c.id = id
+        return c
+
+    def can_add_contact(self, id):
+        # whether discovered contact is worth adding among blue ones
+        return True
+
+    def log_change(self, c):
+        if len(self.changes) == self.changes.maxlen:
+            self.changes_min_version = self.changes[0][0]
+
+        self.changes.append((self.version, c))
+
+    def get_changed_contacts(self, version):
+        # green contacts changed after `version`,
+        # or `None` if changes since then are no longer known
+        if version > self.version or version < self.changes_min_version:
+            return None
+
+        contacts = []
+        seen = set()
+
+        for change_version, c in reversed(self.changes):
+            if change_version <= version:
+                break
+
+            if c in seen:
+                continue
+
+            seen.add(c)
+
+            if c in self.contacts:
+                contacts.append(c)
+
+        return contacts
+
+    def get_discover_contacts(self, requester_id, target_key=None, version=None):
+        # flat table shares every known contact,
+        # or only ones changed since `version` requester already has
+        if version:
+            contacts = self.get_changed_contacts(version)
+
+            if contacts is not None:
+                return contacts
+
+        return self.contacts
+
+    def get_discover_key(self):
+        # flat table does not look up any particular key
+        return None
@@ -0,0 +1,246 @@
+__all__ = ['Simulator', 'SimulatedNetwork', 'SimulatedTransport', 'VirtualEventLoop']
+
+import time
+import random
+import asyncio
+import selectors
+
+from node import Node
+from node_host import NodeHost
+from timer_wheel import TimerWheel
+
+class VirtualClockSelector(selectors.BaseSelector):
+    # nothing ever becomes ready, waiting for `timeout` moves
+    # virtual clock forward to next scheduled callback instead
+    def __init__(self, now=0.0):
+        self.now = now
+        self.map = {} # {fd: SelectorKey}
+
+    def register(self, fileobj, events, data=None):
+        fd = fileobj if isinstance(fileobj, int) else fileobj.fileno()
+        key = self.map[fd] = selectors.SelectorKey(fileobj, fd, events, data)
+        return key
+
+    def unregister(self, fileobj):
+        fd = fileobj if isinstance(fileobj, int) else fileobj.fileno()
+        return self.map.pop(fd)
+
+    def select(self, timeout=None):
+        if timeout is None:
+            raise RuntimeError('Nothing is scheduled, virtual clock would stop forever')
+
+        self.now += timeout
+        return []
+
+    def get_map(self):
+        return self.map
+
+    def close(self):
+        self.map.clear()
+
+class VirtualEventLoop(asyncio.SelectorEventLoop):
+    # runs callbacks in order of their virtual time, as fast as they run;
+    # sockets are never ready, so only simulated transports work
+    def __init__(self, now=0.0):
+        self.selector = VirtualClockSelector(now)
+        asyncio.SelectorEventLoop.__init__(self, self.selector)
+
+    def time(self):
+        return self.selector.now
+
+class SimulatedTransport(asyncio.DatagramTransport):
+    def __init__(self, network, address):
+        asyncio.DatagramTransport.__init__(self)
+        self.network = network
+        self.address = address
+
+    def sendto(self, data, address=None):
+        self.network.send(self.address, address, data)
+
+    def get_extra_info(self, name, default=None):
+        if name == 'sockname':
+            return self.address
+
+        return default
+
+    def is_closing(self):
+        return self.address not in self.network.hosts
+
+    def close(self):
+        self.network.remove_host(self.address)
+
+    def abort(self):
+        self.close()
+
+class SimulatedNetwork(object):
+    # delivers datagrams between hosts after `latency + U(0, jitter)`
+    # seconds, so datagrams sent close together get reordered;
+    # each is lost with probability `loss`, and never crosses partition
+    def __init__(self, loop, latency=0.01, jitter=0.005, loss=0.0, seed=0):
+        self.loop = loop
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.random = random.Random(seed)
+        self.hosts = {} # {address: NodeHost}
+        self.links = {} # {(src_address, dst_address): (latency, jitter, loss)}
+        self.groups = {} # {address: partition group}
+
+        self.n_sent = 0
+        self.n_bytes = 0
+        self.n_lost = 0
+        self.n_partitioned = 0
+        self.n_unreachable = 0
+        self.n_delivered = 0
+
+    def add_host(self, address, host):
+        self.hosts[address] = host
+
+    def remove_host(self, address):
+        # host neither sends nor receives, as if crashed
+        self.hosts.pop(address, None)
+
+    def set_link(self, src_address, dst_address, latency=None, jitter=None, loss=None):
+        # one direction only, unset values are network's defaults
+        self.links[(src_address, dst_address)] = (
+            self.latency if latency is None else latency,
+            self.jitter if jitter is None else jitter,
+            self.loss if loss is None else loss,
+        )
+
+    def partition(self, *groups):
+        # hosts of different groups can not reach each other,
+        # hosts in none of groups form one more group
+        self.groups = {address: i for i, group in enumerate(groups) for address in group}
+
+    def heal(self):
+        self.groups = {}
+
+    def send(self, src_address, dst_address, data):
+        if src_address not in self.hosts:
+            return
+
+        self.n_sent += 1
+        self.n_bytes += len(data)
+
+        if self.groups and self.groups.get(src_address) != self.groups.get(dst_address):
+            self.n_partitioned += 1
+            return
+
+        link = self.links.get((src_address, dst_address))
+
+        if link is None:
+            latency, jitter, loss = self.latency, self.jitter, self.loss
+        else:
+            latency, jitter, loss = link
+
+        if loss and self.random.random() < loss:
+            self.n_lost += 1
+            return
+
+        # copy, as real transport does
+        delay = latency + self.random.random() * jitter
+        self.loop.call_later(delay, self.deliver, src_address, dst_address, bytes(data))
+
+    def deliver(self, src_address, dst_address, data):
+        host = self.hosts.get(dst_address)
+
+        if host is None:
+            self.n_unreachable += 1
+            return
+
+        self.n_delivered += 1
+        host.process_sock_datagrams([(data, src_address)])
+
+class Simulator(object):
+    # runs unmodified nodes and protocol commands on simulated network in
+    # virtual time; while simulator is open `time.time` follows virtual
+    # clock and module `random` is seeded, so runs with same seed and
+    # same steps end in same state
+    def __init__(self, seed=0, latency=0.01, jitter=0.005, loss=0.0, epoch=1500000000.0):
+        self.seed = seed
+        self.epoch = epoch
+        self.loop = VirtualEventLoop()
+        self.network = SimulatedNetwork(self.loop, latency, jitter, loss, seed)
+
+        # single wheel, only due ticks wake virtual loop
+        self.timers = TimerWheel(self.loop)
+
+        self.nodes = {} # {id: Node}
+        self.n_addresses = 0
+
+        self.real_time = time.time
+        self.random_state = random.getstate()
+        time.time = self.time
+        random.seed(seed)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self.loop.is_closed():
+            return
+
+        time.time = self.real_time
+        random.setstate(self.random_state)
+        self.loop.close()
+
+    def time(self):
+        return self.epoch + self.loop.time()
+
+    def get_next_address(self):
+        i = self.n_addresses
+        self.n_addresses += 1
+        return ('10.{}.{}.{}'.format((i >> 16) & 0xff, (i >> 8) & 0xff, i & 0xff), 6633)
+
+    def add_node(self, id=None, address=None, **node_kwargs):
+        # every node gets its own host and address
+        if address is None:
+            address = self.get_next_address()
+
+        if id is None:
+            id = 'node-{}-{}'.format(*address)
+
+        transport = SimulatedTransport(self.network, address)
+
+        host = NodeHost(
+            self.loop,
+            listen_host = address[0],
+            listen_port = address[1],
+            timers = self.timers,
+            transport = transport,
+        )
+
+        self.network.add_host(address, host)
+        node = Node(self.loop, id=id, host=host, **node_kwargs)
+        self.nodes[node.id] = node
+        return node
+
+    def crash_node(self, node):
+        # stops node's periodic work, its address drops datagrams
+        for protocol_command in list(node.protocol_commands.values()):
+            protocol_command.stop()
+
+        node.remove_dead_contacts_timer.cancel()
+        self.network.remove_host((node.listen_host, node.listen_port))
+        del self.nodes[node.id]
+
+    def run(self, duration):
+        # advances virtual clock by `duration` seconds
+        self.loop.run_until_complete(asyncio.sleep(duration))
+
+    def run_until(self, condition, timeout, interval=1.0):
+        # checks `condition()` every `interval` virtual seconds,
+        # returns `False` if it does not hold within `timeout`
+        t_end = self.loop.time() + timeout
+
+        while not condition():
+            if self.loop.time() >= t_end:
+                return False
+
+            self.run(min(interval, t_end - self.loop.time()))
+
+        return True
@@ -0,0 +1,51 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import marshal
+
+import wire_codec
+from contact import Contact
+from contact_codec import ContactCodec
+
+def test_encode_decode_mixed_records():
+    contacts = [
+        # UUID id and IPv4 hosts, fixed size record
+        Contact(id='5f0c2d1e-8a4b-4c3d-9e2f-1a2b3c4d5e6f', local_host='0.0.0.0', local_port=6633, remote_host='10.0.0.1', remote_port=6634),
+        Contact(id='00000000-0000-4000-8000-000000000000', local_host='127.0.0.1', local_port=1, remote_host='10.0.0.2', remote_port=65535, bootstrap=True),
+        # every other kind goes field by field
+        Contact(id='node-a', local_host='::1', local_port=6633, remote_host='example.org', remote_port=6633),
+        Contact(id='5F0C2D1E-8A4B-4C3D-9E2F-1A2B3C4D5E6F', local_host='0.0.0.0', local_port=None, remote_host='10.0.0.3', remote_port=6633),
+        Contact(remote_host='10.0.0.4', remote_port=6633, bootstrap=True),
+        # IPv4 record again after variable size ones
+        Contact(id='5f0c2d1e-8a4b-4c3d-9e2f-1a2b3c4d5e70', local_host='0.0.0.0', local_port=6633, remote_host='10.0.0.5', remote_port=1),
+    ]
+
+    data = ContactCodec.encode(contacts)
+    assert ContactCodec.decode(data) == [c.__getstate__() for c in contacts]
+
+def test_encode_decode_long_and_bytes_ids():
+    contacts = [
+        Contact(id='n' * 300, local_host='0.0.0.0', local_port=6633, remote_host='10.0.0.1', remote_port=6633),
+        Contact(id=b'node-b', local_host='0.0.0.0', local_port=6633, remote_host='10.0.0.2', remote_port=6633),
+        Contact(id='node-c', local_host='0.0.0.0', local_port=6633, remote_host='10.0.0.3', remote_port=6633),
+    ]
+
+    data = ContactCodec.encode(contacts)
+    assert ContactCodec.decode(data) == [c.__getstate__() for c in contacts]
+
+def test_encode_skips_contact_which_can_not_be_encoded():
+    contacts = [
+        Contact(id='node-a', local_host='h' * 300, local_port=6633, remote_host='10.0.0.1', remote_port=6633),
+        Contact(id=1, local_host='0.0.0.0', local_port=6633, remote_host='10.0.0.2', remote_port=6633),
+        Contact(id='node-c', local_host='0.0.0.0', local_port=6633, remote_host='10.0.0.3', remote_port=6633),
+    ]
+
+    assert ContactCodec.decode(ContactCodec.encode(contacts)) == [contacts[2].__getstate__()]
+
+def test_long_destination_id():
+    message_data = wire_codec.build_message(1, 0, 0, 0, ((), {}))
+    message_data = wire_codec.extend_message_header(message_data, 'n' * 300, 7)
+    header = wire_codec.parse_message_header(message_data)
+    assert header[5:7] == ('n' * 300, 7)
+    assert marshal.loads(message_data[header[7]:]) == ((), {})
@@ -0,0 +1,27 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from contact import Contact
+from contact_list import ContactList
+from contact_store import ContactStore
+
+def check_set_id(contacts):
+    c = contacts.add(Contact(remote_host='10.0.0.1', remote_port=6633, bootstrap=True))
+    assert contacts.get('node-1') is None
+
+    c = contacts.set_id(c, 'node-1')
+    assert c.id == 'node-1'
+    assert contacts.get('node-1') is c
+    assert contacts.get_at_address(('10.0.0.1', 6633), 'node-1') is c
+    assert contacts.get_at_address(('10.0.0.1', 6633), 'node-2') is None
+
+    contacts.remove(c)
+    assert contacts.get('node-1') is None
+    assert len(contacts) == 0
+
+def test_contact_list_set_id():
+    check_set_id(ContactList())
+
+def test_contact_store_set_id():
+    check_set_id(ContactStore())
@@ -0,0 +1,67 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from simulator import Simulator
+from contact import Contact
+
+def add_contacts(node, n, prefix='c'):
+    for i in range(n):
+        c = Contact(id='{}-{}'.format(prefix, i), remote_host='10.1.{}.{}'.format(i >> 8, i & 255), remote_port=6633)
+        c.last_seen = 0.0
+        node.rt.contacts.add(c)
+
+def page_all(protocol_command, on_page=None):
+    ids = []
+    version, cursor, page = protocol_command.get_page(None)
+    ids.extend(c.id for c in page)
+
+    while cursor is not None:
+        if on_page is not None:
+            on_page()
+
+        version, cursor, page = protocol_command.get_page(cursor)
+        ids.extend(c.id for c in page)
+
+    return version, ids
+
+def test_paging_is_stable_while_table_changes():
+    with Simulator() as sim:
+        node = sim.add_node()
+        protocol_command = node.protocol_commands[(1, 1, 1)]
+        protocol_command.max_contacts = 10
+        add_contacts(node, 100)
+        start_version = node.rt.version
+        expected = sorted(c.id for c in node.rt.contacts)
+        removed = iter(expected)
+
+        # swap-remove moves last contact into removed one's place
+        version, ids = page_all(protocol_command, lambda: node.rt.contacts.remove(next(removed)))
+
+        assert version == start_version
+        assert sorted(ids) == expected
+
+def test_paging_restarts_when_snapshot_is_gone():
+    with Simulator() as sim:
+        node = sim.add_node()
+        protocol_command = node.protocol_commands[(1, 1, 1)]
+        protocol_command.max_contacts = 10
+        protocol_command.max_page_snapshots = 1
+        add_contacts(node, 20)
+
+        start_version, cursor, page = protocol_command.get_page(None)
+
+        # other requester starts paging after table changed
+        add_contacts(node, 1, 'x')
+        protocol_command.get_page(None)
+
+        # stale cursor gets first page of current table
+        version, cursor, page = protocol_command.get_page(cursor)
+        ids = [c.id for c in page]
+
+        while cursor is not None:
+            version, cursor, page = protocol_command.get_page(cursor)
+            ids.extend(c.id for c in page)
+
+        assert version == node.rt.version
+        assert sorted(ids) == sorted(c.id for c in node.rt.contacts)
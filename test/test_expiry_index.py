@@ -0,0 +1,46 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import gc
+
+from contact import Contact
+from contact_list import ContactList
+from contact_store import ContactStore
+from expiry_index import ExpiryIndex
+
+def add_contacts(contacts, n, last_seen, prefix='c'):
+    for i in range(n):
+        c = Contact(id='{}-{}'.format(prefix, i), remote_host='10.0.{}.{}'.format(i >> 8, i & 255), remote_port=6633)
+        c.last_seen = last_seen
+        contacts.add(c)
+
+def check_pop_expired(contacts):
+    index = ExpiryIndex(contacts)
+    add_contacts(contacts, 10, 0.0)
+
+    # seen again, removed, and removed with slot reused by fresh contact
+    contacts.get('c-0').last_seen = 100.0
+    contacts.remove('c-1')
+    contacts.remove('c-2')
+    add_contacts(contacts, 1, 100.0, 'x')
+
+    expired = index.pop_expired(50.0, 10.0)
+    assert sorted(c.id for c in expired) == ['c-{}'.format(i) for i in range(3, 10)]
+    assert len(index) == 2
+    assert index.pop_expired(50.0, 10.0) == []
+    assert sorted(c.id for c in index.pop_expired(200.0, 10.0)) == ['c-0', 'x-0']
+
+def test_pop_expired_contact_list():
+    check_pop_expired(ContactList())
+
+def test_pop_expired_contact_store():
+    check_pop_expired(ContactStore())
+
+def test_contact_store_views_are_not_kept():
+    contacts = ContactStore()
+    index = ExpiryIndex(contacts)
+    add_contacts(contacts, 100, 0.0)
+    gc.collect()
+    assert len(contacts.views) == 0
+    assert len(index) == 100
@@ -0,0 +1,117 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import uuid
+
+from simulator import Simulator
+from contact import Contact
+
+NODE_ID = str(uuid.UUID(int=0))
+
+def far_id(i):
+    # every id falls into same, farthest bucket
+    return str(uuid.UUID(int=(1 << 127) | i))
+
+def add_contacts(node, n):
+    for i in range(n):
+        c = Contact(id=far_id(i), remote_host='10.0.1.{}'.format(i), remote_port=6633)
+        c.last_seen = node.rt.clock()
+        assert node.rt.contacts.add(c) is c
+
+def test_full_bucket_declines_contact():
+    with Simulator() as sim:
+        node = sim.add_node(id=NODE_ID, kbucket_size=2)
+        rt = node.rt
+        add_contacts(node, 2)
+
+        c = Contact(id=far_id(2), remote_host='10.0.1.2', remote_port=6633)
+        c.last_seen = node.rt.clock()
+        assert rt.contacts.add(c) is None
+        assert rt.contacts.get(c.id) is None
+        assert list(rt.buckets[127].replacements) == [c]
+
+        # same contact seen again replaces its older entry
+        c2 = Contact(id=far_id(2), remote_host='10.0.1.2', remote_port=6633)
+        assert rt.contacts.add(c2) is None
+        assert list(rt.buckets[127].replacements) == [c2]
+
+        # replacement takes place of removed contact
+        rt.contacts.remove(far_id(0))
+        assert rt.contacts.get(c2.id) is c2
+
+def test_declined_contact_is_not_watched():
+    with Simulator() as sim:
+        node = sim.add_node(id=NODE_ID, kbucket_size=2)
+        add_contacts(node, 2)
+
+        node.ping_protocol_command.on_res('10.0.1.2', 6633, {
+            'id': far_id(2),
+            'local_host': '10.0.1.2',
+            'local_port': 6633,
+            'updates': [],
+            'time': sim.loop.time(),
+        })
+
+        assert node.rt.contacts.get(far_id(2)) is None
+        assert len(node.rt.buckets[127].replacements) == 1
+        assert all(c.id != far_id(2) for c in node.failure_detector.histories)
+
+def test_stale_contact_evicted_with_replacements():
+    with Simulator() as sim:
+        node = sim.add_node(id=NODE_ID, kbucket_size=2)
+        rt = node.rt
+        add_contacts(node, 2)
+
+        c = Contact(id=far_id(2), remote_host='10.0.1.2', remote_port=6633)
+        c.last_seen = rt.clock()
+        assert rt.contacts.add(c) is None
+
+        # least recently seen contact goes stale, newcomer takes its place
+        # and waiting replacement is not promoted on top of it
+        stale = rt.contacts.get(far_id(0))
+        stale.last_seen = rt.clock() - rt.stale_after
+        c3 = Contact(id=far_id(3), remote_host='10.0.1.3', remote_port=6633)
+        c3.last_seen = rt.clock()
+        assert rt.contacts.add(c3) is c3
+
+        assert len(rt.buckets[127].contacts) == 2
+        assert len(rt.contacts) == 2
+        assert rt.contacts.get(far_id(0)) is None
+        assert rt.remove_contacts.get(far_id(0)) is stale
+        assert list(rt.buckets[127].replacements) == [c]
+
+def test_full_bucket_contact_is_not_discovered():
+    with Simulator() as sim:
+        node = sim.add_node(id=NODE_ID, kbucket_size=2)
+        rt = node.rt
+        add_contacts(node, 2)
+        alive = node.membership_updates.ALIVE
+
+        # fresh full bucket would decline it, so it is not pinged
+        node.ping_protocol_command.apply_updates([(alive, far_id(2), '10.0.1.2', 6633, '10.0.1.2', 6633, False)])
+        assert rt.add_contacts.get(far_id(2)) is None
+
+        # nor is contact waiting in replacement cache
+        c = Contact(id=far_id(3), remote_host='10.0.1.3', remote_port=6633)
+        assert rt.contacts.add(c) is None
+        assert not rt.can_add_contact(far_id(3))
+
+        # stale contact gives its place, contact is worth pinging
+        rt.contacts.get(far_id(0)).last_seen = rt.clock() - rt.stale_after
+        node.ping_protocol_command.apply_updates([(alive, far_id(2), '10.0.1.2', 6633, '10.0.1.2', 6633, False)])
+        assert rt.add_contacts.get(far_id(2)) is not None
+
+def test_blue_contacts_are_bounded():
+    with Simulator() as sim:
+        node = sim.add_node(id=NODE_ID, kbucket_size=2)
+        rt = node.rt
+        alive = node.membership_updates.ALIVE
+
+        updates = [
+            (alive, str(uuid.UUID(int=i + 1)), '10.0.2.{}'.format(i), 6633, '10.0.2.{}'.format(i), 6633, False)
+            for i in range(10)
+        ]
+
+        node.ping_protocol_command.apply_updates(updates)
+        assert len(rt.add_contacts) == rt.max_add_contacts == 4
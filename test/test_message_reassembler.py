@@ -0,0 +1,86 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import wire_codec
+from message_reassembler import MessageReassembler
+
+REMOTE_ADDRESS = ('10.0.0.1', 6633)
+
+def split(message_data):
+    packs = []
+
+    for pack in wire_codec.build_packs(message_data):
+        msg_id, msg_size, msg_n_packs, pack_size, pack_index = wire_codec.PACK_HEADER.unpack_from(pack)
+        packs.append((msg_id, msg_size, msg_n_packs, pack_index, bytes(pack[wire_codec.PACK_HEADER.size:])))
+
+    return packs
+
+def test_reassembles_out_of_order_with_duplicates():
+    message_data = os.urandom(wire_codec.PACK_DATA_SIZE * 3 + 10)
+    packs = split(message_data)
+    reassembler = MessageReassembler()
+
+    for pack in reversed(packs[1:]):
+        assert reassembler.add_pack(REMOTE_ADDRESS, *pack) is None
+        assert reassembler.add_pack(REMOTE_ADDRESS, *pack) is None
+
+    assert bytes(reassembler.add_pack(REMOTE_ADDRESS, *packs[0])) == message_data
+    assert len(reassembler) == 0
+    assert reassembler.n_bytes == 0
+
+def test_rejects_inconsistent_header():
+    message_data = os.urandom(wire_codec.PACK_DATA_SIZE * 2)
+    msg_id, msg_size, msg_n_packs, pack_index, pack_data = split(message_data)[0]
+    reassembler = MessageReassembler()
+
+    # huge pack count for small message would allocate huge bitmap
+    assert reassembler.add_pack(REMOTE_ADDRESS, msg_id, msg_size, 2 ** 32 - 1, pack_index, pack_data) is None
+    assert reassembler.add_pack(REMOTE_ADDRESS, msg_id, msg_size, msg_n_packs, msg_n_packs, pack_data) is None
+    assert reassembler.add_pack(REMOTE_ADDRESS, msg_id, msg_size, msg_n_packs, pack_index, pack_data[:-1]) is None
+    assert reassembler.n_dropped == 3
+    assert len(reassembler) == 0
+
+def test_budget_counts_bitmap():
+    message_data = os.urandom(wire_codec.PACK_DATA_SIZE * 16)
+    msg_id, msg_size, msg_n_packs, pack_index, pack_data = split(message_data)[0]
+    reassembler = MessageReassembler(max_bytes=msg_size)
+
+    # message alone fits, with its bitmap it does not
+    assert reassembler.add_pack(REMOTE_ADDRESS, msg_id, msg_size, msg_n_packs, pack_index, pack_data) is None
+    assert len(reassembler) == 0
+
+    reassembler = MessageReassembler()
+    reassembler.add_pack(REMOTE_ADDRESS, msg_id, msg_size, msg_n_packs, pack_index, pack_data)
+    assert reassembler.n_bytes == msg_size + 2
+
+def test_expires_once_per_batch():
+    now = [0.0]
+    reassembler = MessageReassembler(max_age=10.0, clock=lambda: now[0])
+    packs = split(os.urandom(wire_codec.PACK_DATA_SIZE * 2))
+    assert reassembler.add_pack(REMOTE_ADDRESS, *packs[0]) is None
+
+    # within batch clock is not read, partial is kept
+    now[0] = 10.0
+    assert bytes(reassembler.add_pack(REMOTE_ADDRESS, *packs[1])) == b''.join(pack[4] for pack in packs)
+
+    # next batch expires partial first, second pack starts new message
+    assert reassembler.add_pack(REMOTE_ADDRESS, *packs[0]) is None
+    now[0] = 20.0
+    reassembler.expire()
+    assert reassembler.add_pack(REMOTE_ADDRESS, *packs[1]) is None
+    assert reassembler.n_expired == 1
+    assert len(reassembler) == 1
+
+def test_rejects_pack_inconsistent_with_message():
+    packs = split(os.urandom(wire_codec.PACK_DATA_SIZE * 2 + 10))
+    reassembler = MessageReassembler()
+    msg_id, msg_size, msg_n_packs, pack_index, pack_data = packs[0]
+    assert reassembler.add_pack(REMOTE_ADDRESS, *packs[0]) is None
+
+    # short pack in the middle, long last pack, index past the end
+    assert reassembler.add_pack(REMOTE_ADDRESS, msg_id, msg_size, msg_n_packs, 1, pack_data[:-1]) is None
+    assert reassembler.add_pack(REMOTE_ADDRESS, msg_id, msg_size, msg_n_packs, 2, pack_data) is None
+    assert reassembler.add_pack(REMOTE_ADDRESS, msg_id, msg_size, msg_n_packs, 3, pack_data[:10]) is None
+    assert reassembler.n_dropped == 3
+    assert len(reassembler) == 1
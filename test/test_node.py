@@ -0,0 +1,152 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import asyncio
+import marshal
+
+import pytest
+
+from simulator import Simulator
+from protocol_command import ProtocolCommand
+from contact import Contact
+
+class RecordingListener(object):
+    def __init__(self):
+        self.started = []
+        self.finished = []
+
+    def dispatch_started(self, node, protocol_command, protocol_message_type, remote_host, remote_port):
+        self.started.append(protocol_command)
+
+    def dispatch_finished(self, node, protocol_command, protocol_message_type, remote_host, remote_port, payload_size, decode_seconds, handle_seconds):
+        self.finished.append(protocol_command)
+
+def test_dispatch_finished_after_failed_handler():
+    with Simulator() as sim:
+        node = sim.add_node(dispatch_sample_every=1)
+        listener = RecordingListener()
+        node.add_dispatch_listener(listener)
+        protocol_command = node.protocol_commands[(1, 0, 0)]
+
+        def on_req(remote_host, remote_port, *args, **kwargs):
+            raise RuntimeError('handler failed')
+
+        protocol_command.on_req = on_req
+        message_data = marshal.dumps(((), {}))
+
+        with pytest.raises(RuntimeError):
+            node.dispatch_message(1, 0, ProtocolCommand.PROTOCOL_REQ, 0, message_data, '10.0.1.1', 6633)
+
+        assert listener.started == [protocol_command]
+        assert listener.finished == [protocol_command]
+
+        # undecodable message is reported too
+        with pytest.raises(ValueError):
+            node.dispatch_message(1, 0, ProtocolCommand.PROTOCOL_REQ, 0, b'\xff', '10.0.1.1', 6633)
+
+        assert len(listener.finished) == 2
+
+def ping(sim, a, b, **kwargs):
+    c = Contact(id=b.id, remote_host=b.listen_host, remote_port=b.listen_port)
+
+    return sim.loop.run_until_complete(a.request(
+        a.ping_protocol_command,
+        c,
+        id = a.id,
+        local_host = a.listen_host,
+        local_port = a.listen_port,
+        time = sim.loop.time(),
+        **kwargs
+    ))
+
+def drop_datagrams(sim, src_node, n):
+    # first `n` datagrams sent by `src_node` are lost
+    send = sim.network.send
+    src_address = (src_node.listen_host, src_node.listen_port)
+    dropped = []
+
+    def drop_send(src, dst, data):
+        if src == src_address and len(dropped) < n:
+            dropped.append(data)
+            return
+
+        send(src, dst, data)
+
+    sim.network.send = drop_send
+    return dropped
+
+def test_request_resolves():
+    with Simulator() as sim:
+        a = sim.add_node()
+        b = sim.add_node()
+        t = sim.loop.time()
+
+        res = ping(sim, a, b, timeout=1.0)
+        assert res['id'] == b.id
+        assert sim.loop.time() - t < 1.0
+        assert len(a.pending_requests) == 1
+
+        # finished request lingers for duplicates, then it is gone
+        sim.run(a.pending_requests.linger + 1.0)
+        assert len(a.pending_requests) == 0
+
+def test_request_times_out_after_retries():
+    with Simulator() as sim:
+        a = sim.add_node()
+        b = sim.add_node()
+        sim.crash_node(b)
+        t = sim.loop.time()
+
+        with pytest.raises(asyncio.TimeoutError):
+            ping(sim, a, b, timeout=1.0, retries=2)
+
+        assert 3.0 <= sim.loop.time() - t < 3.1
+        assert a.pending_requests.n_timeouts == 1
+
+def test_request_retry_to_unknown_peer_carries_correlation_id():
+    with Simulator() as sim:
+        a = sim.add_node()
+        b = sim.add_node()
+
+        # first attempt is lost, peer never sent us extended header
+        dropped = drop_datagrams(sim, a, 1)
+        res = ping(sim, a, b, timeout=1.0, retries=1)
+        assert len(dropped) == 1
+        assert res['id'] == b.id
+        assert a.pending_requests.n_timeouts == 0
+
+def test_request_duplicate_response_dropped():
+    with Simulator() as sim:
+        a = sim.add_node()
+        b = sim.add_node()
+
+        # only request's datagrams are sent
+        for node in (a, b):
+            for protocol_command in node.protocol_commands.values():
+                protocol_command.stop()
+
+        deliver = sim.network.deliver
+        b_address = (b.listen_host, b.listen_port)
+
+        def deliver_twice(src, dst, data):
+            deliver(src, dst, data)
+
+            if src == b_address:
+                deliver(src, dst, data)
+
+        sim.network.deliver = deliver_twice
+        responses = []
+        on_res = a.ping_protocol_command.on_res
+
+        def count_on_res(remote_host, remote_port, res):
+            responses.append(res)
+            on_res(remote_host, remote_port, res)
+
+        a.ping_protocol_command.on_res = count_on_res
+        res = ping(sim, a, b, timeout=1.0)
+        sim.run(1.0)
+
+        assert res['id'] == b.id
+        assert a.pending_requests.n_duplicates == 1
+        assert len(responses) == 1
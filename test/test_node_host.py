@@ -0,0 +1,161 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import asyncio
+
+import wire_codec
+from node import Node
+from node_host import NodeHost
+from metrics import MetricsRegistry
+from simulator import Simulator, SimulatedTransport
+from protocol_command import ProtocolCommand
+
+def build_datagram(node, protocol_command_code, obj):
+    message_data = node.build_message(1, 0, ProtocolCommand.PROTOCOL_REQ, protocol_command_code, obj)
+    message_data = wire_codec.extend_message_header(message_data, node.id)
+    return bytes(wire_codec.build_packs(message_data)[0])
+
+def ping_datagram(node, node_id):
+    return build_datagram(node, 0, ((), {
+        'id': node_id,
+        'local_host': '10.0.1.1',
+        'local_port': 6633,
+        'updates': [],
+        'time': 0.0,
+    }))
+
+def test_bad_datagrams_do_not_stop_batch():
+    with Simulator() as sim:
+        node = sim.add_node()
+        host = node.host
+        remote_address = ('10.0.1.1', 6633)
+
+        short_message = bytes(wire_codec.build_packs(b'\x01\x00')[0])
+        unknown_command = build_datagram(node, 200, ((), {}))
+        bad_body = build_datagram(node, 0, ((), {}))[:-1] + b'\xff'
+
+        host.process_sock_datagrams([
+            (short_message, remote_address),
+            (unknown_command, remote_address),
+            (bad_body, remote_address),
+            (ping_datagram(node, 'peer-1'), remote_address),
+        ])
+
+        assert host.metric_messages_malformed.value == 1
+        assert node.metric_messages_unknown.value == 1
+        assert host.metric_datagrams_failed.value == 1
+        assert host.metric_datagrams_in.value == 3
+        assert node.rt.contacts.get('peer-1') is not None
+
+class CaptureTransport(object):
+    def __init__(self):
+        self.datagrams = []
+
+    def sendto(self, data, address=None):
+        self.datagrams.append((bytes(data), address))
+
+def sent_flags(host, transport, remote_address, remote_id=None, correlation_id=None):
+    message_data = host.default_node.build_message(1, 0, ProtocolCommand.PROTOCOL_REQ, 0, ((), {}))
+    host.send_message(message_data, remote_address[0], remote_address[1], remote_id, correlation_id)
+    host.flush_send_queue()
+    data, address = transport.datagrams.pop()
+    return data[wire_codec.PACK_HEADER.size + 2] & (wire_codec.MESSAGE_FLAG_DESTINATION_ID | wire_codec.MESSAGE_FLAG_CORRELATION_ID)
+
+def test_header_extensions_upgrade():
+    with Simulator() as sim:
+        node = sim.add_node()
+        host = node.host
+        transport = CaptureTransport()
+        host.connection_made(transport)
+        remote_address = ('10.0.1.1', 6633)
+
+        # unknown peer, e.g. legacy bootstrap node
+        assert not sent_flags(host, transport, remote_address)
+
+        # one extended message, then plain until peer answers extended
+        assert sent_flags(host, transport, remote_address, 'peer-1')
+        assert not sent_flags(host, transport, remote_address, 'peer-1', 7)
+
+        # plain messages of peer do not change it
+        host.process_sock_datagrams([(bytes(wire_codec.build_packs(node.build_message(1, 0, ProtocolCommand.PROTOCOL_RES, 200, {}))[0]), remote_address)])
+        assert not sent_flags(host, transport, remote_address, 'peer-1')
+
+        host.process_sock_datagrams([(build_datagram(node, 200, ((), {})), remote_address)])
+        assert sent_flags(host, transport, remote_address, 'peer-1', 7) == wire_codec.MESSAGE_FLAG_DESTINATION_ID | wire_codec.MESSAGE_FLAG_CORRELATION_ID
+        assert sent_flags(host, transport, remote_address)
+
+def test_packs_coalesced_only_for_extended_peers():
+    with Simulator() as sim:
+        node = sim.add_node()
+        host = node.host
+        transport = CaptureTransport()
+        host.connection_made(transport)
+        legacy_address = ('10.0.1.1', 6633)
+        extended_address = ('10.0.1.2', 6633)
+        host.process_sock_datagrams([(build_datagram(node, 200, ((), {})), extended_address)])
+        message_data = node.build_message(1, 0, ProtocolCommand.PROTOCOL_REQ, 0, ((), {}))
+
+        for i in range(3):
+            host.send_message(message_data, *legacy_address)
+            host.send_message(message_data, *extended_address)
+
+        host.flush_send_queue()
+        assert [address for data, address in transport.datagrams].count(legacy_address) == 3
+        assert [address for data, address in transport.datagrams].count(extended_address) == 1
+
+def test_start_waits_for_endpoint():
+    loop = asyncio.new_event_loop()
+
+    try:
+        host = NodeHost(loop, listen_host='127.0.0.1', listen_port=0)
+        assert host.transport is None
+        assert host.listen_port == host.sock.getsockname()[1]
+        assert 'nodes{{host="127.0.0.1:{}"}}'.format(host.listen_port) in host.metrics.snapshot()['gauges']
+
+        loop.run_until_complete(host.start())
+        assert host.transport is not None
+        assert host.endpoint_task.done()
+
+        # started host, start is no-op
+        loop.run_until_complete(host.start())
+        host.transport.close()
+        loop.run_until_complete(asyncio.sleep(0))
+    finally:
+        loop.close()
+
+def test_partial_messages_expire_per_batch():
+    with Simulator() as sim:
+        node = sim.add_node()
+        host = node.host
+        remote_address = ('10.0.1.1', 6633)
+        message_data = node.build_message(1, 0, ProtocolCommand.PROTOCOL_REQ, 200, ((), {'data': b'x' * wire_codec.PACK_DATA_SIZE}))
+        packs = wire_codec.build_packs(message_data)
+        assert len(packs) == 2
+
+        host.process_sock_datagrams([(bytes(packs[0]), remote_address)])
+        assert len(host.recv_packs) == 1
+
+        sim.run(host.recv_packs.max_age)
+        host.process_sock_datagrams([(build_datagram(node, 200, ((), {})), remote_address)])
+        assert len(host.recv_packs) == 0
+        assert host.recv_packs.n_expired == 1
+
+def test_hosts_sharing_metrics_keep_own_gauges():
+    with Simulator() as sim:
+        metrics = MetricsRegistry()
+        hosts = []
+
+        for i in range(2):
+            address = sim.get_next_address()
+            host = NodeHost(sim.loop, listen_host=address[0], listen_port=address[1], timers=sim.timers, metrics=metrics, transport=SimulatedTransport(sim.network, address))
+            hosts.append(host)
+
+        for i in range(3):
+            Node(sim.loop, host=hosts[0])
+
+        Node(sim.loop, host=hosts[1])
+        gauges = metrics.snapshot()['gauges']
+        assert gauges['nodes{host="10.0.0.0:6633"}'] == 3
+        assert gauges['nodes{host="10.0.0.1:6633"}'] == 1
+        assert gauges['contacts{host="10.0.0.0:6633",state="green"}'] == 0
@@ -0,0 +1,36 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from simulator import Simulator
+from contact import Contact
+
+def test_response_of_unknown_contact_columnar():
+    with Simulator() as sim:
+        node = sim.add_node(columnar_contacts=True)
+        protocol_command = node.ping_protocol_command
+
+        protocol_command.on_res('10.0.1.1', 6633, {
+            'id': 'peer-1',
+            'local_host': '10.0.1.1',
+            'local_port': 6633,
+            'updates': [],
+            'time': sim.loop.time() - 0.05,
+        })
+
+        # heartbeat and first rtt sample belong to stored contact
+        c = node.rt.contacts.get('peer-1')
+        assert abs(c.rtt - 0.05) < 1e-9
+        assert list(node.failure_detector.histories) == [c]
+
+def test_contacts_to_be_added_are_probed_round_robin():
+    with Simulator() as sim:
+        node = sim.add_node()
+        protocol_command = node.ping_protocol_command
+
+        for i in range(5):
+            node.rt.add_contacts.add(Contact(id='peer-{}'.format(i), remote_host='10.0.1.{}'.format(i), remote_port=6633))
+
+        rt = node.rt
+        picked = [protocol_command.get_next_contact(rt.add_contacts, protocol_command.add_probe_order).id for i in range(10)]
+        assert sorted(picked[:5]) == sorted(picked[5:]) == ['peer-{}'.format(i) for i in range(5)]
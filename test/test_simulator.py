@@ -0,0 +1,77 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import wire_codec
+from simulator import Simulator, SimulatedTransport
+from node import Node
+from node_host import NodeHost
+from contact import Contact
+
+class LegacyHost(NodeHost):
+    # as node before header extensions, it ignores extended messages
+    # and sends plain ones only
+    def parse_message(self, message, remote_address):
+        if message[2] & (wire_codec.MESSAGE_FLAG_DESTINATION_ID | wire_codec.MESSAGE_FLAG_CORRELATION_ID):
+            return
+
+        NodeHost.parse_message(self, message, remote_address)
+
+    def send_message(self, message_data, remote_host, remote_port, remote_id=None, correlation_id=None, extend=False):
+        NodeHost.send_message(self, message_data, remote_host, remote_port)
+
+def add_legacy_node(sim, **node_kwargs):
+    address = sim.get_next_address()
+    host = LegacyHost(sim.loop, listen_host=address[0], listen_port=address[1], timers=sim.timers, transport=SimulatedTransport(sim.network, address))
+    sim.network.add_host(address, host)
+    node = Node(sim.loop, id='legacy-{}-{}'.format(*address), host=host, **node_kwargs)
+    sim.nodes[node.id] = node
+    return node
+
+def bootstrap_cluster(sim, n_nodes, seed_node=None):
+    if seed_node is None:
+        seed_node = sim.add_node(bootstrap=True)
+
+    for i in range(n_nodes - len(sim.nodes)):
+        node = sim.add_node()
+        node.rt.add_contacts.add(Contact(remote_host=seed_node.listen_host, remote_port=seed_node.listen_port, bootstrap=True))
+
+def is_converged(sim):
+    n_nodes = len(sim.nodes)
+
+    for node in sim.nodes.values():
+        if len(node.rt.contacts) != n_nodes - 1 or len(node.rt.add_contacts):
+            return False
+
+    return True
+
+def test_bootstrap_converges():
+    with Simulator(seed=0) as sim:
+        bootstrap_cluster(sim, 30)
+        assert sim.run_until(lambda: is_converged(sim), timeout=120.0)
+
+        # and stays converged, no duplicate contacts keep showing up
+        sim.run(60.0)
+        assert is_converged(sim)
+
+        for node in sim.nodes.values():
+            ids = set(c.id for c in node.rt.contacts)
+            assert node.id not in ids
+            assert ids == set(sim.nodes) - {node.id}
+
+def test_bootstrap_converges_with_loss():
+    with Simulator(seed=1, loss=0.05) as sim:
+        bootstrap_cluster(sim, 30)
+        assert sim.run_until(lambda: is_converged(sim), timeout=300.0)
+
+def test_bootstrap_from_legacy_seed_converges():
+    with Simulator(seed=2) as sim:
+        bootstrap_cluster(sim, 10, add_legacy_node(sim, bootstrap=True))
+        assert sim.run_until(lambda: is_converged(sim), timeout=120.0)
+
+        # new nodes upgraded between themselves, not with legacy seed
+        for node in sim.nodes.values():
+            if isinstance(node.host, LegacyHost):
+                continue
+
+            assert len(node.host.extended_addresses) == len(sim.nodes) - 2
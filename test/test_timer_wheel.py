@@ -0,0 +1,93 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import asyncio
+
+from simulator import VirtualEventLoop
+from timer_wheel import TimerWheel
+
+def run(loop, duration):
+    loop.run_until_complete(asyncio.sleep(duration))
+
+def test_failing_callback_does_not_stop_wheel():
+    loop = VirtualEventLoop()
+    errors = []
+    loop.set_exception_handler(lambda loop, context: errors.append(context['exception']))
+    timers = TimerWheel(loop)
+    calls = []
+
+    def fail():
+        calls.append('fail')
+        raise ValueError('fail')
+
+    # same slot, and later slots
+    timers.call_later(0.05, fail)
+    timers.call_later(0.05, calls.append, 'same')
+    timers.call_later(0.5, calls.append, 'later')
+    run(loop, 1.0)
+
+    assert calls == ['fail', 'same', 'later']
+    assert len(errors) == 1 and isinstance(errors[0], ValueError)
+    assert len(timers) == 0
+    loop.close()
+
+def test_failing_periodic_callback_keeps_running():
+    loop = VirtualEventLoop()
+    loop.set_exception_handler(lambda loop, context: None)
+    timers = TimerWheel(loop)
+    calls = []
+
+    def fail():
+        calls.append(loop.time())
+        raise ValueError('fail')
+
+    periodic_timer = timers.call_periodic(1.0, fail)
+    run(loop, 5.5)
+    assert len(calls) == 5
+
+    periodic_timer.cancel()
+    run(loop, 5.0)
+    assert len(calls) == 5
+    assert len(timers) == 0
+    loop.close()
+
+def test_periodic_callback_cancels_itself():
+    loop = VirtualEventLoop()
+    timers = TimerWheel(loop)
+    calls = []
+
+    def once():
+        calls.append(loop.time())
+        periodic_timer.cancel()
+
+    periodic_timer = timers.call_periodic(1.0, once)
+    run(loop, 5.0)
+    assert len(calls) == 1
+    assert len(timers) == 0
+    loop.close()
+
+class CountingTimerWheel(TimerWheel):
+    def __init__(self, loop):
+        TimerWheel.__init__(self, loop)
+        self.n_runs = 0
+
+    def run(self):
+        self.n_runs += 1
+        TimerWheel.run(self)
+
+def test_loop_wakes_only_when_timers_are_due():
+    loop = VirtualEventLoop()
+    timers = CountingTimerWheel(loop)
+    calls = []
+
+    # far timer cascades from upper levels, near one
+    # added later still fires on time
+    timers.call_later(30.0, lambda: calls.append(loop.time()))
+    timers.call_later(0.5, lambda: calls.append(loop.time()))
+    run(loop, 31.0)
+
+    assert [round(t, 2) for t in calls] == [0.5, 30.0]
+    assert timers.n_runs < 10
+    assert len(timers) == 0
+    loop.close()
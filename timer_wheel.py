@@ -0,0 +1,230 @@
+__all__ = ['TimerWheel']
+
+import math
+import random
+
+class Timer(object):
+    __slots__ = ('wheel', 'expire_tick', 'callback', 'args', 'cancelled')
+
+    def __init__(self, wheel, expire_tick, callback, args):
+        self.wheel = wheel
+        self.expire_tick = expire_tick
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        if not self.cancelled:
+            self.cancelled = True
+            self.wheel.n_timers -= 1
+
+class PeriodicTimer(object):
+    __slots__ = ('wheel', 'interval', 'jitter', 'callback', 'args', 'timer', 'cancelled')
+
+    def __init__(self, wheel, interval, jitter, callback, args):
+        self.wheel = wheel
+        self.interval = interval
+        self.jitter = jitter
+        self.callback = callback
+        self.args = args
+        self.timer = None
+        self.cancelled = False
+
+    def schedule(self):
+        delay = self.interval + random.random() * self.jitter
+        self.timer = self.wheel.call_later(delay, self.run)
+
+    def run(self):
+        # next run is scheduled first, so failing callback keeps its job;
+        # callback could cancel its own job, which cancels next run too
+        self.schedule()
+        self.callback(*self.args)
+
+    def cancel(self):
+        self.cancelled = True
+
+        if self.timer is not None:
+            self.timer.cancel()
+
+class TimerWheel(object):
+    # hierarchical timing wheel, every timer of every registered job fires
+    # from single event loop callback per tick; level `l` slot spans
+    # `wheel_size ** l` ticks, timers cascade down as their slot comes up;
+    # loop wakes only at ticks with timers due or slots to cascade
+    def __init__(self, loop, tick=0.01, wheel_size=256, n_levels=4):
+        self.loop = loop
+        self.tick = tick
+        self.wheel_size = wheel_size
+        self.n_levels = n_levels
+        self.levels = [[[] for i in range(wheel_size)] for l in range(n_levels)]
+        self.current_tick = self.get_tick(loop.time())
+        self.n_timers = 0
+        self.handle = None
+        self.handle_tick = None
+
+    def __len__(self):
+        return self.n_timers
+
+    def get_tick(self, t):
+        return int(t / self.tick)
+
+    def call_later(self, delay, callback, *args):
+        if not self.n_timers:
+            # nothing to cascade, wheel can jump to current time
+            self.current_tick = self.get_tick(self.loop.time())
+
+        # rounded up, timer never fires early
+        expire_tick = math.ceil((self.loop.time() + delay) / self.tick)
+
+        # at least one tick ahead, same as `loop.call_later` never runs inline
+        if expire_tick <= self.current_tick:
+            expire_tick = self.current_tick + 1
+
+        timer = Timer(self, expire_tick, callback, args)
+        self.insert(timer)
+        self.n_timers += 1
+
+        if self.handle is None:
+            self.schedule()
+        elif expire_tick < self.handle_tick:
+            # due before loop would wake
+            self.handle.cancel()
+            self.schedule(expire_tick)
+
+        return timer
+
+    def call_periodic(self, interval, callback, *args, jitter=0.0):
+        # runs `callback` every `interval + random.random() * jitter` seconds
+        periodic_timer = PeriodicTimer(self, interval, jitter, callback, args)
+        periodic_timer.schedule()
+        return periodic_timer
+
+    def insert(self, timer):
+        ticks = timer.expire_tick - self.current_tick
+        span = 1
+
+        for l in range(self.n_levels):
+            span_next = span * self.wheel_size
+
+            if ticks < span_next or l == self.n_levels - 1:
+                i = (timer.expire_tick // span) % self.wheel_size
+                self.levels[l][i].append(timer)
+                return
+
+            span = span_next
+
+    def get_next_tick(self):
+        # first tick after current one with timers in its slot, or with
+        # upper level slot cascading down; timers expire at or after it
+        wheel_size = self.wheel_size
+        current_tick = self.current_tick
+        next_tick = None
+        level = self.levels[0]
+
+        for tick in range(current_tick + 1, current_tick + wheel_size):
+            if level[tick % wheel_size]:
+                next_tick = tick
+                break
+
+        span = 1
+
+        for l in range(1, self.n_levels):
+            span *= wheel_size
+            level = self.levels[l]
+            tick = (current_tick // span + 1) * span
+
+            for j in range(wheel_size):
+                if next_tick is not None and tick >= next_tick:
+                    break
+
+                if level[(tick // span) % wheel_size]:
+                    next_tick = tick
+                    break
+
+                tick += span
+
+        if next_tick is None:
+            next_tick = current_tick + 1
+
+        return next_tick
+
+    def schedule(self, tick=None):
+        if tick is None:
+            tick = self.get_next_tick()
+
+        when = tick * self.tick
+
+        # rounding could put `when` just before start of tick, then
+        # `run` would find no tick due and reschedule at same time
+        while self.get_tick(when) < tick:
+            when = math.nextafter(when, math.inf)
+
+        self.handle = self.loop.call_at(when, self.run)
+        self.handle_tick = tick
+
+    def run(self):
+        self.handle = None
+        now_tick = self.get_tick(self.loop.time())
+
+        # empty ticks in between are skipped
+        while self.n_timers:
+            tick = self.get_next_tick()
+
+            if tick > now_tick:
+                break
+
+            self.current_tick = tick
+            self.cascade()
+            i = tick % self.wheel_size
+            slot = self.levels[0][i]
+
+            if not slot:
+                continue
+
+            self.levels[0][i] = []
+
+            for timer in slot:
+                if timer.cancelled:
+                    continue
+
+                if timer.expire_tick > self.current_tick:
+                    # clamped into last level, not due yet
+                    self.insert(timer)
+                    continue
+
+                self.n_timers -= 1
+                timer.cancelled = True
+
+                try:
+                    timer.callback(*timer.args)
+                except Exception as e:
+                    # as `loop.call_later` does, rest of timers still run
+                    self.loop.call_exception_handler({
+                        'message': 'Exception in timer callback {!r}'.format(timer.callback),
+                        'exception': e,
+                    })
+
+        # nothing is due up to now
+        if self.current_tick < now_tick:
+            self.current_tick = now_tick
+
+        if self.n_timers and self.handle is None:
+            self.schedule()
+
+    def cascade(self):
+        # when lower level wraps around, next slot of upper level moves down
+        span = 1
+
+        for l in range(1, self.n_levels):
+            span *= self.wheel_size
+
+            if self.current_tick % span:
+                return
+
+            i = (self.current_tick // span) % self.wheel_size
+            slot = self.levels[l][i]
+            self.levels[l][i] = []
+
+            for timer in slot:
+                if not timer.cancelled:
+                    self.insert(timer)
@@ -0,0 +1,122 @@
+__all__ = [
+    'PACK_HEADER',
+    'MESSAGE_HEADER',
+    'PACK_DATA_SIZE',
+    'MAX_DATAGRAM_SIZE',
+    'MESSAGE_FLAG_DESTINATION_ID',
+    'MESSAGE_FLAG_CORRELATION_ID',
+    'CORRELATION_ID',
+    'build_message',
+    'extend_message_header',
+    'parse_message_header',
+    'build_packs',
+    'build_pack',
+    'new_message_id',
+]
+
+import random
+import struct
+import marshal
+
+from contact_codec import ContactCodec
+
+# pack header: msg_id, msg_size, msg_n_packs, pack_size, pack_index
+PACK_HEADER = struct.Struct('!QIIII')
+
+# message header: protocol_major_version, protocol_minor_version,
+#                 protocol_message_type, protocol_command_code
+MESSAGE_HEADER = struct.Struct('!BBBB')
+
+# flag of protocol_message_type, message header is then followed by
+# destination node id as `ContactCodec` id kind byte and id data,
+# so one socket can serve many nodes, see `NodeHost`
+MESSAGE_FLAG_DESTINATION_ID = 0x80
+
+# flag of protocol_message_type, then follows correlation id of request,
+# response echoes it back, see `Node.request`
+MESSAGE_FLAG_CORRELATION_ID = 0x40
+CORRELATION_ID = struct.Struct('!I')
+
+# max message data carried by single pack
+PACK_DATA_SIZE = 1400 - 3 * 4
+
+# several small packs can share datagram up to this size,
+# ethernet MTU without IPv4 and UDP headers
+MAX_DATAGRAM_SIZE = 1500 - 20 - 8
+
+def new_message_id():
+    return random.getrandbits(64)
+
+def build_message(protocol_major_version, protocol_minor_version, protocol_message_type, protocol_command_code, obj):
+    obj_data = marshal.dumps(obj)
+
+    message_data = MESSAGE_HEADER.pack(
+        protocol_major_version,
+        protocol_minor_version,
+        protocol_message_type,
+        protocol_command_code,
+    )
+
+    message_data += obj_data
+    return message_data
+
+def extend_message_header(message_data, destination_id, correlation_id=None):
+    # `destination_id` can be `None`, flag alone tells receiver
+    # that sender understands header extensions
+    id_kind, id_data = ContactCodec.encode_id(destination_id)
+    header = bytearray(message_data[:MESSAGE_HEADER.size])
+    header[2] |= MESSAGE_FLAG_DESTINATION_ID
+    header.append(id_kind)
+    header += id_data
+
+    if correlation_id is not None:
+        header[2] |= MESSAGE_FLAG_CORRELATION_ID
+        header += CORRELATION_ID.pack(correlation_id)
+
+    header += message_data[MESSAGE_HEADER.size:]
+    return header
+
+def parse_message_header(message):
+    protocol_major_version, protocol_minor_version, protocol_message_type, protocol_command_code = MESSAGE_HEADER.unpack_from(message)
+    offset = MESSAGE_HEADER.size
+    has_destination_id = bool(protocol_message_type & MESSAGE_FLAG_DESTINATION_ID)
+    destination_id = None
+    correlation_id = None
+
+    if has_destination_id:
+        destination_id, offset = ContactCodec.decode_id(message[offset], message, offset + 1)
+
+    if protocol_message_type & MESSAGE_FLAG_CORRELATION_ID:
+        correlation_id, = CORRELATION_ID.unpack_from(message, offset)
+        offset += CORRELATION_ID.size
+
+    protocol_message_type &= ~(MESSAGE_FLAG_DESTINATION_ID | MESSAGE_FLAG_CORRELATION_ID)
+    return protocol_major_version, protocol_minor_version, protocol_message_type, protocol_command_code, has_destination_id, destination_id, correlation_id, offset
+
+def build_packs(message_data):
+    message_size = len(message_data)
+
+    if message_size <= PACK_DATA_SIZE:
+        # single pack fast path, header and data written into one buffer
+        pack = bytearray(PACK_HEADER.size + message_size)
+        PACK_HEADER.pack_into(pack, 0, new_message_id(), message_size, 1, message_size, 0)
+        pack[PACK_HEADER.size:] = message_data
+        return [pack]
+
+    message_id = new_message_id()
+    message_n_packs = (message_size + PACK_DATA_SIZE - 1) // PACK_DATA_SIZE
+    message_view = memoryview(message_data)
+    packs = []
+
+    for pack_index, s in enumerate(range(0, message_size, PACK_DATA_SIZE)):
+        pack_data = message_view[s:s + PACK_DATA_SIZE]
+        pack = build_pack(message_id, message_size, message_n_packs, len(pack_data), pack_index, pack_data)
+        packs.append(pack)
+
+    return packs
+
+def build_pack(message_id, message_size, message_n_packs, pack_size, pack_index, pack_data):
+    pack = bytearray(PACK_HEADER.size + pack_size)
+    PACK_HEADER.pack_into(pack, 0, message_id, message_size, message_n_packs, pack_size, pack_index)
+    pack[PACK_HEADER.size:] = pack_data
+    return pack